@@ -1,4 +1,6 @@
 # app/config.py
+from typing import Dict
+
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -23,12 +25,220 @@ class Settings(BaseSettings):
         default="INFO", description="Logging level for application (INFO, DEBUG, ERROR)"
     )
 
+    # Request log sampling / error-log rate limiting
+    log_success_sample_rate: float = Field(
+        default=0.0,
+        ge=0.0,
+        le=1.0,
+        description="Fraction of successful requests logged (errors always eligible)",
+    )
+    log_route_sample_rates: Dict[str, float] = Field(
+        default_factory=dict,
+        description='Per-route-template overrides, e.g. {"/v1/evaluate": 0.001}',
+    )
+    log_error_rate_per_sec: float = Field(
+        default=50.0, description="Sustained error log records per second"
+    )
+    log_error_burst: int = Field(
+        default=200, description="Error log records allowed in a burst"
+    )
+
     # Cache TTL for dynamic tenants (in seconds)
     tenant_cache_ttl: int = Field(
         default=300,
         description="Time-to-live for tenant cache; allows dynamic tenant validation",
     )
 
+    # Flag cache TTL (in seconds); evaluation reads flags from this cache
+    flag_cache_ttl: int = Field(
+        default=60, description="TTL for cached flag definitions"
+    )
+
+    # Segment list change marker TTL (in seconds); bounds how stale a list
+    # ETag can be on a worker that missed another worker's write
+    segment_list_state_ttl: int = Field(
+        default=5, description="TTL for the cached segment list change marker"
+    )
+
+    # Startup cache warm-up (readiness waits for it)
+    cache_warmup: bool = Field(
+        default=True, description="Preload live flags/segments at startup"
+    )
+    cache_warmup_shard_size: int = Field(
+        default=200, description="Tenants loaded per warm-up query batch"
+    )
+    cache_warmup_max_flags: int = Field(
+        default=200_000, description="Stop warming after this many flags"
+    )
+
+    # Per-node flag snapshot shared by all workers through a mapped file
+    snapshot_enabled: bool = Field(
+        default=False, description="Read flags from the node snapshot on cache miss"
+    )
+    snapshot_dir: str = Field(
+        default="./snapshot", description="Directory of the node snapshot file"
+    )
+    snapshot_build_interval: float = Field(
+        default=2.0, description="Seconds between change checks by the builder"
+    )
+    snapshot_poll_interval: float = Field(
+        default=0.5, description="Seconds between checks for a replaced snapshot"
+    )
+    snapshot_max_age: float = Field(
+        default=60.0, description="Ignore snapshots older than this (builder gone)"
+    )
+
+    # Change log compaction
+    changes_compact_interval: float = Field(
+        default=600.0, description="Seconds between change log compactions (0=off)"
+    )
+    changes_tombstone_ttl: float = Field(
+        default=7 * 24 * 3600.0,
+        description="Keep delete entries this long (0 keeps them forever)",
+    )
+
+    # GET /v1/stream: server-sent change events
+    stream_queue_size: int = Field(
+        default=256, description="Events buffered per subscriber before it is dropped"
+    )
+    stream_heartbeat: float = Field(
+        default=15.0, description="Seconds of silence before a keep-alive comment"
+    )
+    stream_max_subscribers: int = Field(
+        default=10_000, description="Open streams allowed per worker"
+    )
+
+    # GET /v1/snapshot: in-memory tenant snapshots
+    snapshot_store_debounce: float = Field(
+        default=0.2, description="Seconds to coalesce writes before a rebuild"
+    )
+    snapshot_store_max_age: float = Field(
+        default=5.0, description="Refresh a tenant snapshot in the background after"
+    )
+    snapshot_store_max_tenants: int = Field(
+        default=10_000, description="Tenant snapshots kept in memory (LRU)"
+    )
+
+    # Readiness/liveness probes
+    readiness_db_probe_ttl: float = Field(
+        default=5.0, description="Seconds a database probe result is reused"
+    )
+    readiness_db_timeout: float = Field(
+        default=1.0, description="Database probe timeout in seconds"
+    )
+    readiness_max_loop_lag: float = Field(
+        default=0.5, description="Event loop lag (seconds) above which not ready"
+    )
+    liveness_max_loop_lag: float = Field(
+        default=10.0, description="Event loop lag (seconds) above which not live"
+    )
+    loop_lag_interval: float = Field(
+        default=0.25, description="Event loop lag monitor tick in seconds"
+    )
+
+    # Lean ASGI handler for cached /v1/evaluate requests (kill switch)
+    evaluate_fast_path: bool = Field(
+        default=True,
+        description="Serve cached flag evaluations without the FastAPI request pipeline",
+    )
+
+    # Per-stage timing of /v1/evaluate (Prometheus + optional Server-Timing)
+    evaluate_stage_timing: bool = Field(
+        default=True, description="Record evaluate_stage_seconds histograms"
+    )
+    evaluate_server_timing: bool = Field(
+        default=False,
+        description="Add a Server-Timing header with the stage breakdown",
+    )
+
+    # Exposure events (who saw which variant)
+    exposure_sink: str = Field(
+        default="db",
+        pattern="^(db|file|none)$",
+        description="Where exposure batches go: 'db', 'file' (gzip NDJSON) or 'none'",
+    )
+    exposure_buffer_size: int = Field(
+        default=100_000,
+        description="Ring buffer capacity; events beyond it are dropped",
+    )
+    exposure_batch_size: int = Field(
+        default=1_000, description="Max events written per flush"
+    )
+    exposure_flush_interval: float = Field(
+        default=1.0, description="Seconds between background flushes"
+    )
+    exposure_dir: str = Field(
+        default="./exposures", description="Directory for the 'file' sink"
+    )
+    exposure_file_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        description="Uncompressed bytes per NDJSON file before rotating",
+    )
+
+    # Experiment results (per-worker aggregates)
+    results_refresh_ttl: float = Field(
+        default=60.0,
+        description="Seconds before a tenant's results are reloaded from the "
+        "tables, picking up events handled by other workers",
+    )
+    results_max_tenants: int = Field(
+        default=100,
+        description="Tenants whose results are held in memory; least recently "
+        "requested ones are dropped beyond this",
+    )
+
+    # Cross-worker cache invalidation
+    invalidation_backend: str = Field(
+        default="inprocess",
+        pattern="^(inprocess|unix|postgres)$",
+        description="Bus reaching other workers: 'inprocess' (single worker), 'unix' "
+        "(one host) or 'postgres' (LISTEN/NOTIFY)",
+    )
+    invalidation_socket_dir: str = Field(
+        default="/tmp/flag-invalidation",
+        description="Shared directory of per-worker sockets for the 'unix' bus",
+    )
+    invalidation_channel: str = Field(
+        default="flag_invalidation", description="NOTIFY channel for the 'postgres' bus"
+    )
+
+    # Webhook change notifications
+    webhook_batch_window: float = Field(
+        default=1.0, description="Seconds to coalesce changes into one delivery"
+    )
+    webhook_batch_max: int = Field(
+        default=500, description="Max changes per delivered batch"
+    )
+    webhook_timeout: float = Field(
+        default=5.0, description="Per-request timeout for webhook POSTs"
+    )
+    webhook_concurrency: int = Field(
+        default=20, description="Deliveries in flight per worker"
+    )
+    webhook_max_attempts: int = Field(
+        default=8, description="Attempts before a delivery is marked failed"
+    )
+    webhook_backoff_base: float = Field(
+        default=2.0, description="First retry delay in seconds; doubles per attempt"
+    )
+    webhook_backoff_max: float = Field(
+        default=600.0, description="Cap on the retry delay in seconds"
+    )
+    webhook_retry_interval: float = Field(
+        default=5.0, description="Seconds between scans of the retry queue"
+    )
+    webhook_allow_private_targets: bool = Field(
+        default=False,
+        description="Allow webhook URLs resolving to loopback, private or "
+        "link-local addresses (local receivers only)",
+    )
+
+    # Prometheus label cardinality guard
+    metrics_tenant_label_limit: int = Field(
+        default=50,
+        description="Distinct tenant label values before falling back to 'other'",
+    )
+
     class Config:
         env_file = ".env"
         case_sensitive = False
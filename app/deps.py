@@ -4,6 +4,7 @@ from fastapi import Depends, Header, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy import text
 from app.config import settings
+from app.services.cache import tenant_cache
 from app.utils.security import verify_token
 
 # -------------------------
@@ -25,6 +26,7 @@ Tenant = Annotated[str, Header(alias="X-Tenant-ID")]
 
 
 async def require_tenant(
+    request: Request,
     tenant: Tenant,
     db: AsyncSession = Depends(get_db),
 ) -> str:
@@ -34,6 +36,11 @@ async def require_tenant(
             detail="X-Tenant-ID header required",
         )
 
+    # Known tenants are cached so hot paths skip the existence query
+    if tenant_cache.get(tenant):
+        request.state.tenant = tenant
+        return tenant
+
     # Check if tenant exists in DB (flags or segments)
     result = await db.execute(
         text("""
@@ -50,17 +57,16 @@ async def require_tenant(
             detail=f"Tenant '{tenant}' not recognized",
         )
 
+    tenant_cache.set(tenant, True)
+    # Only recognized tenants reach request.state (metrics label them)
+    request.state.tenant = tenant
     return tenant
 
 
 # -------------------------
 # JWT + tenant enforcement
 # -------------------------
-async def require_auth(
-    request: Request,
-    tenant: str = Depends(require_tenant),
-    required_scope: str | None = None,
-):
+def bearer_payload(request: Request) -> dict:
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(
@@ -69,14 +75,57 @@ async def require_auth(
         )
 
     token = auth_header.split(" ", 1)[1]
-    payload = verify_token(token)
+    return verify_token(token)
+
 
-    if required_scope and required_scope not in payload.get("scopes", []):
+def check_scope(payload: dict, required_scope: str) -> None:
+    if required_scope not in payload.get("scopes", []):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Missing required scope: {required_scope}",
         )
 
+
+def require_scope(required_scope: str):
+    """
+    Dependency factory for tenant-independent (admin) routes: a valid bearer
+    token carrying `required_scope`, no X-Tenant-ID needed.
+    """
+
+    async def dependency(request: Request) -> dict:
+        payload = bearer_payload(request)
+        check_scope(payload, required_scope)
+        request.state.user = payload.get("sub")
+        request.state.scopes = payload.get("scopes", [])
+        return payload
+
+    return dependency
+
+
+def require_tenant_scope(required_scope: str):
+    """
+    Dependency factory for tenant routes: require_auth with `required_scope`.
+    Use this rather than wrapping require_auth in a lambda, which returns its
+    coroutine un-awaited so the scope is never checked.
+    """
+
+    async def dependency(
+        request: Request, tenant: str = Depends(require_tenant)
+    ) -> dict:
+        return await require_auth(request, tenant, required_scope=required_scope)
+
+    return dependency
+
+
+async def require_auth(
+    request: Request,
+    tenant: str = Depends(require_tenant),
+    required_scope: str | None = None,
+):
+    payload = bearer_payload(request)
+    if required_scope:
+        check_scope(payload, required_scope)
+
     # Attach to request.state
     request.state.user = payload.get("sub")
     request.state.scopes = payload.get("scopes", [])
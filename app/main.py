@@ -1,6 +1,5 @@
-import time
 import logging
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, Response
 from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.config import settings
@@ -11,8 +10,23 @@ from app.routers import auth as auth_router
 from app.routers import flags as flags_router
 from app.routers import segments as segments_router
 from app.routers import evaluate as evaluate_router
+from app.routers import admin as admin_router
 from app.routers import audit as audit_router
-from app.utils.logging import setup_logging, get_request_context
+from app.routers import experiments as experiments_router
+from app.routers import snapshot as snapshot_router
+from app.routers import stream as stream_router
+from app.routers import webhooks as webhooks_router
+from app.services.changes import compactor
+from app.services.exposures import exposures
+from app.services.invalidation import bus
+from app.services.readiness import loop_monitor
+from app.services.results import results_engine
+from app.services.snapshot import node_snapshot
+from app.services.stream import hub
+from app.services.warmup import warmer
+from app.services.webhooks import webhooks
+from app.utils.logging import RequestLoggingMiddleware, setup_logging
+from app.utils.profiling import ProfilingMiddleware
 from app.utils import metrics
 
 # ---------- Logging ----------
@@ -23,36 +37,47 @@ logger = logging.getLogger("feature-flag-service")
 app = FastAPI(title="Feature Flag Service", version="0.1.0")
 
 # ---------- Middleware ----------
+# Innermost first: the evaluate fast path still runs inside metrics/logging
+app.add_middleware(evaluate_router.EvaluateFastPath)
 app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(RequestLoggingMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Structured logging for all requests/responses."""
-    start_time = time.time()
-    try:
-        response = await call_next(request)
-        duration_ms = (time.time() - start_time) * 1000
-
-        # Only log errors with duration
-        if response.status_code >= 400:
-            ctx = get_request_context(request, duration_ms=duration_ms)
-            ctx["status"] = response.status_code
-            logger.info("Request completed with error", extra=ctx)
-        return response
-    except Exception:
-        duration_ms = (time.time() - start_time) * 1000
-        ctx = get_request_context(request, duration_ms=duration_ms)
-        logger.exception("Unhandled exception during request", extra=ctx)
-        raise
+# ---------- Exposure consumers ----------
+# Flushed exposure batches keep experiment results current
+exposures.subscribe(results_engine.add_exposures)
 
 
 # ---------- Startup Event ----------
 @app.on_event("startup")
 async def on_startup():
-    """Create DB tables for development/demo."""
+    """Create DB tables for development/demo, then warm caches in the background."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await bus.start()
+    exposures.start()
+    loop_monitor.start()
+    compactor.start()
+    webhooks.start()
+    if settings.snapshot_enabled:
+        # Workers share the node snapshot instead of each preloading every flag
+        node_snapshot.start()
+    elif settings.cache_warmup:
+        warmer.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Flush buffered exposure events before exit."""
+    hub.close()
+    await bus.stop()
+    await warmer.stop()
+    await loop_monitor.stop()
+    await compactor.stop()
+    await webhooks.stop()
+    await node_snapshot.stop()
+    await exposures.stop()
 
 
 # ---------- Routers ----------
@@ -62,6 +87,11 @@ app.include_router(flags_router.router)
 app.include_router(segments_router.router)
 app.include_router(evaluate_router.router)
 app.include_router(audit_router.router)
+app.include_router(experiments_router.router)
+app.include_router(snapshot_router.router)
+app.include_router(stream_router.router)
+app.include_router(webhooks_router.router)
+app.include_router(admin_router.router)
 
 
 # ---------- Prometheus Metrics Endpoint ----------
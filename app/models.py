@@ -5,12 +5,16 @@ from typing import Any, Dict, List, Optional
 
 from sqlalchemy import (
     JSON,
+    Boolean,
     CheckConstraint,
     DateTime,
+    ForeignKey,
     Index,
+    Integer,
     String,
     Text,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
@@ -24,6 +28,15 @@ class Flag(Base):
     __table_args__ = (
         UniqueConstraint("tenant_id", "key", name="uq_flags_tenant_key"),
         Index("ix_flags_tenant_state", "tenant_id", "state"),
+        # Covering index for listings: live rows only, ordered by key
+        Index(
+            "ix_flags_tenant_live_key",
+            "tenant_id",
+            "key",
+            postgresql_include=["state", "updated_at"],
+            postgresql_where=text("deleted_at IS NULL"),
+            sqlite_where=text("deleted_at IS NULL"),
+        ),
         CheckConstraint("state IN ('on','off')", name="ck_flags_state"),
     )
 
@@ -62,6 +75,13 @@ class Flag(Base):
         nullable=False,
         comment="Ordered rules; e.g., {'id':'r1','when':{'attr':{'role':'employee'}},'rollout':{'variant':'treatment'}}",
     )
+    version: Mapped[int] = mapped_column(
+        Integer,
+        default=1,
+        server_default=text("1"),
+        nullable=False,
+        comment="Row version; incremented on every write (optimistic concurrency)",
+    )
     deleted_at: Mapped[Optional[datetime]] = mapped_column(
         DateTime,
         nullable=True,
@@ -79,6 +99,8 @@ class Flag(Base):
         comment="Last update time (UTC)",
     )
 
+    __mapper_args__ = {"version_id_col": version}
+
 
 class Segment(Base):
     __tablename__ = "segments"
@@ -104,6 +126,13 @@ class Segment(Base):
         nullable=False,
         comment="Matcher tree; e.g., {'all':[{'attr':{'country':'CA'}},{'attr':{'os':'iOS'}}]}",
     )
+    version: Mapped[int] = mapped_column(
+        Integer,
+        default=1,
+        server_default=text("1"),
+        nullable=False,
+        comment="Row version; incremented on every write (optimistic concurrency)",
+    )
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, nullable=False, comment="Creation time (UTC)"
     )
@@ -115,6 +144,8 @@ class Segment(Base):
         comment="Last update time (UTC)",
     )
 
+    __mapper_args__ = {"version_id_col": version}
+
 
 class Audit(Base):
     __tablename__ = "audit"
@@ -157,3 +188,185 @@ class Audit(Base):
         nullable=False,
         comment="Event timestamp (UTC)",
     )
+
+
+class Exposure(Base):
+    __tablename__ = "exposures"
+    __table_args__ = (
+        Index("ix_exposures_tenant_flag_ts", "tenant_id", "flag_key", "ts"),
+    )
+
+    id: Mapped[int] = mapped_column(
+        primary_key=True, autoincrement=True, comment="Surrogate numeric identifier"
+    )
+    tenant_id: Mapped[str] = mapped_column(
+        String(64), nullable=False, comment="Tenant namespace identifier"
+    )
+    flag_key: Mapped[str] = mapped_column(
+        String(128), nullable=False, comment="Evaluated flag key"
+    )
+    variant: Mapped[str] = mapped_column(
+        String(128), nullable=False, comment="Variant served to the user"
+    )
+    user_id: Mapped[str] = mapped_column(
+        String(256), nullable=False, comment="User id used for bucketing"
+    )
+    rule_id: Mapped[Optional[str]] = mapped_column(
+        String(128), nullable=True, comment="Matched rule id (null for default variant)"
+    )
+    ts: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, comment="Evaluation time (UTC)"
+    )
+
+
+class Conversion(Base):
+    __tablename__ = "conversions"
+    __table_args__ = (Index("ix_conversions_tenant_ts", "tenant_id", "ts"),)
+
+    id: Mapped[int] = mapped_column(
+        primary_key=True, autoincrement=True, comment="Surrogate numeric identifier"
+    )
+    tenant_id: Mapped[str] = mapped_column(
+        String(64), nullable=False, comment="Tenant namespace identifier"
+    )
+    user_id: Mapped[str] = mapped_column(
+        String(256), nullable=False, comment="User id, as sent to /v1/evaluate"
+    )
+    event: Mapped[str] = mapped_column(
+        String(128), nullable=False, comment="Conversion metric name, e.g. 'purchase'"
+    )
+    ts: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, comment="Conversion time (UTC)"
+    )
+
+
+class TenantSequence(Base):
+    __tablename__ = "tenant_sequences"
+
+    tenant_id: Mapped[str] = mapped_column(
+        String(64), primary_key=True, comment="Tenant namespace identifier"
+    )
+    seq: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, comment="Last change sequence issued"
+    )
+    floor: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default=text("0"),
+        comment="Changes up to this seq were compacted away; older cursors resync",
+    )
+
+
+class Change(Base):
+    __tablename__ = "changes"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "seq", name="uq_changes_tenant_seq"),
+        Index("ix_changes_tenant_entity_key", "tenant_id", "entity", "entity_key"),
+    )
+
+    id: Mapped[int] = mapped_column(
+        primary_key=True, autoincrement=True, comment="Surrogate numeric identifier"
+    )
+    tenant_id: Mapped[str] = mapped_column(
+        String(64), nullable=False, comment="Tenant namespace identifier"
+    )
+    seq: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        comment="Per-tenant sequence number, gap-free in commit order",
+    )
+    entity: Mapped[str] = mapped_column(
+        String(32), nullable=False, comment="Entity type: 'flag' or 'segment'"
+    )
+    entity_key: Mapped[str] = mapped_column(
+        String(128),
+        nullable=False,
+        comment="Stable key of the entity within the tenant",
+    )
+    action: Mapped[str] = mapped_column(
+        String(32), nullable=False, comment="'create' | 'update' | 'delete'"
+    )
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, comment="Row version after the change"
+    )
+    ts: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, comment="Commit-side wall clock (informational)"
+    )
+
+
+class Webhook(Base):
+    __tablename__ = "webhooks"
+    __table_args__ = (Index("ix_webhooks_tenant", "tenant_id"),)
+
+    id: Mapped[int] = mapped_column(
+        primary_key=True, autoincrement=True, comment="Surrogate numeric identifier"
+    )
+    tenant_id: Mapped[str] = mapped_column(
+        String(64), nullable=False, comment="Tenant namespace identifier"
+    )
+    url: Mapped[str] = mapped_column(
+        String(2048), nullable=False, comment="Endpoint receiving POSTed batches"
+    )
+    secret: Mapped[Optional[str]] = mapped_column(
+        String(256), nullable=True, comment="HMAC-SHA256 signing key (optional)"
+    )
+    entities: Mapped[List[str]] = mapped_column(
+        JSON, nullable=False, default=list, comment="Entity types to send"
+    )
+    active: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=True, comment="Paused hooks receive nothing"
+    )
+    cursor: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default=text("0"),
+        comment="Last change seq turned into deliveries",
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+
+
+class WebhookDelivery(Base):
+    __tablename__ = "webhook_deliveries"
+    __table_args__ = (
+        # The retry queue: due deliveries in the order they fall due
+        Index("ix_webhook_deliveries_status_due", "status", "next_attempt_at"),
+        Index("ix_webhook_deliveries_webhook", "webhook_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(
+        primary_key=True, autoincrement=True, comment="Surrogate numeric identifier"
+    )
+    webhook_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("webhooks.id", ondelete="CASCADE"),
+        nullable=False,
+        comment="Target subscription",
+    )
+    tenant_id: Mapped[str] = mapped_column(
+        String(64), nullable=False, comment="Tenant namespace identifier"
+    )
+    payload: Mapped[Dict[str, Any]] = mapped_column(
+        JSON, nullable=False, comment="Batch body, sent as-is on every attempt"
+    )
+    status: Mapped[str] = mapped_column(
+        String(16),
+        nullable=False,
+        default="pending",
+        comment="'pending' | 'delivered' | 'failed'",
+    )
+    attempts: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, comment="Attempts made so far"
+    )
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, comment="When the next attempt is due (UTC)"
+    )
+    last_error: Mapped[Optional[str]] = mapped_column(
+        Text, nullable=True, comment="Error or status of the last failed attempt"
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
@@ -0,0 +1,93 @@
+# app/routers/admin.py
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+
+from app.deps import require_scope
+from app.schemas import ProfileStart, ProfileStatus
+from app.utils.profiling import profiler
+
+router = APIRouter(prefix="/v1/admin", tags=["admin"])
+
+ADMIN_SCOPE = "admin"
+
+RESULT_MEDIA_TYPES = {
+    "pstats": ("application/octet-stream", "prof"),
+    "text": ("text/plain; charset=utf-8", "txt"),
+    "collapsed": ("text/plain; charset=utf-8", "folded"),
+}
+
+
+@router.get("/profile", response_model=ProfileStatus)
+async def profile_status(payload: dict = Depends(require_scope(ADMIN_SCOPE))):
+    return profiler.status()
+
+
+@router.post(
+    "/profile/start",
+    response_model=ProfileStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def start_profile(
+    body: ProfileStart,
+    payload: dict = Depends(require_scope(ADMIN_SCOPE)),
+):
+    """
+    Profile this worker for the next `requests` requests (optionally only
+    those under `path_prefix`) and/or for `seconds`, whichever ends first.
+    With multiple workers, the session runs on the one serving this call;
+    the returned `pid` identifies it.
+    """
+    if body.requests is None and body.seconds is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Set 'requests' and/or 'seconds'",
+        )
+    try:
+        profiler.start(
+            body.mode,
+            body.requests,
+            body.seconds,
+            path_prefix=body.path_prefix,
+            interval=body.interval_ms / 1000,
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return profiler.status()
+
+
+@router.post("/profile/stop", response_model=ProfileStatus)
+async def stop_profile(payload: dict = Depends(require_scope(ADMIN_SCOPE))):
+    profiler.stop()
+    return profiler.status()
+
+
+@router.get("/profile/result")
+async def profile_result(
+    format: str | None = Query(
+        None, pattern="^(pstats|text|collapsed)$", description="Defaults per mode"
+    ),
+    payload: dict = Depends(require_scope(ADMIN_SCOPE)),
+):
+    """
+    Download the last finished profile: `pstats` (load with
+    `pstats.Stats(path)` or snakeviz) or `text` for cProfile sessions,
+    `collapsed` stacks (flamegraph.pl / speedscope) for sampling sessions.
+    """
+    if profiler.active:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Profiling still running"
+        )
+    fmt = format or ("collapsed" if profiler.mode == "sampling" else "pstats")
+    try:
+        data = profiler.result(fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if data is None:
+        raise HTTPException(status_code=404, detail="No profile recorded")
+
+    media_type, ext = RESULT_MEDIA_TYPES[fmt]
+    name = f"profile-{profiler.status()['pid']}-{int(profiler.started_at or 0)}.{ext}"
+    return Response(
+        content=data,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
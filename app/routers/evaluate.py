@@ -1,27 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Any
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Optional
 
+import orjson
+
+from app.config import settings
 from app.deps import get_db, require_tenant
 from app.models import Flag
 from app.schemas import EvaluateRequest, EvaluateResponse
-from app.services.cache import TTLCache
+from app.services.cache import (
+    flag_cache,
+    flag_cache_entry,
+    get_flag_cache_key,
+    last_flag_write,
+    tenant_cache,
+)
+from app.services.exposures import exposures
 from app.services.flag_eval import evaluate_flag
+from app.services.snapshot import node_snapshot
+from app.utils.timing import StageTimer
 
 router = APIRouter(prefix="/v1", tags=["evaluate"])
 
-flag_cache = TTLCache(ttl_seconds=15)
-FLAG_CACHE_PREFIX = "flag:"
-
-
-def get_flag_cache_key(tenant: str, flag_key: str) -> str:
-    return f"{FLAG_CACHE_PREFIX}{tenant}:{flag_key}"
-
 
-def flag_to_dict(flag: Flag) -> dict[str, Any]:
-    # Convert Flag SQLAlchemy object to dict
-    return {c.name: getattr(flag, c.name) for c in flag.__table__.columns}
+def start_stage_timer() -> Optional[StageTimer]:
+    # Declared before require_tenant so the "tenant" stage covers it
+    if settings.evaluate_stage_timing or settings.evaluate_server_timing:
+        return StageTimer()
+    return None
 
 
 @router.post(
@@ -29,35 +38,241 @@ def flag_to_dict(flag: Flag) -> dict[str, Any]:
 )
 async def evaluate(
     body: EvaluateRequest,
+    timer: Optional[StageTimer] = Depends(start_stage_timer),
     tenant: str = Depends(require_tenant),
     db: AsyncSession = Depends(get_db),
 ):
+    if timer is not None:
+        timer.mark("tenant")
     cache_key = get_flag_cache_key(tenant, body.flag_key)
 
     # Check cache first
-    flag_data = flag_cache.get(cache_key)
+    flag_data, cache_state = flag_cache.lookup(cache_key)
+    if timer is not None:
+        timer.mark("cache")
+
+    if not flag_data and settings.snapshot_enabled:
+        # Shared node snapshot, unless this worker changed the flag since
+        flag_data = node_snapshot.get_flag(
+            tenant, body.flag_key, newer_than=last_flag_write(tenant, body.flag_key)
+        )
+        if flag_data:
+            flag_cache.set(cache_key, flag_data)
+            if timer is not None:
+                timer.mark("snapshot")
 
     if not flag_data:
         # Query DB using the column names
-        stmt = select(Flag).where(Flag.key == body.flag_key, Flag.tenant_id == tenant)
+        stmt = select(Flag).where(
+            Flag.key == body.flag_key,
+            Flag.tenant_id == tenant,
+            Flag.deleted_at.is_(None),
+        )
         flag_obj = (await db.execute(stmt)).scalar_one_or_none()
 
         if not flag_obj:
             raise HTTPException(status_code=404, detail="Flag not found")
 
-        flag_data = flag_to_dict(flag_obj)
+        flag_data = flag_cache_entry(flag_obj)
         flag_cache.set(cache_key, flag_data)
+        if timer is not None:
+            timer.mark("db")
 
     # Evaluate flag
     result = evaluate_flag(flag_data, tenant, body.user)
+    record_exposure(tenant, body.flag_key, body.user, result)
+    if timer is not None:
+        timer.mark("eval")
+
+    # Same bytes as serializing EvaluateResponse, but timed and without
+    # a round trip through the pydantic model
+    content = encode_evaluate_response(result)
+    headers = None
+    if timer is not None:
+        timer.mark("serialize")
+        if settings.evaluate_stage_timing:
+            timer.observe(cache_state)
+        if settings.evaluate_server_timing:
+            headers = {"Server-Timing": timer.server_timing()}
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def record_exposure(tenant: str, flag_key: str, user: dict, result: dict) -> None:
+    """Queue an exposure event when a variant was actually served."""
+    variant = result.get("variant")
+    if variant and exposures.enabled:
+        exposures.record(
+            tenant,
+            flag_key,
+            variant,
+            str(user.get("id") or "anonymous"),
+            result.get("rule_id"),
+        )
+
 
-    # Ensure variant/reason are strings
-    variant = result.get("variant") or "none"
-    reason = result.get("reason") or "unknown"
+# ---------- Fast path ----------
+# Cached evaluations skip routing, dependency injection and pydantic models.
+# Anything outside the happy path (unknown tenant, cache miss, unusual body
+# or content type) is replayed to the regular route above, so error
+# responses and first-touch behaviour are unchanged.
 
-    return EvaluateResponse(
-        variant=variant,
-        reason=reason,
-        rule_id=result.get("rule_id"),
-        details=result.get("details") or {},
+EVALUATE_PATH = "/v1/evaluate"
+_JSON_HEADERS = [(b"content-type", b"application/json")]
+_encoded_strings: dict[Optional[str], bytes] = {None: b"null"}
+
+
+def _encode_str(value: Optional[str]) -> bytes:
+    """JSON-encode a string exactly like JSONResponse, memoized per value."""
+    encoded = _encoded_strings.get(value)
+    if encoded is None:
+        if len(_encoded_strings) > 10_000:
+            _encoded_strings.clear()
+            _encoded_strings[None] = b"null"
+        encoded = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        _encoded_strings[value] = encoded
+    return encoded
+
+
+def encode_evaluate_response(result: dict) -> bytes:
+    """Byte-identical to serializing EvaluateResponse through the route."""
+    details = result.get("details") or {}
+    if len(details) == 1 and type(details.get("bucket")) is float:
+        details_bytes = b'{"bucket":' + repr(details["bucket"]).encode() + b"}"
+    else:
+        details_bytes = json.dumps(
+            details, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+    return b"".join(
+        (
+            b'{"variant":',
+            _encode_str(result.get("variant") or "none"),
+            b',"reason":',
+            _encode_str(result.get("reason") or "unknown"),
+            b',"rule_id":',
+            _encode_str(result.get("rule_id")),
+            b',"details":',
+            details_bytes,
+            b"}",
+        )
     )
+
+
+def _is_json_content_type(value: bytes) -> bool:
+    media_type = value.split(b";", 1)[0].strip().lower()
+    return media_type == b"application/json" or (
+        media_type.startswith(b"application/") and media_type.endswith(b"+json")
+    )
+
+
+def fast_evaluate(
+    scope: Scope, body: bytes, timer: Optional[StageTimer] = None
+) -> Optional[bytes]:
+    """Return the encoded response for a cached evaluation, or None to fall back."""
+    tenant = None
+    for name, value in scope["headers"]:
+        if name == b"x-tenant-id" and tenant is None:
+            tenant = value.decode("latin-1")
+        elif name == b"content-type" and not _is_json_content_type(value):
+            return None
+    if not tenant or not body or not tenant_cache.get(tenant):
+        return None
+    if timer is not None:
+        timer.mark("tenant")
+
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None
+    if type(payload) is not dict:
+        return None
+    flag_key = payload.get("flag_key")
+    user = payload.get("user")
+    if type(flag_key) is not str or type(user) is not dict:
+        return None
+    if timer is not None:
+        timer.mark("parse")
+
+    # lookup(), not get(): an expired entry must stay for the regular route,
+    # which falls back here and reports it as cache="stale"
+    flag_data, cache_state = flag_cache.lookup(get_flag_cache_key(tenant, flag_key))
+    if cache_state != "hit":
+        return None
+    if timer is not None:
+        timer.mark("cache")
+
+    result = evaluate_flag(flag_data, tenant, user)
+    record_exposure(tenant, flag_key, user, result)
+    if timer is not None:
+        timer.mark("eval")
+    encoded = encode_evaluate_response(result)
+    if timer is not None:
+        timer.mark("serialize")
+    # What require_tenant would have recorded; metrics label the tenant from it
+    scope.setdefault("state", {})["tenant"] = tenant
+    return encoded
+
+
+class EvaluateFastPath:
+    """Pure ASGI middleware answering cached POST /v1/evaluate requests directly."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["path"] != EVALUATE_PATH
+            or scope["method"] != "POST"
+            or not settings.evaluate_fast_path
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+
+        timer = None
+        if settings.evaluate_stage_timing or settings.evaluate_server_timing:
+            timer = StageTimer()
+        encoded = fast_evaluate(scope, body, timer)
+        if encoded is None:
+            await self.app(scope, _replay(body, receive), send)
+            return
+
+        # Same route label the router would have set (used by metrics)
+        scope["route"] = evaluate_route
+
+        headers = [(b"content-length", str(len(encoded)).encode())] + _JSON_HEADERS
+        if timer is not None:
+            if settings.evaluate_stage_timing:
+                timer.observe("hit")
+            if settings.evaluate_server_timing:
+                headers.append((b"server-timing", timer.server_timing().encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": encoded})
+
+
+evaluate_route = next(
+    r for r in router.routes if getattr(r, "path", None) == EVALUATE_PATH
+)
+
+
+def _replay(body: bytes, receive: Receive) -> Receive:
+    """Hand the already-buffered body to the downstream app once."""
+    sent = False
+
+    async def replay() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
@@ -0,0 +1,78 @@
+# app/routers/experiments.py
+import time
+from typing import List, Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.deps import SessionLocal, get_db, require_tenant, require_tenant_scope
+from app.models import Conversion
+from app.schemas import ConversionAccepted, ConversionIn, ExperimentResults
+from app.services.results import epoch, from_epoch, results_engine
+from app.utils.serialization import FastJSONResponse
+
+router = APIRouter(prefix="/v1", tags=["experiments"])
+
+MAX_CONVERSIONS_PER_REQUEST = 10_000
+
+
+@router.post(
+    "/conversions",
+    response_model=ConversionAccepted,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def ingest_conversions(
+    body: Union[ConversionIn, List[ConversionIn]],
+    tenant: str = Depends(require_tenant),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Record one conversion or a JSON array of them. Each is attributed to the
+    variant the user was first exposed to, for every flag they have seen.
+    """
+    items = body if isinstance(body, list) else [body]
+    if len(items) > MAX_CONVERSIONS_PER_REQUEST:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_CONVERSIONS_PER_REQUEST} conversions per request",
+        )
+    if not items:
+        return ConversionAccepted(accepted=0)
+
+    now = time.time()
+    rows = [
+        (c.user_id, c.event, epoch(c.ts) if c.ts is not None else now) for c in items
+    ]
+    await db.execute(
+        insert(Conversion),
+        [
+            {
+                "tenant_id": tenant,
+                "user_id": user_id,
+                "event": event,
+                "ts": from_epoch(ts),
+            }
+            for user_id, event, ts in rows
+        ],
+    )
+    await db.commit()
+    results_engine.add_conversions(tenant, rows)
+    return ConversionAccepted(accepted=len(rows))
+
+
+@router.get("/experiments/{flag_key}/results", response_model=ExperimentResults)
+async def experiment_results(
+    flag_key: str,
+    request: Request,
+    payload: dict = Depends(require_tenant_scope("flags:rw")),
+    event: Optional[str] = Query(None, description="Only report this metric"),
+    confidence: float = Query(0.95, gt=0.5, lt=1.0),
+):
+    """
+    Per-variant exposures and, for each conversion event, conversion rate,
+    Wilson confidence interval, lift and p-value against the control variant
+    ("control" if present, otherwise the first variant seen).
+    """
+    flag = await results_engine.get(SessionLocal, request.state.tenant, flag_key)
+    return FastJSONResponse(content=flag.summary(flag_key, confidence, event))
@@ -1,22 +1,67 @@
 # app/routers/flags.py
-from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, Depends, Request, status, HTTPException
-from fastapi.responses import JSONResponse
+import time
+from typing import List, Dict, Any, Optional, cast
+from fastapi import APIRouter, Depends, Query, Request, status, HTTPException
 from fastapi import Response
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from sqlalchemy import Table, bindparam, insert, select, update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
-from app.deps import get_db, require_auth
+from app.deps import get_db, require_auth, require_tenant_scope
 from app.models import Flag
-from app.schemas import FlagIn, FlagOut
-from app.services.audit import record_audit
-from app.services.cache import invalidate_flag_cache
+from app.schemas import BulkItemResult, BulkResult, FlagIn, FlagOut
+from app.services.audit import record_audit, record_audit_bulk
+from app.services.bulk import build_bulk_result, parse_bulk_body, validate_bulk_items
+from app.services.cache import (
+    get_flag_body,
+    invalidate_flag_cache,
+    invalidate_tenant_flag_cache,
+    set_flag_body,
+)
+from app.services.changes import PendingChange, record_changes
+from app.utils.pagination import (
+    NEXT_CURSOR_HEADER,
+    check_if_match,
+    decode_cursor,
+    encode_cursor,
+    etag_matches,
+    not_modified,
+    parse_fields,
+    version_etag,
+)
+from app.utils.serialization import FastJSONResponse, dumps, flag_to_dict
 
 router = APIRouter(prefix="/v1/flags", tags=["flags"])
 
+FLAG_DATA_COLUMNS = ("description", "state", "variants", "rules")
+
+
+def flag_columns(flag_in: FlagIn) -> Dict[str, Any]:
+    """Map a FlagIn payload onto Flag column values (rules/variants as plain lists)."""
+    # Ensure rules and variants are always lists
+    rules: List[Dict[str, Any]] = []
+    for r in flag_in.rules or []:
+        rollout_dict: Optional[Dict[str, Any]] = None
+        if r.rollout:
+            rollout_dict = {
+                **r.rollout.__dict__,
+                "distribution": [d.__dict__ for d in r.rollout.distribution or []],
+            }
+        rule_dict = {**r.__dict__, "rollout": rollout_dict}
+        rules.append(rule_dict)
+
+    variants: List[Dict[str, Any]] = [v.__dict__ for v in flag_in.variants or []]
+
+    return {
+        "description": flag_in.description,
+        "state": flag_in.state,
+        "variants": variants,
+        "rules": rules,
+    }
+
 
 # -------------------------
 # CREATE FLAG
@@ -39,47 +84,36 @@ async def create_flag(
     res = await db.execute(q)
     existing: Optional[Flag] = res.scalars().first()
     if existing:
-        return JSONResponse(
-            content=jsonable_encoder(existing, by_alias=True),
+        return FastJSONResponse(
+            content=flag_to_dict(existing),
             status_code=status.HTTP_200_OK,
+            headers={"ETag": version_etag(existing.version)},
         )
 
-    # Ensure rules and variants are always lists
-    rules: List[Dict[str, Any]] = []
-    for r in flag_in.rules or []:
-        rollout_dict: Optional[Dict[str, Any]] = None
-        if r.rollout:
-            rollout_dict = {
-                **r.rollout.__dict__,
-                "distribution": [d.__dict__ for d in r.rollout.distribution or []],
-            }
-        rule_dict = {**r.__dict__, "rollout": rollout_dict}
-        rules.append(rule_dict)
-
-    variants: List[Dict[str, Any]] = [v.__dict__ for v in flag_in.variants or []]
-
     new_flag = Flag(
         tenant_id=tenant,
         key=flag_in.key,
-        description=flag_in.description,
-        state=flag_in.state,
-        variants=variants,
-        rules=rules,
+        **flag_columns(flag_in),
         created_at=datetime.utcnow(),
         updated_at=datetime.utcnow(),
     )
 
     db.add(new_flag)
     try:
+        await db.flush()
+        await record_changes(
+            db, tenant, [("flag", new_flag.key, "create", new_flag.version)]
+        )
         await db.commit()
     except IntegrityError:
         await db.rollback()
         res = await db.execute(q)
         existing = res.scalars().first()
         if existing:
-            return JSONResponse(
-                content=jsonable_encoder(existing, by_alias=True),
+            return FastJSONResponse(
+                content=flag_to_dict(existing),
                 status_code=status.HTTP_200_OK,
+                headers={"ETag": version_etag(existing.version)},
             )
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="Conflict creating flag"
@@ -95,19 +129,160 @@ async def create_flag(
         new_flag.key,
         "create",
         before=None,
-        after=jsonable_encoder(new_flag, by_alias=True),
+        after=flag_to_dict(new_flag),
     )
     try:
         invalidate_flag_cache(tenant, new_flag.key)
     except Exception:
         pass
 
-    return JSONResponse(
-        content=jsonable_encoder(new_flag, by_alias=True),
+    return FastJSONResponse(
+        content=flag_to_dict(new_flag),
         status_code=status.HTTP_201_CREATED,
+        headers={"ETag": version_etag(new_flag.version)},
     )
 
 
+# -------------------------
+# BULK UPSERT FLAGS
+# -------------------------
+@router.post(":bulk", response_model=BulkResult)
+async def bulk_upsert_flags(
+    request: Request,
+    dry_run: bool = Query(False, description="Report the diff without writing"),
+    payload: dict = Depends(require_tenant_scope("flags:rw")),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Create or update many flags in one transaction.
+    Body is NDJSON (`application/x-ndjson`) or a JSON array of FlagIn objects.
+    Current state is loaded in one query; only new or changed flags are written
+    (executemany inserts/updates + bulk audit rows), then the tenant's flag
+    cache is invalidated once. Invalid items are reported per index and skipped.
+    Soft-deleted flags with a submitted key are revived.
+    """
+    tenant = request.state.tenant
+    user = request.state.user
+
+    items, errors = parse_bulk_body(
+        await request.body(), request.headers.get("content-type")
+    )
+    valid = validate_bulk_items(items, FlagIn, errors)
+
+    keys = [flag_in.key for _, flag_in in valid]
+    existing_rows = {}
+    if keys:
+        q = select(
+            Flag.id,
+            Flag.key,
+            Flag.version,
+            Flag.deleted_at,
+            *(getattr(Flag, c) for c in FLAG_DATA_COLUMNS),
+        ).where(Flag.tenant_id == tenant, Flag.key.in_(keys))
+        existing_rows = {row.key: row for row in (await db.execute(q)).all()}
+
+    now = datetime.utcnow()
+    inserts: List[Dict[str, Any]] = []
+    updates: List[Dict[str, Any]] = []
+    audits: List[Dict[str, Any]] = []
+    changes: List[PendingChange] = []
+    results: List[BulkItemResult] = []
+
+    for index, flag_in in valid:
+        columns = flag_columns(flag_in)
+        after = jsonable_encoder({"tenant_id": tenant, "key": flag_in.key, **columns})
+        row = existing_rows.get(flag_in.key)
+
+        if row is None:
+            inserts.append(
+                {
+                    "tenant_id": tenant,
+                    "key": flag_in.key,
+                    **columns,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            )
+            action = "create"
+            audits.append(_bulk_audit(flag_in.key, action, None, after))
+            changes.append(("flag", flag_in.key, action, 1))
+        else:
+            current = {c: getattr(row, c) for c in FLAG_DATA_COLUMNS}
+            if row.deleted_at is None and jsonable_encoder(current) == jsonable_encoder(
+                columns
+            ):
+                action = "unchanged"
+            else:
+                # Reviving a soft-deleted key counts as a create
+                action = "create" if row.deleted_at is not None else "update"
+                updates.append(
+                    {
+                        "b_id": row.id,
+                        "b_version": row.version,
+                        **columns,
+                        "deleted_at": None,
+                        "updated_at": now,
+                    }
+                )
+                before = (
+                    None
+                    if row.deleted_at is not None
+                    else jsonable_encoder(
+                        {"tenant_id": tenant, "key": flag_in.key, **current}
+                    )
+                )
+                audits.append(_bulk_audit(flag_in.key, action, before, after))
+                changes.append(("flag", flag_in.key, action, row.version + 1))
+        results.append(BulkItemResult(index=index, key=flag_in.key, action=action))
+
+    if not dry_run and (inserts or updates):
+        try:
+            if inserts:
+                await db.execute(insert(Flag), inserts)
+            if updates:
+                # Core executemany guarded on version; a short rowcount means a
+                # concurrent writer got in between the diff and the update.
+                table = cast(Table, Flag.__table__)
+                stmt = (
+                    update(table)
+                    .where(
+                        table.c.id == bindparam("b_id"),
+                        table.c.version == bindparam("b_version"),
+                    )
+                    .values(version=bindparam("b_version") + 1)
+                )
+                result = await db.execute(stmt, updates)
+                if result.rowcount != len(updates):
+                    raise StaleDataError("flags changed during bulk upsert")
+            await record_changes(db, tenant, changes)
+            await record_audit_bulk(db, tenant, user, audits)
+            await db.commit()
+        except (IntegrityError, StaleDataError):
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Conflict applying bulk flags; retry the request",
+            )
+        try:
+            invalidate_tenant_flag_cache(tenant)
+        except Exception:
+            pass
+
+    return build_bulk_result(results, errors, dry_run)
+
+
+def _bulk_audit(
+    key: str, action: str, before: Optional[Dict[str, Any]], after: Dict[str, Any]
+) -> Dict[str, Any]:
+    return {
+        "entity": "flag",
+        "entity_key": key,
+        "action": action,
+        "before": before,
+        "after": after,
+    }
+
+
 # -------------------------
 # UPDATE FLAG
 # -------------------------
@@ -134,27 +309,25 @@ async def update_flag(
             status_code=status.HTTP_404_NOT_FOUND, detail="Flag not found"
         )
 
-    rules: List[Dict[str, Any]] = []
-    for r in flag_in.rules or []:
-        rollout_dict: Optional[Dict[str, Any]] = None
-        if r.rollout:
-            rollout_dict = {
-                **r.rollout.__dict__,
-                "distribution": [d.__dict__ for d in r.rollout.distribution or []],
-            }
-        rule_dict = {**r.__dict__, "rollout": rollout_dict}
-        rules.append(rule_dict)
+    check_if_match(request, existing.version)
 
-    variants: List[Dict[str, Any]] = [v.__dict__ for v in flag_in.variants or []]
-
-    existing.description = flag_in.description
-    existing.state = flag_in.state
-    existing.rules = rules
-    existing.variants = variants
+    for column, value in flag_columns(flag_in).items():
+        setattr(existing, column, value)
     existing.updated_at = datetime.utcnow()
 
     db.add(existing)
-    await db.commit()
+    try:
+        await db.flush()
+        await record_changes(
+            db, tenant, [("flag", flag_key, "update", existing.version)]
+        )
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Flag was modified concurrently; retry with the latest version",
+        )
     await db.refresh(existing)
 
     await record_audit(
@@ -165,16 +338,17 @@ async def update_flag(
         flag_key,
         "update",
         before=None,
-        after=jsonable_encoder(existing, by_alias=True),
+        after=flag_to_dict(existing),
     )
     try:
         invalidate_flag_cache(tenant, existing.key)
     except Exception:
         pass
 
-    return JSONResponse(
-        content=jsonable_encoder(existing, by_alias=True),
+    return FastJSONResponse(
+        content=flag_to_dict(existing),
         status_code=status.HTTP_200_OK,
+        headers={"ETag": version_etag(existing.version)},
     )
 
 
@@ -203,9 +377,22 @@ async def delete_flag(
             status_code=status.HTTP_404_NOT_FOUND, detail="Flag not found"
         )
 
+    check_if_match(request, existing.version)
+
     existing.deleted_at = datetime.utcnow()
     db.add(existing)
-    await db.commit()
+    try:
+        await db.flush()
+        await record_changes(
+            db, tenant, [("flag", flag_key, "delete", existing.version)]
+        )
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Flag was modified concurrently; retry with the latest version",
+        )
 
     # Audit + cache
     await record_audit(
@@ -215,7 +402,7 @@ async def delete_flag(
         "flag",
         flag_key,
         "delete",
-        before=jsonable_encoder(existing, by_alias=True),
+        before=flag_to_dict(existing),
         after=None,
     )
     try:
@@ -227,6 +414,73 @@ async def delete_flag(
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
+# -------------------------
+# LIST FLAGS
+# -------------------------
+FLAG_LIST_FIELDS = (
+    "key",
+    "description",
+    "state",
+    "variants",
+    "rules",
+    "version",
+    "created_at",
+    "updated_at",
+)
+FLAG_DEFAULT_FIELDS = ("key", "description", "state", "variants", "rules", "version")
+
+
+@router.get("", response_model=List[FlagOut])
+async def list_flags(
+    request: Request,
+    payload: dict = Depends(require_tenant_scope("flags:rw")),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    state: Optional[str] = Query(None, pattern="^(on|off)$"),
+    updated_since: Optional[datetime] = Query(None),
+    prefix: Optional[str] = Query(None, description="Only keys starting with this"),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated projection, e.g. 'key,state,updated_at'"
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List live (non-deleted) flags ordered by key with keyset pagination.
+    - `cursor`: resume after the last key of the previous page
+    - `state` / `updated_since` / `prefix`: filters
+    - `fields`: projection; omit `rules` for lightweight listings
+    The next page cursor is returned in the `X-Next-Cursor` header.
+    """
+    tenant = request.state.tenant
+    columns = parse_fields(fields, FLAG_LIST_FIELDS, FLAG_DEFAULT_FIELDS)
+
+    # Served by ix_flags_tenant_live_key (partial on deleted_at IS NULL)
+    q = select(*(getattr(Flag, c) for c in columns)).where(
+        Flag.tenant_id == tenant, Flag.deleted_at.is_(None)
+    )
+    if state:
+        q = q.where(Flag.state == state)
+    if updated_since:
+        q = q.where(Flag.updated_at >= updated_since)
+    if prefix:
+        q = q.where(Flag.key.startswith(prefix, autoescape=True))
+    if cursor:
+        q = q.where(Flag.key > decode_cursor(cursor))
+    q = q.order_by(Flag.key).limit(limit + 1)
+
+    rows = (await db.execute(q)).all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].key)
+
+    return FastJSONResponse(
+        content=[row._asdict() for row in rows],
+        status_code=status.HTTP_200_OK,
+        headers=headers,
+    )
+
+
 # -------------------------
 # GET FLAG
 # -------------------------
@@ -241,6 +495,27 @@ async def get_flag(
 ):
     tenant = request.state.tenant
 
+    # Hot path: serialized body cached per version, keyed like the flag cache
+    cached = get_flag_body(tenant, flag_key)
+    if cached is not None:
+        version, body = cached
+        etag = version_etag(version)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return FastJSONResponse(content=body, headers={"ETag": etag})
+
+    # Taken before reading: a write recorded after this may not be in the row
+    read_at = time.time()
+
+    # Revalidation: compare the client's version against the row version only
+    if request.headers.get("If-None-Match"):
+        q_version = select(Flag.version).where(
+            Flag.tenant_id == tenant, Flag.key == flag_key, Flag.deleted_at.is_(None)
+        )
+        current = (await db.execute(q_version)).scalar_one_or_none()
+        if current is not None and etag_matches(request, version_etag(current)):
+            return not_modified(version_etag(current))
+
     q = select(Flag).where(
         Flag.tenant_id == tenant, Flag.key == flag_key, Flag.deleted_at.is_(None)
     )
@@ -251,7 +526,10 @@ async def get_flag(
             status_code=status.HTTP_404_NOT_FOUND, detail="Flag not found"
         )
 
-    return JSONResponse(
-        content=jsonable_encoder(existing, by_alias=True),
+    body = dumps(flag_to_dict(existing))
+    set_flag_body(tenant, flag_key, existing.version, body, read_at)
+    return FastJSONResponse(
+        content=body,
         status_code=status.HTTP_200_OK,
+        headers={"ETag": version_etag(existing.version)},
     )
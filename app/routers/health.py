@@ -1,16 +1,30 @@
 from fastapi import APIRouter
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.services.readiness import live, readiness
 
 router = APIRouter()
 
 
 @router.get("/healthz", response_class=PlainTextResponse)
 async def healthz():
-    """Basic health check"""
+    """Liveness: fails only if the event loop is wedged"""
+    if not live():
+        return PlainTextResponse("stalled", status_code=503)
     return "ok"
 
 
 @router.get("/readyz", response_class=PlainTextResponse)
-async def readyz():
-    """Basic Readiness check"""
+async def readyz(verbose: bool = False):
+    """Readiness: database reachable, caches warm and event loop responsive.
+
+    `?verbose=1` returns every check as JSON for debugging.
+    """
+    result = await readiness()
+    code = 200 if result["ready"] else 503
+    if verbose:
+        return JSONResponse(result, status_code=code)
+    if not result["ready"]:
+        failing = [name for name, c in result["checks"].items() if not c["ok"]]
+        return PlainTextResponse(f"not ready: {', '.join(failing)}", status_code=code)
     return "ready"
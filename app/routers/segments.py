@@ -1,20 +1,38 @@
 # app/routers/segments.py
 
-from typing import List, Optional
+from typing import List, Optional, cast
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, Request, status, HTTPException
-from fastapi.responses import JSONResponse, Response
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, Query, Request, status, HTTPException
+from fastapi.responses import Response
+from sqlalchemy import Table, bindparam, func, insert, select, update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.deps import get_db, require_auth
+from app.deps import get_db, require_auth, require_tenant_scope
 from app.models import Segment
-from app.schemas import SegmentIn, SegmentOut
-from app.services.audit import record_audit
-from app.services.cache import invalidate_segment_cache
+from app.schemas import BulkItemResult, BulkResult, SegmentIn, SegmentOut
+from app.services.audit import record_audit, record_audit_bulk
+from app.services.bulk import build_bulk_result, parse_bulk_body, validate_bulk_items
+from app.services.cache import (
+    get_segment_list_state,
+    invalidate_segment_cache,
+    set_segment_list_state,
+)
+from app.services.changes import PendingChange, record_changes
+from app.utils.pagination import (
+    NEXT_CURSOR_HEADER,
+    check_if_match,
+    decode_cursor,
+    encode_cursor,
+    etag_matches,
+    make_etag,
+    not_modified,
+    parse_fields,
+    version_etag,
+)
+from app.utils.serialization import FastJSONResponse, segment_to_dict
 
 router = APIRouter(prefix="/v1/segments", tags=["segments"])
 
@@ -38,9 +56,10 @@ async def create_segment(
     res = await db.execute(q)
     existing: Optional[Segment] = res.scalars().first()
     if existing:
-        return JSONResponse(
-            content=jsonable_encoder(existing, by_alias=True),
+        return FastJSONResponse(
+            content=segment_to_dict(existing),
             status_code=status.HTTP_200_OK,
+            headers={"ETag": version_etag(existing.version)},
         )
 
     # Persist criteria (JSON) and timestamps
@@ -54,6 +73,10 @@ async def create_segment(
 
     db.add(new_segment)
     try:
+        await db.flush()
+        await record_changes(
+            db, tenant, [("segment", new_segment.key, "create", new_segment.version)]
+        )
         await db.commit()
     except IntegrityError:
         # Retry fetch if conflict detected
@@ -61,9 +84,10 @@ async def create_segment(
         res = await db.execute(q)
         existing = res.scalars().first()
         if existing:
-            return JSONResponse(
-                content=jsonable_encoder(existing, by_alias=True),
+            return FastJSONResponse(
+                content=segment_to_dict(existing),
                 status_code=status.HTTP_200_OK,
+                headers={"ETag": version_etag(existing.version)},
             )
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="Conflict creating segment"
@@ -80,7 +104,7 @@ async def create_segment(
         new_segment.key,
         "create",
         before=None,
-        after=jsonable_encoder(new_segment, by_alias=True),
+        after=segment_to_dict(new_segment),
     )
 
     try:
@@ -88,10 +112,142 @@ async def create_segment(
     except Exception:
         pass
 
-    return JSONResponse(
-        content=jsonable_encoder(new_segment, by_alias=True),
+    return FastJSONResponse(
+        content=segment_to_dict(new_segment),
         status_code=status.HTTP_201_CREATED,
+        headers={"ETag": version_etag(new_segment.version)},
+    )
+
+
+@router.post(":bulk", response_model=BulkResult)
+async def bulk_upsert_segments(
+    request: Request,
+    dry_run: bool = Query(False, description="Report the diff without writing"),
+    payload: dict = Depends(require_tenant_scope("segments:rw")),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Create or update many segments in one transaction.
+    Body is NDJSON (`application/x-ndjson`) or a JSON array of SegmentIn objects.
+    Existing criteria for the submitted keys are loaded in one query and only
+    segments whose criteria changed are written; audit rows are batched and
+    the tenant's segment caches are invalidated once at the end.
+    """
+    tenant = request.state.tenant
+    user = request.state.user
+
+    items, errors = parse_bulk_body(
+        await request.body(), request.headers.get("content-type")
     )
+    valid = validate_bulk_items(items, SegmentIn, errors)
+
+    keys = [segment_in.key for _, segment_in in valid]
+    existing_rows = {}
+    if keys:
+        q = select(Segment.id, Segment.key, Segment.version, Segment.criteria).where(
+            Segment.tenant_id == tenant, Segment.key.in_(keys)
+        )
+        existing_rows = {row.key: row for row in (await db.execute(q)).all()}
+
+    now = datetime.utcnow()
+    inserts = []
+    updates = []
+    audits = []
+    changes: List[PendingChange] = []
+    results: List[BulkItemResult] = []
+
+    for index, segment_in in valid:
+        criteria = segment_in.criteria or {}
+        after = {"tenant_id": tenant, "key": segment_in.key, "criteria": criteria}
+        row = existing_rows.get(segment_in.key)
+
+        if row is None:
+            action = "create"
+            inserts.append({**after, "created_at": now, "updated_at": now})
+            audits.append(_bulk_audit(segment_in.key, action, None, after))
+            changes.append(("segment", segment_in.key, action, 1))
+        elif row.criteria == criteria:
+            action = "unchanged"
+        else:
+            action = "update"
+            updates.append(
+                {
+                    "b_id": row.id,
+                    "b_version": row.version,
+                    "criteria": criteria,
+                    "updated_at": now,
+                }
+            )
+            before = {"tenant_id": tenant, "key": row.key, "criteria": row.criteria}
+            audits.append(_bulk_audit(segment_in.key, action, before, after))
+            changes.append(("segment", segment_in.key, action, row.version + 1))
+        results.append(BulkItemResult(index=index, key=segment_in.key, action=action))
+
+    if not dry_run and (inserts or updates):
+        try:
+            if inserts:
+                await db.execute(insert(Segment), inserts)
+            if updates:
+                # Core executemany guarded on version (see bulk_upsert_flags)
+                table = cast(Table, Segment.__table__)
+                stmt = (
+                    update(table)
+                    .where(
+                        table.c.id == bindparam("b_id"),
+                        table.c.version == bindparam("b_version"),
+                    )
+                    .values(version=bindparam("b_version") + 1)
+                )
+                result = await db.execute(stmt, updates)
+                if result.rowcount != len(updates):
+                    raise StaleDataError("segments changed during bulk upsert")
+            await record_changes(db, tenant, changes)
+            await record_audit_bulk(db, tenant, user, audits)
+            await db.commit()
+        except (IntegrityError, StaleDataError):
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Conflict applying bulk segments; retry the request",
+            )
+        try:
+            invalidate_segment_cache(tenant)
+        except Exception:
+            pass
+
+    return build_bulk_result(results, errors, dry_run)
+
+
+def _bulk_audit(key: str, action: str, before, after) -> dict:
+    return {
+        "entity": "segment",
+        "entity_key": key,
+        "action": action,
+        "before": before,
+        "after": after,
+    }
+
+
+SEGMENT_LIST_FIELDS = ("key", "criteria", "version", "created_at", "updated_at")
+SEGMENT_DEFAULT_FIELDS = ("key", "criteria", "version")
+
+
+async def segment_list_state(db: AsyncSession, tenant: str) -> str:
+    """
+    Change marker for a tenant's segments: row count plus latest update.
+    Cached until the next segment write (or the invalidation bus reports
+    one from another worker), and for at most `segment_list_state_ttl`
+    seconds, so unchanged lists skip the query.
+    """
+    state = get_segment_list_state(tenant)
+    if state is None:
+        q = select(func.count(Segment.id), func.max(Segment.updated_at)).where(
+            Segment.tenant_id == tenant
+        )
+        count, latest = (await db.execute(q)).one()
+        state = f"{count}:{latest.isoformat() if latest else '-'}"
+        set_segment_list_state(tenant, state)
+    return state
 
 
 @router.get("", response_model=List[SegmentOut])
@@ -100,15 +256,50 @@ async def list_segments(
     payload: dict = Depends(
         lambda r=Depends(require_auth): require_auth(r, required_scope="segments:ro")
     ),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    prefix: Optional[str] = Query(None, description="Only keys starting with this"),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated projection, e.g. 'key,updated_at'"
+    ),
     db: AsyncSession = Depends(get_db),
 ):
+    """
+    List segments ordered by key with keyset pagination.
+    - `cursor`: resume after the last key of the previous page
+    - `prefix`: key-prefix filter
+    - `fields`: projection; omit `criteria` for lightweight listings
+    The next page cursor is returned in the `X-Next-Cursor` header.
+    Responses carry a weak ETag; `If-None-Match` yields 304 when unchanged.
+    """
     tenant = request.state.tenant
+    columns = parse_fields(fields, SEGMENT_LIST_FIELDS, SEGMENT_DEFAULT_FIELDS)
 
-    # List segments; pagination and filters can be added later
-    q = select(Segment).where(Segment.tenant_id == tenant)
-    res = await db.execute(q)
-    segments = res.scalars().all()
-    return segments
+    state = await segment_list_state(db, tenant)
+    etag = make_etag(tenant, state, limit, cursor, prefix, ",".join(columns))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    q = select(*(getattr(Segment, c) for c in columns)).where(
+        Segment.tenant_id == tenant
+    )
+    if prefix:
+        q = q.where(Segment.key.startswith(prefix, autoescape=True))
+    if cursor:
+        q = q.where(Segment.key > decode_cursor(cursor))
+    q = q.order_by(Segment.key).limit(limit + 1)
+
+    rows = (await db.execute(q)).all()
+    headers = {"ETag": etag}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].key)
+
+    return FastJSONResponse(
+        content=[row._asdict() for row in rows],
+        status_code=status.HTTP_200_OK,
+        headers=headers,
+    )
 
 
 @router.get("/{key}", response_model=SegmentOut)
@@ -129,9 +320,10 @@ async def get_segment(
     if not segment:
         raise HTTPException(status_code=404, detail="Segment not found")
 
-    return JSONResponse(
-        content=jsonable_encoder(segment, by_alias=True),
+    return FastJSONResponse(
+        content=segment_to_dict(segment),
         status_code=status.HTTP_200_OK,
+        headers={"ETag": version_etag(segment.version)},
     )
 
 
@@ -155,13 +347,23 @@ async def update_segment(
     if not existing:
         raise HTTPException(status_code=404, detail="Segment not found")
 
-    before = jsonable_encoder(existing, by_alias=True)
+    check_if_match(request, existing.version)
+    before = segment_to_dict(existing)
 
     existing.criteria = segment_in.criteria or {}
     existing.updated_at = datetime.utcnow()
 
     db.add(existing)
-    await db.commit()
+    try:
+        await db.flush()
+        await record_changes(db, tenant, [("segment", key, "update", existing.version)])
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Segment was modified concurrently; retry with the latest version",
+        )
     await db.refresh(existing)
 
     await record_audit(
@@ -172,7 +374,7 @@ async def update_segment(
         key,
         "update",
         before=before,
-        after=jsonable_encoder(existing, by_alias=True),
+        after=segment_to_dict(existing),
     )
 
     try:
@@ -180,9 +382,10 @@ async def update_segment(
     except Exception:
         pass
 
-    return JSONResponse(
-        content=jsonable_encoder(existing, by_alias=True),
+    return FastJSONResponse(
+        content=segment_to_dict(existing),
         status_code=status.HTTP_200_OK,
+        headers={"ETag": version_etag(existing.version)},
     )
 
 
@@ -205,10 +408,20 @@ async def delete_segment(
     if not existing:
         raise HTTPException(status_code=404, detail="Segment not found")
 
-    before = jsonable_encoder(existing, by_alias=True)
+    check_if_match(request, existing.version)
+    before = segment_to_dict(existing)
 
     await db.delete(existing)
-    await db.commit()
+    try:
+        await db.flush()
+        await record_changes(db, tenant, [("segment", key, "delete", existing.version)])
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Segment was modified concurrently; retry with the latest version",
+        )
 
     await record_audit(
         db,
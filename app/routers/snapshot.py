@@ -0,0 +1,42 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import Response
+
+from app.deps import require_tenant_scope
+from app.services.snapshot_store import snapshot_store
+from app.utils.pagination import etag_matches, not_modified
+from app.utils.serialization import FastJSONResponse
+
+router = APIRouter(prefix="/v1/snapshot", tags=["snapshot"])
+
+# Compact binary form (app.services.snapshot_format) for SDKs that ask for it
+BINARY_MEDIA_TYPE = "application/x-flag-snapshot"
+
+
+@router.get("")
+async def get_snapshot(
+    request: Request,
+    since: Optional[int] = Query(
+        None, ge=0, description="Only changes after this snapshot version"
+    ),
+    payload: dict = Depends(require_tenant_scope("flags:rw")),
+):
+    """
+    All live flags and segments of the tenant, with the snapshot version as
+    ETag. `If-None-Match` or `since` at the current version answers 304;
+    an older `since` returns only what changed after it, plus removed keys.
+    """
+    tenant = request.state.tenant
+    state = await snapshot_store.get(tenant)
+    headers = {"ETag": state.etag}
+
+    if etag_matches(request, state.etag) or (
+        since is not None and since >= state.version
+    ):
+        return not_modified(state.etag)
+    if since is not None:
+        return FastJSONResponse(content=state.delta(since), headers=headers)
+    if BINARY_MEDIA_TYPE in request.headers.get("accept", ""):
+        return Response(state.binary(), media_type=BINARY_MEDIA_TYPE, headers=headers)
+    return FastJSONResponse(content=state.body, headers=headers)
@@ -0,0 +1,44 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.deps import require_tenant_scope
+from app.services.stream import hub
+
+router = APIRouter(prefix="/v1/stream", tags=["stream"])
+
+
+@router.get("")
+async def stream_changes(
+    request: Request,
+    last_event_id: Optional[int] = Header(None, ge=0),
+    since: Optional[int] = Query(
+        None, ge=0, description="Resume after this seq (for clients without headers)"
+    ),
+    payload: dict = Depends(require_tenant_scope("flags:rw")),
+):
+    """
+    Server-sent events for the tenant's flag and segment changes. Each
+    `change` event carries the change log seq as its id; reconnecting with
+    `Last-Event-ID` replays what was missed. A `resync` event means the
+    cursor is too old and the client should reload GET /v1/snapshot.
+    """
+    # Reserve the slot now: the body generator only starts once the response
+    # is sent, so checking here and subscribing there lets a burst through
+    sub = hub.subscribe(request.state.tenant)
+    if sub is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many open streams",
+            headers={"Retry-After": "5"},
+        )
+    cursor = last_event_id if last_event_id is not None else since
+    return StreamingResponse(
+        hub.events(sub, cursor),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Releases the slot even if the body never started (early disconnect)
+        background=BackgroundTask(hub.unsubscribe, sub),
+    )
@@ -0,0 +1,151 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.deps import get_db, require_tenant_scope
+from app.models import Webhook, WebhookDelivery
+from app.schemas import WebhookDeliveryOut, WebhookIn, WebhookOut
+from app.services.changes import tenant_position
+from app.services.webhooks import target_error
+
+router = APIRouter(prefix="/v1/webhooks", tags=["webhooks"])
+
+ENTITIES = {"flag", "segment"}
+
+
+async def get_webhook(db: AsyncSession, tenant: str, webhook_id: int) -> Webhook:
+    hook = await db.get(Webhook, webhook_id)
+    if hook is None or hook.tenant_id != tenant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Webhook not found"
+        )
+    return hook
+
+
+def validate_entities(webhook_in: WebhookIn) -> List[str]:
+    unknown = set(webhook_in.entities) - ENTITIES
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown entities: {', '.join(sorted(unknown))}",
+        )
+    return sorted(set(webhook_in.entities))
+
+
+async def validate_url(webhook_in: WebhookIn) -> str:
+    error = await target_error(webhook_in.url)
+    if error:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=error
+        )
+    return webhook_in.url
+
+
+@router.post("", response_model=WebhookOut, status_code=status.HTTP_201_CREATED)
+async def create_webhook(
+    webhook_in: WebhookIn,
+    request: Request,
+    payload: dict = Depends(require_tenant_scope("webhooks:rw")),
+    db: AsyncSession = Depends(get_db),
+):
+    """Subscribe a URL to the tenant's change notifications."""
+    tenant = request.state.tenant
+    url = await validate_url(webhook_in)
+    entities = validate_entities(webhook_in)
+    # Only changes from now on are sent
+    head, _ = await tenant_position(db, tenant)
+    hook = Webhook(
+        tenant_id=tenant,
+        url=url,
+        secret=webhook_in.secret,
+        entities=entities,
+        active=webhook_in.active,
+        cursor=head,
+    )
+    db.add(hook)
+    await db.commit()
+    await db.refresh(hook)
+    return WebhookOut.model_validate(hook)
+
+
+@router.get("", response_model=List[WebhookOut])
+async def list_webhooks(
+    request: Request,
+    payload: dict = Depends(require_tenant_scope("webhooks:rw")),
+    db: AsyncSession = Depends(get_db),
+):
+    hooks = await db.scalars(
+        select(Webhook)
+        .where(Webhook.tenant_id == request.state.tenant)
+        .order_by(Webhook.id)
+    )
+    return [WebhookOut.model_validate(h) for h in hooks]
+
+
+@router.get("/{webhook_id}", response_model=WebhookOut)
+async def get_webhook_by_id(
+    webhook_id: int,
+    request: Request,
+    payload: dict = Depends(require_tenant_scope("webhooks:rw")),
+    db: AsyncSession = Depends(get_db),
+):
+    hook = await get_webhook(db, request.state.tenant, webhook_id)
+    return WebhookOut.model_validate(hook)
+
+
+@router.put("/{webhook_id}", response_model=WebhookOut)
+async def update_webhook(
+    webhook_id: int,
+    webhook_in: WebhookIn,
+    request: Request,
+    payload: dict = Depends(require_tenant_scope("webhooks:rw")),
+    db: AsyncSession = Depends(get_db),
+):
+    """Replace the subscription; pausing it (`active: false`) stops deliveries."""
+    hook = await get_webhook(db, request.state.tenant, webhook_id)
+    hook.url = await validate_url(webhook_in)
+    hook.secret = webhook_in.secret
+    hook.entities = validate_entities(webhook_in)
+    hook.active = webhook_in.active
+    await db.commit()
+    await db.refresh(hook)
+    return WebhookOut.model_validate(hook)
+
+
+@router.delete("/{webhook_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_webhook(
+    webhook_id: int,
+    request: Request,
+    payload: dict = Depends(require_tenant_scope("webhooks:rw")),
+    db: AsyncSession = Depends(get_db),
+):
+    hook = await get_webhook(db, request.state.tenant, webhook_id)
+    await db.execute(
+        delete(WebhookDelivery).where(WebhookDelivery.webhook_id == hook.id)
+    )
+    await db.delete(hook)
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/{webhook_id}/deliveries", response_model=List[WebhookDeliveryOut])
+async def list_deliveries(
+    webhook_id: int,
+    request: Request,
+    delivery_status: str | None = Query(
+        None, alias="status", pattern="^(pending|delivered|failed)$"
+    ),
+    limit: int = Query(50, ge=1, le=500),
+    payload: dict = Depends(require_tenant_scope("webhooks:rw")),
+    db: AsyncSession = Depends(get_db),
+):
+    """Most recent deliveries first, with attempt counts and the last error."""
+    hook = await get_webhook(db, request.state.tenant, webhook_id)
+    q = select(WebhookDelivery).where(WebhookDelivery.webhook_id == hook.id)
+    if delivery_status:
+        q = q.where(WebhookDelivery.status == delivery_status)
+    rows = await db.scalars(q.order_by(WebhookDelivery.id.desc()).limit(limit))
+    return [WebhookDeliveryOut.model_validate(d) for d in rows]
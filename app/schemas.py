@@ -35,6 +35,7 @@ class FlagOut(BaseModel):
     state: str
     variants: List[Variant]
     rules: List[Rule] = []
+    version: int = 1
 
 
 class SegmentIn(BaseModel):
@@ -45,6 +46,76 @@ class SegmentIn(BaseModel):
 class SegmentOut(BaseModel):
     key: str
     criteria: Dict[str, Any]
+    version: int = 1
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    key: Optional[str] = None
+    action: str  # 'create' | 'update' | 'unchanged' | 'error'
+    error: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    dry_run: bool
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    items: List[BulkItemResult] = []
+
+
+class ConversionIn(BaseModel):
+    user_id: str = Field(min_length=1)
+    event: str = Field(min_length=1, max_length=128)
+    ts: Optional[datetime] = None  # defaults to receive time
+
+
+class ConversionAccepted(BaseModel):
+    accepted: int
+
+
+class VariantResult(BaseModel):
+    variant: str
+    exposures: int
+    conversions: int
+    rate: float
+    ci_low: Optional[float] = None
+    ci_high: Optional[float] = None
+    lift: Optional[float] = None  # relative to control
+    p_value: Optional[float] = None  # two-sided, vs control
+
+
+class MetricResult(BaseModel):
+    event: str
+    variants: List[VariantResult]
+
+
+class ExperimentResults(BaseModel):
+    flag_key: str
+    control: Optional[str] = None
+    confidence: float
+    exposures: Dict[str, int]
+    metrics: List[MetricResult]
+
+
+class ProfileStart(BaseModel):
+    mode: str = Field(default="cprofile", pattern="^(cprofile|sampling)$")
+    requests: Optional[int] = Field(default=None, ge=1, le=100_000)
+    seconds: Optional[float] = Field(default=None, gt=0, le=300)
+    path_prefix: Optional[str] = None  # only count matching requests
+    interval_ms: float = Field(default=5.0, ge=0.5, le=1000)  # sampling mode
+
+
+class ProfileStatus(BaseModel):
+    state: str  # 'idle' | 'running' | 'done'
+    pid: int
+    mode: Optional[str] = None
+    path_prefix: Optional[str] = None
+    max_requests: Optional[int] = None
+    requests_seen: int = 0
+    started_at: Optional[float] = None
+    stopped_at: Optional[float] = None
 
 
 class TokenRequest(BaseModel):
@@ -84,3 +155,33 @@ class AuditOut(BaseModel):
     model_config = {
         "from_attributes": True  # <- this is the Pydantic v2 way
     }
+
+
+# --- Webhook schemas ---
+class WebhookIn(BaseModel):
+    url: str = Field(pattern="^https?://", max_length=2048)
+    secret: Optional[str] = Field(default=None, min_length=16, max_length=256)
+    entities: List[str] = Field(default=["flag", "segment"], min_length=1)
+    active: bool = True
+
+
+class WebhookOut(BaseModel):
+    id: int
+    url: str
+    entities: List[str]
+    active: bool
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class WebhookDeliveryOut(BaseModel):
+    id: int
+    status: str
+    attempts: int
+    next_attempt_at: datetime
+    last_error: Optional[str]
+    payload: Dict[str, Any]
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
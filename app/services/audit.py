@@ -2,11 +2,12 @@
 from datetime import datetime
 from typing import Optional, Dict, Any, List, Union
 
-from sqlalchemy import select, desc
+from sqlalchemy import insert, select, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Audit
 from app.schemas import AuditOut
+from app.utils.serialization import MODEL_SERIALIZERS
 
 
 def serialize_model(obj: Union[Dict[str, Any], Any]) -> Optional[Dict[str, Any]]:
@@ -17,13 +18,10 @@ def serialize_model(obj: Union[Dict[str, Any], Any]) -> Optional[Dict[str, Any]]
     if isinstance(obj, dict):
         return {k: v for k, v in obj.items() if not k.startswith("_")}
 
-    if hasattr(obj, "__dict__"):
-        # Only include columns, ignore SQLAlchemy internal attributes
-        return {
-            k: v
-            for k, v in vars(obj).items()
-            if not k.startswith("_") and not callable(v)
-        }
+    # Mapped models go through their explicit serializer
+    serializer = MODEL_SERIALIZERS.get(type(obj))
+    if serializer is not None:
+        return serializer(obj)
 
     return None
 
@@ -55,6 +53,38 @@ async def record_audit(
     return AuditOut.from_orm(entry)
 
 
+async def record_audit_bulk(
+    db: AsyncSession,
+    tenant: str,
+    actor: str,
+    entries: List[Dict[str, Any]],
+) -> None:
+    """
+    Stage many audit entries with a single executemany INSERT.
+    Each entry carries entity, entity_key, action, before and after.
+    Does not commit: callers write audit rows in the same transaction as the change.
+    """
+    if not entries:
+        return
+    ts = datetime.utcnow()
+    await db.execute(
+        insert(Audit),
+        [
+            {
+                "tenant_id": tenant,
+                "actor": actor,
+                "entity": e["entity"],
+                "entity_key": e["entity_key"],
+                "action": e["action"],
+                "before": serialize_model(e.get("before")),
+                "after": serialize_model(e.get("after")),
+                "ts": ts,
+            }
+            for e in entries
+        ],
+    )
+
+
 async def list_audit(
     db: AsyncSession,
     tenant: str,
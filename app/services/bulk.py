@@ -0,0 +1,125 @@
+# app/services/bulk.py
+import json
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ValidationError
+
+from app.schemas import BulkItemResult, BulkResult
+
+MAX_BULK_ITEMS = 10_000
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def parse_bulk_body(
+    raw: bytes, content_type: Optional[str]
+) -> Tuple[List[Tuple[int, Any]], List[BulkItemResult]]:
+    """
+    Split a bulk payload into (index, item) pairs.
+    Accepts NDJSON (one object per line) or a JSON array. Undecodable NDJSON
+    lines are reported per item; a malformed JSON array fails the request.
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    items: List[Tuple[int, Any]] = []
+    errors: List[BulkItemResult] = []
+
+    if media_type in NDJSON_TYPES:
+        index = 0
+        for line in raw.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append((index, json.loads(line)))
+            except ValueError as exc:
+                errors.append(
+                    BulkItemResult(
+                        index=index, action="error", error=f"Invalid JSON: {exc}"
+                    )
+                )
+            index += 1
+    else:
+        try:
+            decoded = json.loads(raw or b"[]")
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON: {exc}"
+            )
+        if not isinstance(decoded, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Bulk body must be a JSON array or NDJSON",
+            )
+        items = list(enumerate(decoded))
+
+    if len(items) + len(errors) > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BULK_ITEMS} items per bulk request",
+        )
+    return items, errors
+
+
+def validate_bulk_items(
+    items: List[Tuple[int, Any]], model: Type[M], errors: List[BulkItemResult]
+) -> List[Tuple[int, M]]:
+    """
+    Validate each item against `model`, dropping invalid and duplicate keys.
+    Failures are appended to `errors`; the first occurrence of a key wins.
+    """
+    valid: List[Tuple[int, M]] = []
+    seen: Dict[str, int] = {}
+    for index, item in items:
+        try:
+            obj = model.model_validate(item)
+        except ValidationError as exc:
+            key = item.get("key") if isinstance(item, dict) else None
+            errors.append(
+                BulkItemResult(
+                    index=index,
+                    key=key if isinstance(key, str) else None,
+                    action="error",
+                    error=_format_validation_error(exc),
+                )
+            )
+            continue
+        key = getattr(obj, "key")
+        if key in seen:
+            errors.append(
+                BulkItemResult(
+                    index=index,
+                    key=key,
+                    action="error",
+                    error=f"Duplicate key (first seen at index {seen[key]})",
+                )
+            )
+            continue
+        seen[key] = index
+        valid.append((index, obj))
+    return valid
+
+
+def build_bulk_result(
+    results: List[BulkItemResult], errors: List[BulkItemResult], dry_run: bool
+) -> BulkResult:
+    items = sorted(results + errors, key=lambda r: r.index)
+    counts = {"create": 0, "update": 0, "unchanged": 0, "error": 0}
+    for r in items:
+        counts[r.action] += 1
+    return BulkResult(
+        dry_run=dry_run,
+        created=counts["create"],
+        updated=counts["update"],
+        unchanged=counts["unchanged"],
+        failed=counts["error"],
+        items=items,
+    )
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    parts = []
+    for err in exc.errors():
+        loc = ".".join(str(p) for p in err.get("loc", ()))
+        parts.append(f"{loc}: {err.get('msg')}" if loc else str(err.get("msg")))
+    return "; ".join(parts)
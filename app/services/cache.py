@@ -1,6 +1,10 @@
 import time
 from typing import Any
 
+from app.config import settings
+from app.models import Flag
+from app.services.invalidation import Invalidation, bus
+
 
 # ----- In-memory TTL cache -----
 class TTLCache:
@@ -18,6 +22,16 @@ class TTLCache:
             return None
         return data
 
+    def lookup(self, key: str) -> tuple[Any, str]:
+        """Like get(), but also report 'hit', 'miss' or 'stale' (expired entry)."""
+        v = self.store.get(key)
+        if not v:
+            return None, "miss"
+        expires, data = v
+        if time.time() > expires:
+            return None, "stale"
+        return data, "hit"
+
     def set(self, key: str, value: Any):
         self.store[key] = (time.time() + self.ttl, value)
 
@@ -27,8 +41,12 @@ class TTLCache:
                 self.store.pop(k, None)
 
 
+# ----- Recognized tenants (positive lookups only) -----
+tenant_cache = TTLCache(ttl_seconds=settings.tenant_cache_ttl)
+
+
 # ----- Singleton instance for flags -----
-flag_cache = TTLCache(ttl_seconds=60)
+flag_cache = TTLCache(ttl_seconds=settings.flag_cache_ttl)
 FLAG_CACHE_PREFIX = "flag:"
 
 
@@ -37,10 +55,66 @@ def get_flag_cache_key(tenant: str, key: str) -> str:
     return f"{FLAG_CACHE_PREFIX}{tenant}:{key}"
 
 
+def flag_cache_entry(flag: Flag) -> dict[str, Any]:
+    # Convert Flag SQLAlchemy object to dict (includes `version` for revalidation)
+    return {c.name: getattr(flag, c.name) for c in flag.__table__.columns}
+
+
+# Serialized GET /v1/flags/{key} bodies: cache key -> (version, json bytes)
+flag_body_cache = TTLCache(ttl_seconds=60)
+
+
+def get_flag_body(tenant: str, key: str) -> tuple[int, bytes] | None:
+    """Return (version, encoded body) for a cached flag response"""
+    return flag_body_cache.get(get_flag_cache_key(tenant, key))
+
+
+def set_flag_body(
+    tenant: str, key: str, version: int, body: bytes, read_at: float | None = None
+) -> None:
+    """Cache a body read from the database at `read_at` (epoch seconds).
+
+    Skipped when a write to the flag was recorded since that read, or when a
+    newer version is already cached: a read racing a PUT must not put the old
+    body back after the PUT dropped it.
+    """
+    if read_at is not None and last_flag_write(tenant, key) >= read_at:
+        return
+    cache_key = get_flag_cache_key(tenant, key)
+    current = flag_body_cache.get(cache_key)
+    if current is not None and current[0] > version:
+        return
+    flag_body_cache.set(cache_key, (version, body))
+
+
+# Wall time of the last write per flag (or per tenant, for bulk writes) made
+# here or reported by the invalidation bus. A shared node snapshot built
+# before that is stale for the flag.
+flag_writes = TTLCache(ttl_seconds=300)
+
+
+def last_flag_write(tenant: str, key: str) -> float:
+    """Epoch seconds of the last known write to the flag, 0.0 if none is known"""
+    return max(
+        flag_writes.get(get_flag_cache_key(tenant, key)) or 0.0,
+        flag_writes.get(f"{FLAG_CACHE_PREFIX}{tenant}:") or 0.0,
+        flag_writes.get(FLAG_CACHE_PREFIX) or 0.0,
+    )
+
+
 def invalidate_flag_cache(tenant: str, key: str) -> None:
     """Remove a specific flag from the cache"""
     cache_key = get_flag_cache_key(tenant, key)
     flag_cache.invalidate_prefix(cache_key)
+    flag_body_cache.invalidate_prefix(cache_key)
+    flag_writes.set(cache_key, time.time())
+
+
+def invalidate_tenant_flag_cache(tenant: str) -> None:
+    """Remove every cached flag of a tenant (used after bulk writes)"""
+    flag_cache.invalidate_prefix(f"{FLAG_CACHE_PREFIX}{tenant}:")
+    flag_body_cache.invalidate_prefix(f"{FLAG_CACHE_PREFIX}{tenant}:")
+    flag_writes.set(f"{FLAG_CACHE_PREFIX}{tenant}:", time.time())
 
 
 # ----- Singleton instance for segments -----
@@ -81,3 +155,53 @@ def invalidate_segment_cache(
         segment_cache.invalidate_prefix(f"{SEGMENT_CACHE_PREFIX}{tenant}:")
     else:
         segment_cache.invalidate_prefix(SEGMENT_CACHE_PREFIX)
+    invalidate_segment_list_state(tenant)
+
+
+# ----- Segment list state (drives list ETags) -----
+# Writes on this worker drop the marker at once and the invalidation bus
+# drops it for writes on other workers. Without a cross-worker bus a write
+# elsewhere is only seen once the entry expires, so the TTL is kept short:
+# a list ETag (and its 304s) can lag a remote write by at most that long.
+segment_list_cache = TTLCache(ttl_seconds=settings.segment_list_state_ttl)
+SEGMENT_LIST_PREFIX = "segment-list:"
+
+
+def get_segment_list_state(tenant: str) -> str | None:
+    """Return the cached change marker for a tenant's segments, if known"""
+    return segment_list_cache.get(f"{SEGMENT_LIST_PREFIX}{tenant}")
+
+
+def set_segment_list_state(tenant: str, state: str) -> None:
+    """Remember the change marker computed from the segments table"""
+    segment_list_cache.set(f"{SEGMENT_LIST_PREFIX}{tenant}", state)
+
+
+def invalidate_segment_list_state(tenant: str | None = None) -> None:
+    """Forget the change marker so the next list recomputes it"""
+    if tenant:
+        segment_list_cache.invalidate_prefix(f"{SEGMENT_LIST_PREFIX}{tenant}")
+    else:
+        segment_list_cache.invalidate_prefix(SEGMENT_LIST_PREFIX)
+
+
+# ----- Writes made by other workers -----
+def apply_invalidations(messages: list[Invalidation]) -> None:
+    """Drop what another process changed, as if the write had happened here"""
+    for m in messages:
+        if m.entity == "reset":
+            flag_cache.store.clear()
+            flag_body_cache.store.clear()
+            invalidate_segment_cache()
+            # Unknown writes happened: distrust the node snapshot until rebuilt
+            flag_writes.store.clear()
+            flag_writes.set(FLAG_CACHE_PREFIX, time.time())
+        elif m.entity == "flag" and m.key is not None:
+            invalidate_flag_cache(m.tenant, m.key)
+        elif m.entity == "flag":
+            invalidate_tenant_flag_cache(m.tenant)
+        elif m.entity == "segment":
+            invalidate_segment_cache(m.tenant, m.key)
+
+
+bus.subscribe(apply_invalidations)
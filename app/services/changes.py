@@ -0,0 +1,288 @@
+# app/services/changes.py
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from prometheus_client import Counter
+from sqlalchemy import (
+    Insert,
+    and_,
+    delete,
+    event,
+    exists,
+    func,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, aliased
+
+from app.config import settings
+from app.deps import SessionLocal
+from app.models import Change, TenantSequence
+from app.services.invalidation import Invalidation, bus
+
+logger = logging.getLogger("feature-flag-service")
+
+# ---------- Per-tenant change log ----------
+# Every flag/segment mutation appends a row to `changes` in the same
+# transaction, numbered from a per-tenant counter in `tenant_sequences`.
+# The counter is bumped with an upsert that row-locks the tenant's sequence
+# until commit, so within a tenant sequence numbers are gap-free and follow
+# commit order: "everything after seq N" is an exact cursor, unlike audit.ts.
+#
+# Once the transaction commits, the changes are handed to in-process
+# subscribers (snapshot store, streams, webhooks). A rolled-back transaction
+# publishes nothing.
+
+CHANGES_PUBLISHED = Counter(
+    "changes_published_total", "Change log entries published after commit"
+)
+CHANGES_COMPACTED = Counter(
+    "changes_compacted_total", "Change log entries removed by compaction", ["kind"]
+)
+
+
+class ChangeEvent(NamedTuple):
+    tenant: str
+    seq: int
+    entity: str  # "flag" | "segment"
+    key: str
+    action: str  # "create" | "update" | "delete"
+    version: int
+
+
+# (entity, key, action, version) as passed to record_changes
+PendingChange = Tuple[str, str, str, int]
+
+_PENDING = "pending_changes"
+_subscribers: List[Callable[[List[ChangeEvent]], None]] = []
+
+
+def subscribe(callback: Callable[[List[ChangeEvent]], None]) -> None:
+    """Call `callback(events)` after each commit that recorded changes."""
+    _subscribers.append(callback)
+
+
+def publish(events: List[ChangeEvent]) -> None:
+    CHANGES_PUBLISHED.inc(len(events))
+    for callback in _subscribers:
+        try:
+            callback(events)
+        except Exception:
+            logger.exception("Change subscriber %r failed", callback)
+
+
+def broadcast(events: List[ChangeEvent]) -> None:
+    """Tell the other workers which entries to drop (app.services.invalidation)."""
+    bus.publish([Invalidation(e.entity, e.tenant, e.key, e.seq) for e in events])
+
+
+subscribe(broadcast)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session: Session) -> None:
+    events = session.info.pop(_PENDING, None)
+    if events:
+        publish(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+async def next_seq(db: AsyncSession, tenant: str, count: int = 1) -> int:
+    """Reserve `count` sequence numbers; returns the last one."""
+    values = {"tenant_id": tenant, "seq": count, "floor": 0}
+    bump = {"seq": TenantSequence.seq + count}
+    stmt: Insert
+    if db.get_bind().dialect.name == "postgresql":
+        pg = pg_insert(TenantSequence).values(values)
+        stmt = pg.on_conflict_do_update(index_elements=["tenant_id"], set_=bump)
+    else:
+        lite = sqlite_insert(TenantSequence).values(values)
+        stmt = lite.on_conflict_do_update(index_elements=["tenant_id"], set_=bump)
+    return (await db.execute(stmt.returning(TenantSequence.seq))).scalar_one()
+
+
+async def record_changes(
+    db: AsyncSession, tenant: str, changes: Sequence[PendingChange]
+) -> List[ChangeEvent]:
+    """
+    Append `changes` to the log inside the caller's transaction; they are
+    published once that transaction commits.
+    """
+    if not changes:
+        return []
+    last = await next_seq(db, tenant, len(changes))
+    first = last - len(changes) + 1
+    now = datetime.utcnow()
+    events = [
+        ChangeEvent(tenant, first + i, entity, key, action, version)
+        for i, (entity, key, action, version) in enumerate(changes)
+    ]
+    await db.execute(
+        insert(Change),
+        [
+            {
+                "tenant_id": tenant,
+                "seq": e.seq,
+                "entity": e.entity,
+                "entity_key": e.key,
+                "action": e.action,
+                "version": e.version,
+                "ts": now,
+            }
+            for e in events
+        ],
+    )
+    db.sync_session.info.setdefault(_PENDING, []).extend(events)
+    return events
+
+
+class ChangePage(NamedTuple):
+    changes: List[ChangeEvent]
+    head: int  # latest seq of the tenant
+    floor: int  # cursors below this must resync from a full snapshot
+
+
+async def tenant_position(db: AsyncSession, tenant: str) -> Tuple[int, int]:
+    """(head seq, compaction floor) of a tenant, (0, 0) before its first change."""
+    row = (
+        await db.execute(
+            select(TenantSequence.seq, TenantSequence.floor).where(
+                TenantSequence.tenant_id == tenant
+            )
+        )
+    ).first()
+    return (row.seq, row.floor) if row else (0, 0)
+
+
+async def changes_since(
+    db: AsyncSession, tenant: str, seq: int, limit: int = 1000
+) -> ChangePage:
+    """Changes with seq > `seq` in order; served by uq_changes_tenant_seq."""
+    head, floor = await tenant_position(db, tenant)
+    rows = await db.execute(
+        select(
+            Change.seq, Change.entity, Change.entity_key, Change.action, Change.version
+        )
+        .where(Change.tenant_id == tenant, Change.seq > seq)
+        .order_by(Change.seq)
+        .limit(limit)
+    )
+    return ChangePage(
+        [ChangeEvent(tenant, *row) for row in rows], head=head, floor=floor
+    )
+
+
+async def compact(
+    db: AsyncSession, tenant: str, tombstone_ttl: Optional[timedelta] = None
+) -> int:
+    """
+    Drop entries superseded by a later change to the same entity, then
+    deletes older than `tombstone_ttl`. Removing a tombstone raises the
+    tenant's floor so cursors from before it know to resync. Commits.
+    """
+    newer = aliased(Change)
+    superseded = await db.execute(
+        delete(Change).where(
+            Change.tenant_id == tenant,
+            exists().where(
+                and_(
+                    newer.tenant_id == Change.tenant_id,
+                    newer.entity == Change.entity,
+                    newer.entity_key == Change.entity_key,
+                    newer.seq > Change.seq,
+                )
+            ),
+        )
+    )
+    removed = superseded.rowcount or 0
+    CHANGES_COMPACTED.labels(kind="superseded").inc(removed)
+
+    if tombstone_ttl is not None:
+        cutoff = datetime.utcnow() - tombstone_ttl
+        expired = and_(
+            Change.tenant_id == tenant, Change.action == "delete", Change.ts < cutoff
+        )
+        floor = (await db.execute(select(func.max(Change.seq)).where(expired))).scalar()
+        if floor is not None:
+            tombstones = await db.execute(delete(Change).where(expired))
+            await db.execute(
+                update(TenantSequence)
+                .where(TenantSequence.tenant_id == tenant, TenantSequence.floor < floor)
+                .values(floor=floor)
+            )
+            CHANGES_COMPACTED.labels(kind="tombstone").inc(tombstones.rowcount or 0)
+            removed += tombstones.rowcount or 0
+    await db.commit()
+    return removed
+
+
+async def compact_all(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    tombstone_ttl: Optional[timedelta],
+) -> int:
+    async with sessionmaker() as db:
+        tenants = list(await db.scalars(select(TenantSequence.tenant_id)))
+    removed = 0
+    for tenant in tenants:
+        async with sessionmaker() as db:
+            removed += await compact(db, tenant, tombstone_ttl)
+        await asyncio.sleep(0)
+    return removed
+
+
+class Compactor:
+    """Runs compact_all every `interval` seconds in the background."""
+
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        interval: float,
+        tombstone_ttl: Optional[timedelta],
+    ):
+        self.sessionmaker = sessionmaker
+        self.interval = interval
+        self.tombstone_ttl = tombstone_ttl
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                removed = await compact_all(self.sessionmaker, self.tombstone_ttl)
+                logger.info("Compacted %d change log entries", removed)
+            except Exception:
+                logger.exception("Change log compaction failed")
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+compactor = Compactor(
+    SessionLocal,
+    interval=settings.changes_compact_interval,
+    tombstone_ttl=(
+        timedelta(seconds=settings.changes_tombstone_ttl)
+        if settings.changes_tombstone_ttl > 0
+        else None
+    ),
+)
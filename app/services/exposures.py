@@ -0,0 +1,301 @@
+# app/services/exposures.py
+import asyncio
+import gzip
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, Protocol, Tuple
+
+import orjson
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.deps import SessionLocal
+from app.models import Exposure
+
+logger = logging.getLogger("feature-flag-service")
+
+# (tenant, flag_key, variant, user_id, rule_id, ts) -- ts is epoch seconds
+ExposureEvent = Tuple[str, str, str, str, Optional[str], float]
+
+# Counters are published by the flusher, not per event: Counter.inc() takes a
+# lock and would cost more than the buffer push itself.
+EXPOSURES_WRITTEN = Counter(
+    "exposure_events_written_total", "Exposure events written to the sink"
+)
+EXPOSURES_DROPPED = Counter(
+    "exposure_events_dropped_total",
+    "Exposure events dropped because the buffer was full",
+)
+EXPOSURES_FLUSH_ERRORS = Counter(
+    "exposure_flush_errors_total", "Exposure events lost to sink errors"
+)
+EXPOSURE_FLUSH_SECONDS = Histogram(
+    "exposure_flush_seconds",
+    "Time to write one exposure batch to the sink",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+EXPOSURE_BUFFER_DEPTH = Gauge(
+    "exposure_buffer_depth", "Exposure events waiting to be flushed"
+)
+
+
+# ---------- Ring buffer ----------
+class ExposureBuffer:
+    """
+    Fixed-capacity ring buffer with preallocated slots.
+    Producers (request handlers) and the flusher all run on the event loop
+    thread, so push/drain never interleave and need no lock. When full, new
+    events are dropped and counted rather than blocking the request.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._slots: List[Optional[ExposureEvent]] = [None] * capacity
+        self._head = 0  # next slot to read (monotonic)
+        self._tail = 0  # next slot to write (monotonic)
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return self._tail - self._head
+
+    def push(self, event: ExposureEvent) -> bool:
+        if self._tail - self._head >= self.capacity:
+            self.dropped += 1
+            return False
+        self._slots[self._tail % self.capacity] = event
+        self._tail += 1
+        return True
+
+    def drain(self, max_items: int) -> List[ExposureEvent]:
+        n = min(max_items, self._tail - self._head)
+        slots, capacity = self._slots, self.capacity
+        batch: List[ExposureEvent] = []
+        for i in range(self._head, self._head + n):
+            idx = i % capacity
+            batch.append(slots[idx])  # type: ignore[arg-type]
+            slots[idx] = None
+        self._head += n
+        return batch
+
+
+# ---------- Sinks ----------
+class ExposureSink(Protocol):
+    async def write(self, batch: List[ExposureEvent]) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+def _utc(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
+
+
+class DatabaseExposureSink:
+    """Writes batches as multi-row INSERT ... VALUES statements."""
+
+    # 6 bound parameters per row keeps each statement under SQLite's 999 limit
+    rows_per_statement = 150
+
+    def __init__(self, sessionmaker: async_sessionmaker[AsyncSession]):
+        self.sessionmaker = sessionmaker
+
+    async def write(self, batch: List[ExposureEvent]) -> None:
+        rows = [
+            {
+                "tenant_id": tenant,
+                "flag_key": flag_key,
+                "variant": variant,
+                "user_id": user_id,
+                "rule_id": rule_id,
+                "ts": _utc(ts),
+            }
+            for tenant, flag_key, variant, user_id, rule_id, ts in batch
+        ]
+        async with self.sessionmaker() as db:
+            step = self.rows_per_statement
+            for start in range(0, len(rows), step):
+                await db.execute(insert(Exposure).values(rows[start : start + step]))
+            await db.commit()
+
+    async def close(self) -> None:
+        return None
+
+
+class NDJSONFileSink:
+    """
+    Appends batches to gzip-compressed NDJSON files, rotating once a file has
+    taken `max_bytes` of uncompressed data. File I/O runs in a worker thread.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._file: Optional[gzip.GzipFile] = None
+        self._written = 0
+        self._seq = 0
+
+    def _open(self) -> gzip.GzipFile:
+        os.makedirs(self.directory, exist_ok=True)
+        self._seq += 1
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        name = f"exposures-{stamp}-{os.getpid()}-{self._seq:04d}.ndjson.gz"
+        self._written = 0
+        return gzip.open(os.path.join(self.directory, name), "ab")
+
+    def _write_sync(self, payload: bytes) -> None:
+        if self._file is None or self._written >= self.max_bytes:
+            self._close_sync()
+            self._file = self._open()
+        self._file.write(payload)
+        self._file.flush()
+        self._written += len(payload)
+
+    def _close_sync(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def write(self, batch: List[ExposureEvent]) -> None:
+        payload = b"".join(
+            orjson.dumps(
+                {
+                    "tenant_id": tenant,
+                    "flag_key": flag_key,
+                    "variant": variant,
+                    "user_id": user_id,
+                    "rule_id": rule_id,
+                    "ts": _utc(ts).isoformat() + "Z",
+                }
+            )
+            + b"\n"
+            for tenant, flag_key, variant, user_id, rule_id, ts in batch
+        )
+        await asyncio.to_thread(self._write_sync, payload)
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._close_sync)
+
+
+# ---------- Pipeline ----------
+class ExposurePipeline:
+    """
+    Buffers exposure events and flushes them to a sink from a background task,
+    every `flush_interval` seconds or as soon as a full batch is waiting.
+    """
+
+    def __init__(
+        self,
+        sink: Optional[ExposureSink],
+        capacity: int,
+        batch_size: int,
+        flush_interval: float,
+    ):
+        self.sink = sink
+        self.buffer = ExposureBuffer(capacity)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task[Any]] = None
+        self._dropped_reported = 0
+        self._subscribers: List[Callable[[List[ExposureEvent]], None]] = []
+
+    def subscribe(self, callback: Callable[[List[ExposureEvent]], None]) -> None:
+        """Call `callback` with every batch once the sink has accepted it."""
+        self._subscribers.append(callback)
+
+    @property
+    def enabled(self) -> bool:
+        return self.sink is not None
+
+    def record(
+        self,
+        tenant: str,
+        flag_key: str,
+        variant: str,
+        user_id: str,
+        rule_id: Optional[str],
+    ) -> None:
+        if self.sink is None:
+            return
+        buffer = self.buffer
+        if buffer.push((tenant, flag_key, variant, user_id, rule_id, time.time())):
+            if len(buffer) == self.batch_size:
+                self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write everything currently buffered; returns the number of events."""
+        dropped = self.buffer.dropped - self._dropped_reported
+        if dropped:
+            EXPOSURES_DROPPED.inc(dropped)
+            self._dropped_reported += dropped
+        written = 0
+        while self.sink is not None and len(self.buffer):
+            batch = self.buffer.drain(self.batch_size)
+            start = time.perf_counter()
+            try:
+                await self.sink.write(batch)
+            except Exception:
+                EXPOSURES_FLUSH_ERRORS.inc(len(batch))
+                logger.exception("Failed to write %d exposure events", len(batch))
+                return written
+            EXPOSURE_FLUSH_SECONDS.observe(time.perf_counter() - start)
+            EXPOSURES_WRITTEN.inc(len(batch))
+            for callback in self._subscribers:
+                try:
+                    callback(batch)
+                except Exception:
+                    logger.exception("Exposure subscriber %r failed", callback)
+            written += len(batch)
+        return written
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Keep flushing: a dead flusher would silently drop every
+                # later event once the ring buffer fills
+                logger.exception("Exposure flush failed")
+
+    def start(self) -> None:
+        if self.sink is not None and self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the flusher, drain what is left and close the sink."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.sink is not None:
+            await self.flush()
+            await self.sink.close()
+
+
+def build_sink(kind: str) -> Optional[ExposureSink]:
+    if kind == "db":
+        return DatabaseExposureSink(SessionLocal)
+    if kind == "file":
+        return NDJSONFileSink(settings.exposure_dir, settings.exposure_file_max_bytes)
+    return None
+
+
+exposures = ExposurePipeline(
+    build_sink(settings.exposure_sink),
+    capacity=settings.exposure_buffer_size,
+    batch_size=settings.exposure_batch_size,
+    flush_interval=settings.exposure_flush_interval,
+)
+EXPOSURE_BUFFER_DEPTH.set_function(lambda: len(exposures.buffer))
@@ -0,0 +1,325 @@
+# app/services/invalidation.py
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Callable, List, NamedTuple, Optional, Protocol
+
+import orjson
+from prometheus_client import Counter
+
+from app.config import settings
+
+logger = logging.getLogger("feature-flag-service")
+
+# ---------- Cross-worker invalidation bus ----------
+# invalidate_flag_cache() and friends only touch the worker that handled the
+# write. The bus carries a small message per committed change to every other
+# process, whose cache layers drop the entry, so a write is visible
+# everywhere within milliseconds instead of after the cache TTL.
+#
+# Backends:
+#   inprocess - no other processes to reach (single worker); with
+#               loopback=True it feeds messages back to this bus (tests)
+#   unix      - UNIX datagram sockets in a shared directory, one per process,
+#               for workers on one host; no broker and no extra round trip
+#   postgres  - LISTEN/NOTIFY on the service database, for several hosts
+#
+# Delivery is best effort. Each backend tells subscribers to drop
+# everything (a `reset` message) whenever it may have missed messages,
+# e.g. after reconnecting, and the cache TTLs remain the backstop.
+
+BUS_SENT = Counter("invalidation_sent_total", "Invalidations published", ["backend"])
+BUS_RECEIVED = Counter(
+    "invalidation_received_total", "Invalidations received from other processes"
+)
+BUS_ERRORS = Counter("invalidation_errors_total", "Bus send/receive failures")
+
+# Keep datagrams and NOTIFY payloads (limit ~8000 bytes) well under the limit
+MAX_PAYLOAD = 7000
+
+
+class Invalidation(NamedTuple):
+    entity: str  # "flag" | "segment" | "reset"
+    tenant: str
+    key: Optional[str]  # None: every entry of that entity for the tenant
+    seq: int = 0  # change log seq, 0 if unknown
+
+
+RESET = Invalidation("reset", "", None)
+
+Handler = Callable[[List[Invalidation]], None]
+
+
+def encode(origin: str, messages: List[Invalidation]) -> List[bytes]:
+    """Pack messages into as few payloads as fit under MAX_PAYLOAD."""
+    payloads: List[bytes] = []
+    batch: List[list] = []
+    size = 0
+    for message in messages:
+        item = orjson.dumps(list(message))
+        if batch and size + len(item) > MAX_PAYLOAD:
+            payloads.append(orjson.dumps({"o": origin, "m": batch}))
+            batch, size = [], 0
+        batch.append(list(message))
+        size += len(item) + 1
+    if batch:
+        payloads.append(orjson.dumps({"o": origin, "m": batch}))
+    return payloads
+
+
+def decode(payload: bytes) -> tuple[str, List[Invalidation]]:
+    data = orjson.loads(payload)
+    return data["o"], [Invalidation(*m) for m in data["m"]]
+
+
+class Backend(Protocol):
+    name: str
+
+    async def start(self, deliver: Callable[[bytes], None]) -> None: ...
+
+    def send(self, payload: bytes) -> None: ...
+
+    async def stop(self) -> None: ...
+
+
+class InProcessBackend:
+    name = "inprocess"
+
+    def __init__(self) -> None:
+        self._deliver: Optional[Callable[[bytes], None]] = None
+
+    async def start(self, deliver: Callable[[bytes], None]) -> None:
+        self._deliver = deliver
+
+    def send(self, payload: bytes) -> None:
+        if self._deliver is not None:
+            self._deliver(payload)
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+
+class UnixSocketBackend:
+    """
+    Every process binds `<directory>/<pid>.sock` and sends each payload to
+    all other sockets in the directory. Sockets of dead processes refuse the
+    datagram and are removed by whoever notices first.
+    """
+
+    name = "unix"
+
+    def __init__(self, directory: str, socket_name: Optional[str] = None):
+        self.directory = directory
+        name = socket_name or str(os.getpid())
+        self.path = os.path.join(directory, f"{name}.sock")
+        self._sock: Optional[socket.socket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self, deliver: Callable[[bytes], None]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # left over from a previous process with our name
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self.path)
+        sock.setblocking(False)
+        self._sock, self._loop = sock, asyncio.get_running_loop()
+
+        def readable() -> None:
+            while True:
+                try:
+                    payload = sock.recv(65536)
+                except (BlockingIOError, InterruptedError):
+                    return
+                deliver(payload)
+
+        self._loop.add_reader(sock.fileno(), readable)
+
+    def peers(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [
+            os.path.join(self.directory, n)
+            for n in names
+            if n.endswith(".sock") and os.path.join(self.directory, n) != self.path
+        ]
+
+    def send(self, payload: bytes) -> None:
+        if self._sock is None:
+            return
+        for peer in self.peers():
+            try:
+                self._sock.sendto(payload, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(peer)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                # Peer's receive buffer is full: it will serve stale entries
+                # until their TTL, so count it rather than block the writer
+                BUS_ERRORS.inc()
+
+    async def stop(self) -> None:
+        if self._sock is not None and self._loop is not None:
+            self._loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class PostgresBackend:
+    """LISTEN/NOTIFY over a dedicated asyncpg connection, reconnecting on loss."""
+
+    name = "postgres"
+
+    def __init__(self, dsn: str, channel: str, reconnect_delay: float = 1.0):
+        # SQLAlchemy URLs carry the driver ("postgresql+asyncpg://")
+        self.dsn = dsn.replace("+asyncpg", "", 1)
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._conn = None
+        self._deliver: Optional[Callable[[bytes], None]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lost = asyncio.Event()
+        # One connection both listens and notifies; asyncpg runs one query at a time
+        self._send_lock = asyncio.Lock()
+
+    async def _connect(self) -> None:
+        import asyncpg  # type: ignore[import-untyped]
+
+        assert self._deliver is not None
+        deliver = self._deliver
+        conn = await asyncpg.connect(self.dsn)
+        await conn.add_listener(
+            self.channel, lambda _c, _pid, _ch, payload: deliver(payload.encode())
+        )
+        conn.add_termination_listener(lambda _c: self._lost.set())
+        self._conn = conn
+
+    async def _run(self) -> None:
+        first = True
+        while True:
+            try:
+                self._lost.clear()
+                await self._connect()
+                if not first:
+                    # Anything sent while we were away is lost: start clean
+                    assert self._deliver is not None
+                    self._deliver(encode("", [RESET])[0])
+                first = False
+                await self._lost.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                BUS_ERRORS.inc()
+                logger.exception("Invalidation listener connection failed")
+            self._conn = None
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def start(self, deliver: Callable[[bytes], None]) -> None:
+        self._deliver = deliver
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def send(self, payload: bytes) -> None:
+        conn = self._conn
+        if conn is None:
+            BUS_ERRORS.inc()
+            return
+
+        async def notify() -> None:
+            try:
+                async with self._send_lock:
+                    await conn.execute(
+                        "SELECT pg_notify($1, $2)", self.channel, payload.decode()
+                    )
+            except Exception:
+                BUS_ERRORS.inc()
+                logger.exception("Could not publish invalidation")
+
+        asyncio.get_running_loop().create_task(notify())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+
+class InvalidationBus:
+    """
+    Fans invalidations out to the other processes. Handlers run only for
+    messages published elsewhere, on every backend; the publishing process
+    has already updated its own caches and stream on the write path.
+    `loopback` also hands this bus its own messages, so a single process can
+    play another worker in tests.
+    """
+
+    def __init__(self, backend: Backend, loopback: bool = False):
+        self.backend = backend
+        self.loopback = loopback
+        self.origin = uuid.uuid4().hex
+        self._handlers: List[Handler] = []
+        self.started = False
+
+    def subscribe(self, handler: Handler) -> None:
+        self._handlers.append(handler)
+
+    def publish(self, messages: List[Invalidation]) -> None:
+        if not self.started or not messages:
+            return
+        for payload in encode(self.origin, messages):
+            try:
+                self.backend.send(payload)
+            except Exception:
+                BUS_ERRORS.inc()
+                logger.exception("Could not publish invalidation")
+        BUS_SENT.labels(backend=self.backend.name).inc(len(messages))
+
+    def _deliver(self, payload: bytes) -> None:
+        try:
+            origin, messages = decode(payload)
+        except (orjson.JSONDecodeError, KeyError, TypeError):
+            BUS_ERRORS.inc()
+            return
+        if origin == self.origin and not self.loopback:
+            return
+        BUS_RECEIVED.inc(len(messages))
+        for handler in self._handlers:
+            try:
+                handler(messages)
+            except Exception:
+                logger.exception("Invalidation handler %r failed", handler)
+
+    async def start(self) -> None:
+        if not self.started:
+            await self.backend.start(self._deliver)
+            self.started = True
+
+    async def stop(self) -> None:
+        if self.started:
+            self.started = False
+            await self.backend.stop()
+
+
+def make_backend(name: str) -> Backend:
+    if name == "unix":
+        return UnixSocketBackend(settings.invalidation_socket_dir)
+    if name == "postgres":
+        return PostgresBackend(settings.db_dsn, settings.invalidation_channel)
+    return InProcessBackend()
+
+
+bus = InvalidationBus(make_backend(settings.invalidation_backend))
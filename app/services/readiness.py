@@ -0,0 +1,203 @@
+# app/services/readiness.py
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from prometheus_client import Gauge
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from app.deps import engine
+from app.services.snapshot import node_snapshot
+from app.services.warmup import warmer
+
+logger = logging.getLogger("feature-flag-service")
+
+# ---------- Readiness / liveness checks ----------
+# Probes may arrive every second from several kubelets and load balancers, so
+# nothing here touches the database per request: the pool check is a cached
+# `SELECT 1` refreshed at most once per TTL by a single in-flight probe, and
+# loop lag comes from a background ticker.
+
+EVENT_LOOP_LAG = Gauge(
+    "event_loop_lag_seconds", "How late the loop lag monitor's last tick fired"
+)
+DB_PROBE_OK = Gauge("readiness_db_probe_ok", "1 if the last database probe passed")
+
+
+class LoopLagMonitor:
+    """
+    Sleeps `interval` seconds in a loop and records how late each wake-up
+    was. A blocked event loop shows up as lag on the next tick; `max_lag`
+    covers the last `window` ticks so one slow request does not flap the probe.
+    """
+
+    def __init__(self, interval: float, window: int = 8):
+        self.interval = interval
+        self.window = window
+        self.lag = 0.0
+        self._recent = [0.0] * window
+        self._i = 0
+        self.last_tick: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def crashed(self) -> bool:
+        return self._task is not None and self._task.done()
+
+    @property
+    def max_lag(self) -> float:
+        return max(self._recent)
+
+    def record(self, lag: float) -> None:
+        self.lag = lag
+        self._recent[self._i % self.window] = lag
+        self._i += 1
+        self.last_tick = time.monotonic()
+        EVENT_LOOP_LAG.set(lag)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(loop.time() - expected, 0.0))
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class DatabaseProbe:
+    """Cached `SELECT 1`; concurrent callers share the one probe in flight."""
+
+    def __init__(self, engine: AsyncEngine, ttl: float, timeout: float):
+        self.engine = engine
+        self.ttl = ttl
+        self.timeout = timeout
+        self.ok = False
+        self.error: Optional[str] = None
+        self.latency: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def pool_status(self) -> Dict[str, Any]:
+        """Connection counts for pools that track them (NullPool does not)."""
+        pool: Any = self.engine.pool
+        info: Dict[str, Any] = {"class": type(pool).__name__}
+        if hasattr(pool, "checkedout") and hasattr(pool, "size"):
+            info.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+                max_overflow=getattr(pool, "_max_overflow", 0),
+            )
+        return info
+
+    def exhausted(self) -> bool:
+        """True when a probe would only queue behind busy connections."""
+        pool = self.pool_status()
+        if "size" not in pool or pool["max_overflow"] < 0:  # -1 means unbounded
+            return False
+        return pool["checked_out"] >= pool["size"] + pool["max_overflow"]
+
+    async def _probe(self) -> None:
+        start = time.perf_counter()
+        try:
+            if self.exhausted():
+                raise RuntimeError("connection pool exhausted")
+            async with asyncio.timeout(self.timeout):
+                async with self.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+        except Exception as exc:  # any failure means not ready
+            self.ok, self.error = False, f"{type(exc).__name__}: {exc}"
+        else:
+            self.ok, self.error = True, None
+        self.latency = time.perf_counter() - start
+        self.checked_at = time.monotonic()
+        DB_PROBE_OK.set(1 if self.ok else 0)
+
+    async def check(self) -> bool:
+        if (
+            self.checked_at is not None
+            and time.monotonic() - self.checked_at < self.ttl
+        ):
+            return self.ok
+        async with self._lock:
+            # Another caller may have refreshed it while we waited
+            if (
+                self.checked_at is None
+                or time.monotonic() - self.checked_at >= self.ttl
+            ):
+                await self._probe()
+        return self.ok
+
+    def status(self) -> Dict[str, Any]:
+        age = None if self.checked_at is None else time.monotonic() - self.checked_at
+        return {
+            "ok": self.ok,
+            "error": self.error,
+            "latency_ms": None if self.latency is None else self.latency * 1000,
+            "age_s": age,
+            "pool": self.pool_status(),
+        }
+
+
+loop_monitor = LoopLagMonitor(settings.loop_lag_interval)
+db_probe = DatabaseProbe(
+    engine, ttl=settings.readiness_db_probe_ttl, timeout=settings.readiness_db_timeout
+)
+
+
+async def readiness() -> Dict[str, Any]:
+    """Run every readiness check; `ready` is True only if all pass."""
+    db_ok = await db_probe.check()
+    lag = loop_monitor.max_lag
+    loop_ok = lag <= settings.readiness_max_loop_lag
+    checks = {
+        "database": db_probe.status(),
+        "cache_warmup": {
+            "ok": warmer.ready,
+            "state": warmer.state,
+            "flags_loaded": warmer.flags_loaded,
+            "duration_s": warmer.duration,
+        },
+        "snapshot": {
+            # Informational: without a snapshot, cache misses go to the database
+            **node_snapshot.status(),
+            "ok": True,
+            "enabled": settings.snapshot_enabled,
+        },
+        "event_loop": {
+            "ok": loop_ok,
+            "monitor_running": loop_monitor.running,
+            "lag_ms": loop_monitor.lag * 1000,
+            "max_lag_ms": lag * 1000,
+        },
+    }
+    return {"ready": db_ok and warmer.ready and loop_ok, "checks": checks}
+
+
+def live() -> bool:
+    """
+    Liveness only fails on a loop blocked far beyond the readiness limit;
+    a slow database is a readiness problem, and restarting would not fix it.
+    """
+    if loop_monitor.crashed:
+        return False
+    return loop_monitor.lag <= settings.liveness_max_loop_lag
@@ -0,0 +1,477 @@
+# app/services/results.py
+"""
+Experiment results: per (tenant, flag, variant) exposure and conversion
+aggregates, kept up to date incrementally, with the statistics computed over
+NumPy arrays.
+
+Counting model
+- A user is exposed to the variant of their first exposure to the flag.
+- A user converts on `event` for that flag when their latest `event`
+  conversion is at or after that first exposure.
+
+Both rules only depend on per-user min/max timestamps, so applying the same
+event twice is harmless. That is what lets state be loaded lazily from the
+database while new events keep streaming in.
+
+Freshness and memory
+- Aggregates live in each worker. Between loads they only see the events
+  this worker flushes or ingests, so a tenant's state is reloaded from the
+  tables once it is `refresh_ttl` seconds old: with several workers, results
+  lag events handled elsewhere by at most that long.
+- A tenant's state holds the latest conversion per (user, event) for all its
+  users, plus the first exposure per user of each requested flag. Only the
+  `max_tenants` most recently requested tenants are kept.
+- Without a DB exposure sink there is nothing to reload from; state is then
+  never refreshed, only evicted.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from statistics import NormalDist
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.models import Conversion, Exposure
+
+# (user_id, variant, ts) and (user_id, event, ts); ts is epoch seconds
+ExposureRow = Tuple[str, str, float]
+ConversionRow = Tuple[str, str, float]
+
+
+def epoch(value: datetime) -> float:
+    """Epoch seconds for a datetime; naive values are taken as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def from_epoch(ts: float) -> datetime:
+    """Naive UTC datetime, as stored in DateTime columns."""
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
+
+
+# ---------- Statistics ----------
+_ERFC_COEFFS = (
+    -1.26551223,
+    1.00002368,
+    0.37409196,
+    0.09678418,
+    -0.18628806,
+    0.27886807,
+    -1.13520398,
+    1.48851587,
+    -0.82215223,
+    0.17087277,
+)
+
+
+def erfc(x: np.ndarray) -> np.ndarray:
+    """
+    Complementary error function (Numerical Recipes `erfcc`), vectorized.
+    Fractional error below 1.2e-7 everywhere, so small p-values stay accurate.
+    """
+    z = np.abs(x)
+    t = 1.0 / (1.0 + 0.5 * z)
+    poly = np.zeros_like(t)
+    for c in reversed(_ERFC_COEFFS):
+        poly = c + t * poly
+    ans = t * np.exp(-z * z + poly)
+    return np.where(x >= 0, ans, 2.0 - ans)
+
+
+def proportion_stats(
+    exposures: np.ndarray, conversions: np.ndarray, control: int, confidence: float
+) -> Dict[str, np.ndarray]:
+    """
+    Conversion rate, Wilson score interval, relative lift and two-sided
+    two-proportion z-test p-value against `control`, for all variants at once.
+    Undefined values (no exposures, zero variance, the control itself) are NaN.
+    """
+    n = exposures.astype(np.float64)
+    x = conversions.astype(np.float64)
+    z_crit = NormalDist().inv_cdf(0.5 + confidence / 2)
+    z2 = z_crit * z_crit
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(n > 0, x / n, np.nan)
+
+        denom = n + z2
+        center = (x + z2 / 2) / denom
+        half = z_crit * np.sqrt(x * (n - x) / n + z2 / 4) / denom
+        ci_low = np.where(n > 0, center - half, np.nan)
+        ci_high = np.where(n > 0, center + half, np.nan)
+
+        n0, x0, rate0 = n[control], x[control], rate[control]
+        pooled = (x + x0) / (n + n0)
+        se = np.sqrt(pooled * (1 - pooled) * (1 / n + 1 / n0))
+        zscore = (rate - rate0) / se
+        p_value = np.where(
+            (se > 0) & np.isfinite(zscore), erfc(np.abs(zscore) / np.sqrt(2)), np.nan
+        )
+        lift = np.where(rate0 > 0, (rate - rate0) / rate0, np.nan)
+
+    p_value[control] = np.nan
+    lift[control] = np.nan
+    return {
+        "rate": rate,
+        "ci_low": ci_low,
+        "ci_high": ci_high,
+        "lift": lift,
+        "p_value": p_value,
+    }
+
+
+def _num(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+# ---------- Incremental aggregates ----------
+@dataclass
+class FlagResults:
+    variants: List[str] = field(default_factory=list)
+    index: Dict[str, int] = field(default_factory=dict)
+    # user -> (variant index, first exposure ts)
+    exposed: Dict[str, Tuple[int, float]] = field(default_factory=dict)
+    exposures: np.ndarray = field(default_factory=lambda: np.zeros(0, np.int64))
+    conversions: Dict[str, np.ndarray] = field(default_factory=dict)
+    converted: Dict[str, set] = field(default_factory=dict)
+
+    def variant_index(self, variant: str) -> int:
+        idx = self.index.get(variant)
+        if idx is None:
+            idx = self.index[variant] = len(self.variants)
+            self.variants.append(variant)
+            self.exposures = np.append(self.exposures, 0)
+            for event, counts in self.conversions.items():
+                self.conversions[event] = np.append(counts, 0)
+        return idx
+
+    def _counts(self, event: str) -> np.ndarray:
+        counts = self.conversions.get(event)
+        if counts is None:
+            counts = self.conversions[event] = np.zeros(len(self.variants), np.int64)
+            self.converted[event] = set()
+        return counts
+
+    def add_exposures(
+        self, rows: Iterable[ExposureRow], user_conversions: Dict[str, Dict[str, float]]
+    ) -> None:
+        new_idx: List[int] = []
+        converts: Dict[str, List[int]] = {}
+        for user, variant, ts in rows:
+            seen = self.exposed.get(user)
+            if seen is not None:
+                if ts < seen[1]:
+                    # An earlier exposure arrived late: it decides the variant
+                    idx = self.variant_index(variant)
+                    if idx != seen[0]:
+                        self._move(user, seen[0], idx)
+                    self.exposed[user] = (idx, ts)
+                    self._match(user, idx, ts, user_conversions, converts)
+                continue
+            idx = self.variant_index(variant)
+            self.exposed[user] = (idx, ts)
+            new_idx.append(idx)
+            self._match(user, idx, ts, user_conversions, converts)
+        np.add.at(self.exposures, new_idx, 1)
+        for event, idxs in converts.items():
+            np.add.at(self.conversions[event], idxs, 1)
+
+    def _move(self, user: str, old: int, new: int) -> None:
+        """Re-attribute an exposed user, and their conversions, to `new`."""
+        self.exposures[old] -= 1
+        self.exposures[new] += 1
+        for event, users in self.converted.items():
+            if user in users:
+                self.conversions[event][old] -= 1
+                self.conversions[event][new] += 1
+
+    def _match(
+        self,
+        user: str,
+        idx: int,
+        ts: float,
+        user_conversions: Dict[str, Dict[str, float]],
+        converts: Dict[str, List[int]],
+    ) -> None:
+        for event, last_ts in user_conversions.get(user, {}).items():
+            if last_ts >= ts:
+                self._counts(event)
+                if user not in self.converted[event]:
+                    self.converted[event].add(user)
+                    converts.setdefault(event, []).append(idx)
+
+    def add_conversions(self, rows: Iterable[ConversionRow]) -> None:
+        converts: Dict[str, List[int]] = {}
+        for user, event, ts in rows:
+            seen = self.exposed.get(user)
+            if seen is None or ts < seen[1]:
+                continue
+            self._counts(event)
+            if user not in self.converted[event]:
+                self.converted[event].add(user)
+                converts.setdefault(event, []).append(seen[0])
+        for event, idxs in converts.items():
+            np.add.at(self.conversions[event], idxs, 1)
+
+    def summary(
+        self, flag_key: str, confidence: float, event: Optional[str] = None
+    ) -> Dict[str, Any]:
+        control = self.index.get("control", 0)
+        metrics = []
+        for name in sorted(self.conversions):
+            if event is not None and name != event:
+                continue
+            stats = proportion_stats(
+                self.exposures, self.conversions[name], control, confidence
+            )
+            metrics.append(
+                {
+                    "event": name,
+                    "variants": [
+                        {
+                            "variant": variant,
+                            "exposures": int(self.exposures[i]),
+                            "conversions": int(self.conversions[name][i]),
+                            "rate": _num(stats["rate"][i]) or 0.0,
+                            "ci_low": _num(stats["ci_low"][i]),
+                            "ci_high": _num(stats["ci_high"][i]),
+                            "lift": _num(stats["lift"][i]),
+                            "p_value": _num(stats["p_value"][i]),
+                        }
+                        for i, variant in enumerate(self.variants)
+                    ],
+                }
+            )
+        return {
+            "flag_key": flag_key,
+            "control": self.variants[control] if self.variants else None,
+            "confidence": confidence,
+            "exposures": {
+                v: int(self.exposures[i]) for i, v in enumerate(self.variants)
+            },
+            "metrics": metrics,
+        }
+
+
+@dataclass
+class TenantResults:
+    # user -> event -> latest conversion ts
+    conversions: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    flags: Dict[str, FlagResults] = field(default_factory=dict)
+    # Events that arrived while the tenant/flag was being loaded
+    pending_conversions: Optional[List[ConversionRow]] = None
+    pending_exposures: Dict[str, List[ExposureRow]] = field(default_factory=dict)
+    loaded_at: float = field(default_factory=time.monotonic)
+
+
+class ResultsEngine:
+    """
+    Holds aggregates for the (tenant, flag) pairs that have been asked for.
+    State is loaded from the database on first request, then kept current by
+    the exposure flusher and the conversion ingest endpoint until it is
+    `refresh_ttl` seconds old and reloaded. Events for pairs nobody has asked
+    about are skipped; they are read from the tables on load.
+    """
+
+    def __init__(
+        self,
+        exposures_persisted: bool = True,
+        refresh_ttl: float = 60.0,
+        max_tenants: int = 100,
+    ):
+        # When exposures are not written to the DB there is nothing to load
+        # them from, so every flag is tracked from the first event instead.
+        self.exposures_persisted = exposures_persisted
+        self.refresh_ttl = refresh_ttl
+        self.max_tenants = max_tenants
+        # Least recently requested first
+        self.tenants: OrderedDict[str, TenantResults] = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def reset(self) -> None:
+        self.tenants.clear()
+        self._locks.clear()
+
+    # ----- ingest -----
+    def add_exposures(
+        self, events: Iterable[Tuple[str, str, str, str, Optional[str], float]]
+    ) -> None:
+        grouped: Dict[Tuple[str, str], List[ExposureRow]] = {}
+        for tenant, flag_key, variant, user_id, _rule_id, ts in events:
+            grouped.setdefault((tenant, flag_key), []).append((user_id, variant, ts))
+        for (tenant, flag_key), rows in grouped.items():
+            state = self.tenants.get(tenant)
+            if state is None and not self.exposures_persisted:
+                state = self.tenants[tenant] = TenantResults()
+            if state is None:
+                continue
+            if flag_key in state.pending_exposures:
+                state.pending_exposures[flag_key].extend(rows)
+                continue
+            flag = state.flags.get(flag_key)
+            if flag is None and not self.exposures_persisted:
+                flag = state.flags[flag_key] = FlagResults()
+            if flag is not None:
+                flag.add_exposures(rows, state.conversions)
+
+    def add_conversions(self, tenant: str, rows: List[ConversionRow]) -> None:
+        state = self.tenants.get(tenant)
+        if state is None:
+            return
+        if state.pending_conversions is not None:
+            state.pending_conversions.extend(rows)
+            return
+        self._apply_conversions(state, rows)
+
+    @staticmethod
+    def _apply_conversions(state: TenantResults, rows: List[ConversionRow]) -> None:
+        for user, event, ts in rows:
+            events = state.conversions.setdefault(user, {})
+            if ts > events.get(event, float("-inf")):
+                events[event] = ts
+        for flag in state.flags.values():
+            flag.add_conversions(rows)
+
+    # ----- lazy loading -----
+    async def get(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        tenant: str,
+        flag_key: str,
+    ) -> FlagResults:
+        state = self.tenants.get(tenant)
+        if state is not None and flag_key in state.flags and self._fresh(state):
+            self.tenants.move_to_end(tenant)
+            return state.flags[flag_key]
+
+        lock = self._locks.setdefault(tenant, asyncio.Lock())
+        async with lock:
+            state = self.tenants.get(tenant)
+            if state is None or not self._fresh(state):
+                state = await self._load_tenant(sessionmaker, tenant)
+            if flag_key not in state.flags:
+                await self._load_flag(sessionmaker, tenant, state, flag_key)
+            self.tenants.move_to_end(tenant)
+            self._evict()
+        return state.flags[flag_key]
+
+    def _fresh(self, state: TenantResults) -> bool:
+        if not self.exposures_persisted:
+            return True
+        return time.monotonic() - state.loaded_at < self.refresh_ttl
+
+    def _evict(self) -> None:
+        while len(self.tenants) > self.max_tenants:
+            tenant, _ = self.tenants.popitem(last=False)
+            self._locks.pop(tenant, None)
+
+    async def _load_tenant(
+        self, sessionmaker: async_sessionmaker[AsyncSession], tenant: str
+    ) -> TenantResults:
+        state = self.tenants[tenant] = TenantResults(pending_conversions=[])
+        try:
+            async with sessionmaker() as db:
+                result = await db.execute(
+                    select(Conversion.user_id, Conversion.event, Conversion.ts).where(
+                        Conversion.tenant_id == tenant
+                    )
+                )
+                rows = [(user, event, epoch(ts)) for user, event, ts in result]
+        except Exception:
+            if self.tenants.get(tenant) is state:
+                del self.tenants[tenant]
+            raise
+        pending, state.pending_conversions = state.pending_conversions, None
+        self._apply_conversions(state, rows + (pending or []))
+        return state
+
+    async def _load_flag(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        tenant: str,
+        state: TenantResults,
+        flag_key: str,
+    ) -> None:
+        state.pending_exposures[flag_key] = []
+        flag = FlagResults()
+        try:
+            if self.exposures_persisted:
+                async with sessionmaker() as db:
+                    result = await db.execute(
+                        select(Exposure.user_id, Exposure.variant, Exposure.ts)
+                        .where(
+                            Exposure.tenant_id == tenant, Exposure.flag_key == flag_key
+                        )
+                        .order_by(Exposure.ts)
+                    )
+                    rows = result.all()
+                load_exposures(flag, rows, state.conversions)
+        finally:
+            pending = state.pending_exposures.pop(flag_key)
+        flag.add_exposures(pending, state.conversions)
+        state.flags[flag_key] = flag
+
+
+def load_exposures(
+    flag: FlagResults,
+    rows: Sequence[Any],
+    user_conversions: Dict[str, Dict[str, float]],
+) -> None:
+    """
+    Bulk-build a flag's aggregates from raw exposure rows ordered by ts.
+    First exposures, per-variant counts and the conversion join are computed
+    with array operations instead of a Python loop per row.
+    """
+    if not rows:
+        return
+    users_all = np.array([r[0] for r in rows], dtype=object)
+    variants_all = np.array([r[1] for r in rows], dtype=object)
+
+    users, first = np.unique(users_all, return_index=True)
+    ts = np.array([epoch(rows[i][2]) for i in first], dtype=np.float64)
+    names, codes = np.unique(variants_all[first], return_inverse=True)
+    for name in names:
+        flag.variant_index(name)
+    remap = np.array([flag.index[name] for name in names], dtype=np.int64)
+    codes = remap[codes]
+
+    flag.exposures += np.bincount(codes, minlength=len(flag.variants))
+    flag.exposed.update(zip(users.tolist(), zip(codes.tolist(), ts.tolist())))
+
+    # Join conversions: sorted unique users allow a searchsorted lookup
+    conv_users = [u for u in user_conversions for _ in user_conversions[u]]
+    if not conv_users:
+        return
+    conv_events = np.array(
+        [e for u in user_conversions for e in user_conversions[u]], dtype=object
+    )
+    conv_ts = np.array(
+        [t for u in user_conversions for t in user_conversions[u].values()],
+        dtype=np.float64,
+    )
+    conv_users_arr = np.array(conv_users, dtype=object)
+    pos = np.searchsorted(users, conv_users_arr)
+    pos_clipped = np.minimum(pos, len(users) - 1)
+    match = (pos < len(users)) & (users[pos_clipped] == conv_users_arr)
+    match &= conv_ts >= ts[pos_clipped]
+
+    for event in np.unique(conv_events[match]):
+        sel = match & (conv_events == event)
+        counts = flag._counts(event)
+        counts += np.bincount(codes[pos_clipped[sel]], minlength=len(flag.variants))
+        flag.converted[event].update(conv_users_arr[sel].tolist())
+
+
+results_engine = ResultsEngine(
+    exposures_persisted=settings.exposure_sink == "db",
+    refresh_ttl=settings.results_refresh_ttl,
+    max_tenants=settings.results_max_tenants,
+)
@@ -0,0 +1,285 @@
+# app/services/snapshot.py
+import asyncio
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.deps import SessionLocal
+from app.models import Flag, Segment
+from app.services.snapshot_format import (
+    NodeSnapshotReader,
+    encode_node,
+    encode_tenant,
+)
+
+logger = logging.getLogger("feature-flag-service")
+
+# ---------- Per-node flag snapshot ----------
+# With many workers per node, each one used to load and cache every flag on
+# its own. Instead one worker per node (whoever holds an flock on the lock
+# file) builds a snapshot of all live flags into a file, and every worker
+# maps that file read-only, so the page cache holds a single copy.
+#
+# The builder writes a temp file and os.replace()s it over the old one, so a
+# reader sees either the previous or the new snapshot, never a torn one.
+# Readers notice the swap by stat() on a timer and remap; mappings of the
+# old file stay valid until their last reference goes away.
+#
+# The file is a node snapshot in the binary format of
+# app.services.snapshot_format: one section per tenant with its flags and
+# segments, looked up through hash indexes without decoding the rest.
+
+SNAPSHOT_FILE = "flags.snapshot"
+LOCK_FILE = "builder.lock"
+
+# Fields evaluation needs; the rest of the row stays in the database
+FLAG_FIELDS = ("id", "tenant_id", "key", "state", "variants", "rules", "version")
+SEGMENT_FIELDS = ("id", "tenant_id", "key", "criteria", "version")
+
+SNAPSHOT_BUILDS = Counter("flag_snapshot_builds_total", "Node snapshots written")
+SNAPSHOT_BUILD_SECONDS = Gauge(
+    "flag_snapshot_build_seconds", "Time taken by the last snapshot build"
+)
+SNAPSHOT_FLAGS = Gauge("flag_snapshot_tenants", "Tenants in the mapped snapshot")
+SNAPSHOT_LEADER = Gauge(
+    "flag_snapshot_leader", "1 if this process builds the node snapshot"
+)
+
+Fingerprint = Tuple[Any, ...]
+
+
+def encode_snapshot(
+    flags: Sequence[Dict[str, Any]],
+    segments: Sequence[Dict[str, Any]],
+    built_at: float,
+) -> bytes:
+    """Group rows by tenant and encode them as a node snapshot."""
+    by_tenant: Dict[str, Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]] = {}
+    for flag in flags:
+        by_tenant.setdefault(flag["tenant_id"], ([], []))[0].append(flag)
+    for segment in segments:
+        by_tenant.setdefault(segment["tenant_id"], ([], []))[1].append(segment)
+    sections = {
+        tenant: encode_tenant(tenant, tenant_flags, tenant_segments, 0, built_at)
+        for tenant, (tenant_flags, tenant_segments) in by_tenant.items()
+    }
+    return encode_node(sections, built_at)
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Write to a temp file next to `path`, fsync, then rename over it."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+class MappedSnapshot(NodeSnapshotReader):
+    """A node snapshot read straight from a read-only mapping of its file."""
+
+    @classmethod
+    def open(cls, path: str) -> "MappedSnapshot":
+        with open(path, "rb") as fh:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buf)
+
+    def get(self, tenant: str, key: str) -> Optional[Dict[str, Any]]:
+        section = self.tenant(tenant)
+        return None if section is None else section.flag(key)
+
+    def has_tenant(self, tenant: str) -> bool:
+        return self.tenant(tenant) is not None
+
+
+class NodeSnapshot:
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        directory: str,
+        build_interval: float,
+        poll_interval: float,
+        max_age: float,
+    ):
+        self.sessionmaker = sessionmaker
+        self.directory = directory
+        self.path = os.path.join(directory, SNAPSHOT_FILE)
+        self.build_interval = build_interval
+        self.poll_interval = poll_interval
+        self.max_age = max_age
+        self.current: Optional[MappedSnapshot] = None
+        self.leader = False
+        self._lock_fd: Optional[int] = None
+        self._file_id: Optional[Tuple[int, int, int]] = None
+        self._fingerprint: Optional[Fingerprint] = None
+        self._last_build = 0.0
+        self._last_check = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    # ----- reading -----
+    def get_flag(
+        self, tenant: str, key: str, newer_than: float = 0.0
+    ) -> Optional[Dict[str, Any]]:
+        """
+        The flag as of the mapped snapshot, or None if it is absent, the
+        snapshot is too old (builder gone) or predates `newer_than`.
+        """
+        snap = self.current
+        if snap is None:
+            return None
+        if snap.built_at <= newer_than or time.time() - snap.built_at > self.max_age:
+            return None
+        return snap.get(tenant, key)
+
+    def refresh(self) -> bool:
+        """Remap the snapshot file if it was replaced; True when it changed."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        file_id = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if file_id == self._file_id:
+            return False
+        try:
+            snap = MappedSnapshot.open(self.path)
+        except (OSError, ValueError, struct.error):
+            logger.exception("Could not map flag snapshot %s", self.path)
+            return False
+        self.current, self._file_id = snap, file_id
+        SNAPSHOT_FLAGS.set(snap.tenant_count)
+        return True
+
+    # ----- building -----
+    def try_lead(self) -> bool:
+        """Take the node-wide builder lock if no other process holds it."""
+        if self.leader:
+            return True
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(os.path.join(self.directory, LOCK_FILE), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd, self.leader = fd, True
+        SNAPSHOT_LEADER.set(1)
+        logger.info("Building the node flag snapshot in pid %d", os.getpid())
+        return True
+
+    def release(self) -> None:
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        self.leader = False
+        SNAPSHOT_LEADER.set(0)
+
+    async def fingerprint(self, db: AsyncSession) -> Fingerprint:
+        """Cheap aggregates that change whenever any flag or segment changes."""
+        flags = (
+            await db.execute(
+                select(
+                    func.count(Flag.id),
+                    func.count(Flag.deleted_at),
+                    func.sum(Flag.version),
+                    func.max(Flag.updated_at),
+                )
+            )
+        ).one()
+        segments = (
+            await db.execute(
+                select(
+                    func.count(Segment.id),
+                    func.sum(Segment.version),
+                    func.max(Segment.updated_at),
+                )
+            )
+        ).one()
+        return tuple(flags) + tuple(segments)
+
+    async def build(self, force: bool = False) -> bool:
+        """Write a new snapshot if flags changed since the last one."""
+        start = time.perf_counter()
+        built_at = time.time()
+        async with self.sessionmaker() as db:
+            fp = await self.fingerprint(db)
+            # Rewrite unchanged data now and then so readers can tell a live
+            # builder from a dead one by the snapshot's age
+            if (
+                not force
+                and fp == self._fingerprint
+                and built_at - self._last_build < self.max_age / 2
+            ):
+                return False
+            columns = [getattr(Flag, name) for name in FLAG_FIELDS]
+            result = await db.execute(
+                select(*columns)
+                .where(Flag.deleted_at.is_(None))
+                .order_by(Flag.tenant_id, Flag.key)
+            )
+            flags = [dict(zip(FLAG_FIELDS, row)) for row in result]
+            result = await db.execute(
+                select(*[getattr(Segment, name) for name in SEGMENT_FIELDS])
+            )
+            segments = [dict(zip(SEGMENT_FIELDS, row)) for row in result]
+        data = await asyncio.to_thread(encode_snapshot, flags, segments, built_at)
+        await asyncio.to_thread(write_atomic, self.path, data)
+        self._fingerprint, self._last_build = fp, built_at
+        SNAPSHOT_BUILDS.inc()
+        SNAPSHOT_BUILD_SECONDS.set(time.perf_counter() - start)
+        self.refresh()
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                now = time.monotonic()
+                if self.try_lead() and now - self._last_check >= self.build_interval:
+                    self._last_check = now
+                    await self.build()
+                self.refresh()
+            except Exception:
+                logger.exception("Flag snapshot refresh failed")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.release()
+
+    def status(self) -> Dict[str, Any]:
+        snap = self.current
+        return {
+            "mapped": snap is not None,
+            "leader": self.leader,
+            "tenants": snap.tenant_count if snap else 0,
+            "age_s": time.time() - snap.built_at if snap else None,
+        }
+
+
+node_snapshot = NodeSnapshot(
+    SessionLocal,
+    directory=settings.snapshot_dir,
+    build_interval=settings.snapshot_build_interval,
+    poll_interval=settings.snapshot_poll_interval,
+    max_age=settings.snapshot_max_age,
+)
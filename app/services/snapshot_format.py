@@ -0,0 +1,418 @@
+# app/services/snapshot_format.py
+import mmap
+import struct
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import orjson
+
+# ---------- Binary tenant snapshot format ----------
+# A tenant's flags and segments in a form that is cheap to ship (to SDKs,
+# sidecars, other workers) and cheap to read: a reader works directly on a
+# bytes/memoryview/mmap and only decodes the records it is asked for.
+#
+# All integers are little endian; offsets are relative to the section start.
+#
+#   header      "FFTS", format version (u16), reserved (u16),
+#               snapshot version (u64), built_at (f64, epoch s),
+#               tenant (string id, u32), string count, flag count,
+#               segment count (u32 each), then the offsets of the string
+#               table, flag index and segment index (u32 each)
+#   strings     (count + 1) u32 end offsets into the UTF-8 data that follows.
+#               Every key, variant key, rule and criteria document is stored
+#               once however many flags use it.
+#   index       slot count (u32, a power of two) then slots of
+#               (key string id u32, record offset u32); open addressing on
+#               crc32(key) with linear probing, EMPTY marks a free slot
+#   flag        id (u64), key (u32), state (u8, 1 = on), variant count (u16),
+#               rule count (u16), version (u32), then per variant
+#               key (u32), weight (f64), cumulative normalized weight (f64),
+#               then one string id (u32) per rule holding the rule as JSON
+#   segment     id (u64), key (u32), version (u32), criteria JSON (u32)
+#
+# Cumulative weights are what evaluation walks when bucketing: a user lands
+# in the first variant whose cumulative weight is >= their bucket. When all
+# weights are zero the cumulative weights are zero too and evaluation falls
+# back to "control".
+#
+# A node snapshot bundles many tenant sections behind a hash index on the
+# tenant id:
+#
+#   header      "FFNS", format version (u16), reserved (u16), built_at (f64),
+#               tenant count (u32), slot count (u32)
+#   slots       (crc32(tenant) u32, section offset u64, section length u32);
+#               length 0 marks a free slot
+#   sections    tenant sections as above, back to back
+
+FORMAT_VERSION = 1
+TENANT_MAGIC = b"FFTS"
+NODE_MAGIC = b"FFNS"
+EMPTY = 0xFFFFFFFF
+
+TENANT_HEADER = struct.Struct("<4sHHQdIIIIIII")
+NODE_HEADER = struct.Struct("<4sHHdII")
+NODE_SLOT = struct.Struct("<IQI")
+U32 = struct.Struct("<I")
+INDEX_SLOT = struct.Struct("<II")
+FLAG_HEAD = struct.Struct("<QIBHHI")
+VARIANT = struct.Struct("<Idd")
+SEGMENT = struct.Struct("<QIII")
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+def _hash(key: bytes) -> int:
+    return zlib.crc32(key)
+
+
+def _slot_count(n: int) -> int:
+    """Power of two with the table at most half full."""
+    size = 1
+    while size < 2 * n:
+        size <<= 1
+    return size
+
+
+class _StringTable:
+    def __init__(self) -> None:
+        self.ids: Dict[str, int] = {}
+        self.values: List[bytes] = []
+
+    def add(self, value: str) -> int:
+        sid = self.ids.get(value)
+        if sid is None:
+            sid = self.ids[value] = len(self.values)
+            self.values.append(value.encode())
+        return sid
+
+    def add_json(self, value: Any) -> int:
+        return self.add(orjson.dumps(value, option=orjson.OPT_SORT_KEYS).decode())
+
+    def encode(self) -> bytes:
+        ends, end = [], 0
+        for value in self.values:
+            end += len(value)
+            ends.append(end)
+        offsets = struct.pack(f"<{len(ends) + 1}I", 0, *ends)
+        return offsets + b"".join(self.values)
+
+
+def _index(entries: List[Tuple[bytes, int, int]], base: int) -> bytes:
+    """Hash table of (key bytes, key string id, record offset from `base`)."""
+    size = _slot_count(len(entries))
+    slots = [(EMPTY, 0)] * size
+    mask = size - 1
+    for key, sid, offset in entries:
+        i = _hash(key) & mask
+        while slots[i][0] != EMPTY:
+            i = (i + 1) & mask
+        slots[i] = (sid, base + offset)
+    return U32.pack(size) + b"".join(INDEX_SLOT.pack(*s) for s in slots)
+
+
+def cumulative_weights(variants: List[Dict[str, Any]]) -> List[float]:
+    """Running sum of normalized weights, as evaluate_flag walks them."""
+    total = sum(v.get("weight", 0) for v in variants)
+    cumulative, out = 0.0, []
+    for v in variants:
+        if total > 0:
+            cumulative += v.get("weight", 0) / total
+        out.append(cumulative)
+    return out
+
+
+def encode_tenant(
+    tenant: str,
+    flags: Iterable[Dict[str, Any]],
+    segments: Iterable[Dict[str, Any]] = (),
+    version: int = 0,
+    built_at: float = 0.0,
+) -> bytes:
+    """
+    Encode one tenant's flags (id, key, state, variants, rules, version) and
+    segments (id, key, criteria, version) as a tenant section.
+    """
+    strings = _StringTable()
+    tenant_sid = strings.add(tenant)
+
+    flag_records, flag_entries, offset = [], [], 0
+    for flag in flags:
+        key_sid = strings.add(flag["key"])
+        variants = flag.get("variants") or []
+        rules = flag.get("rules") or []
+        parts = [
+            FLAG_HEAD.pack(
+                flag.get("id") or 0,
+                key_sid,
+                0 if flag.get("state") == "off" else 1,
+                len(variants),
+                len(rules),
+                flag.get("version") or 0,
+            )
+        ]
+        for v, cum in zip(variants, cumulative_weights(variants)):
+            parts.append(VARIANT.pack(strings.add(v["key"]), v.get("weight", 0), cum))
+        parts.extend(U32.pack(strings.add_json(rule)) for rule in rules)
+        record = b"".join(parts)
+        flag_entries.append((flag["key"].encode(), key_sid, offset))
+        flag_records.append(record)
+        offset += len(record)
+
+    segment_records, segment_entries, seg_offset = [], [], 0
+    for segment in segments:
+        key_sid = strings.add(segment["key"])
+        record = SEGMENT.pack(
+            segment.get("id") or 0,
+            key_sid,
+            segment.get("version") or 0,
+            strings.add_json(segment.get("criteria") or {}),
+        )
+        segment_entries.append((segment["key"].encode(), key_sid, seg_offset))
+        segment_records.append(record)
+        seg_offset += len(record)
+
+    string_table = strings.encode()
+    flags_start = TENANT_HEADER.size + len(string_table)
+    segments_start = flags_start + offset
+    index_start = segments_start + seg_offset
+    flag_index = _index(flag_entries, flags_start)
+    segment_index = _index(segment_entries, segments_start)
+    header = TENANT_HEADER.pack(
+        TENANT_MAGIC,
+        FORMAT_VERSION,
+        0,
+        version,
+        built_at,
+        tenant_sid,
+        len(strings.values),
+        len(flag_records),
+        len(segment_records),
+        TENANT_HEADER.size,
+        index_start,
+        index_start + len(flag_index),
+    )
+    return b"".join(
+        [
+            header,
+            string_table,
+            *flag_records,
+            *segment_records,
+            flag_index,
+            segment_index,
+        ]
+    )
+
+
+class TenantSnapshotReader:
+    """
+    Lazy reader over one tenant section. Nothing is decoded up front; each
+    lookup hashes the key, probes the index and decodes that record only.
+    Decoded strings (keys, rule documents) are memoized per reader.
+    """
+
+    def __init__(self, buf: Buffer):
+        view = memoryview(buf)
+        if view.format != "B" or view.ndim != 1:
+            view = view.cast("B")
+        (
+            magic,
+            fmt,
+            _,
+            self.version,
+            self.built_at,
+            tenant_sid,
+            self.string_count,
+            self.flag_count,
+            self.segment_count,
+            strings_off,
+            self._flag_index,
+            self._segment_index,
+        ) = TENANT_HEADER.unpack_from(view, 0)
+        if magic != TENANT_MAGIC:
+            raise ValueError("Not a tenant snapshot")
+        if fmt != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format version {fmt}")
+        self._view = self.data = view
+        self._string_offsets = strings_off
+        self._string_data = strings_off + 4 * (self.string_count + 1)
+        self._strings: Dict[int, str] = {}
+        self._json: Dict[int, Any] = {}
+        self.tenant = self.string(tenant_sid)
+
+    # ----- strings -----
+    def _string_bytes(self, sid: int) -> memoryview:
+        start, end = struct.unpack_from(
+            "<II", self._view, self._string_offsets + 4 * sid
+        )
+        return self._view[self._string_data + start : self._string_data + end]
+
+    def string(self, sid: int) -> str:
+        value = self._strings.get(sid)
+        if value is None:
+            value = self._strings[sid] = str(self._string_bytes(sid), "utf-8")
+        return value
+
+    def _document(self, sid: int) -> Any:
+        # Shared between flags using the same rule; treat as read-only
+        doc = self._json.get(sid)
+        if doc is None:
+            doc = self._json[sid] = orjson.loads(self._string_bytes(sid))
+        return doc
+
+    # ----- index -----
+    def _find(self, index_off: int, key: str) -> Optional[int]:
+        view = self._view
+        (size,) = U32.unpack_from(view, index_off)
+        if not size:
+            return None
+        encoded = key.encode()
+        mask = size - 1
+        i = _hash(encoded) & mask
+        base = index_off + 4
+        while True:
+            sid, offset = INDEX_SLOT.unpack_from(view, base + 8 * i)
+            if sid == EMPTY:
+                return None
+            if self._string_bytes(sid) == encoded:
+                return offset
+            i = (i + 1) & mask
+
+    def _iter_index(self, index_off: int) -> Iterator[Tuple[int, int]]:
+        (size,) = U32.unpack_from(self._view, index_off)
+        for i in range(size):
+            sid, offset = INDEX_SLOT.unpack_from(self._view, index_off + 4 + 8 * i)
+            if sid != EMPTY:
+                yield sid, offset
+
+    # ----- flags -----
+    def _decode_flag(self, offset: int) -> Dict[str, Any]:
+        view = self._view
+        flag_id, key_sid, on, n_variants, n_rules, version = FLAG_HEAD.unpack_from(
+            view, offset
+        )
+        pos = offset + FLAG_HEAD.size
+        variants = []
+        for _ in range(n_variants):
+            sid, weight, _cum = VARIANT.unpack_from(view, pos)
+            variants.append({"key": self.string(sid), "weight": weight})
+            pos += VARIANT.size
+        rule_sids = struct.unpack_from(f"<{n_rules}I", view, pos)
+        return {
+            "id": flag_id,
+            "tenant_id": self.tenant,
+            "key": self.string(key_sid),
+            "state": "on" if on else "off",
+            "variants": variants,
+            "rules": [self._document(sid) for sid in rule_sids],
+            "version": version,
+        }
+
+    def flag(self, key: str) -> Optional[Dict[str, Any]]:
+        """The flag as a dict evaluate_flag accepts, or None."""
+        offset = self._find(self._flag_index, key)
+        return None if offset is None else self._decode_flag(offset)
+
+    def variant_weights(self, key: str) -> Optional[List[Tuple[str, float]]]:
+        """(variant, cumulative normalized weight) pairs of a flag."""
+        offset = self._find(self._flag_index, key)
+        if offset is None:
+            return None
+        n_variants = FLAG_HEAD.unpack_from(self._view, offset)[3]
+        pos = offset + FLAG_HEAD.size
+        out = []
+        for _ in range(n_variants):
+            sid, _weight, cum = VARIANT.unpack_from(self._view, pos)
+            out.append((self.string(sid), cum))
+            pos += VARIANT.size
+        return out
+
+    def flag_keys(self) -> List[str]:
+        return sorted(self.string(sid) for sid, _ in self._iter_index(self._flag_index))
+
+    def flags(self) -> Iterator[Dict[str, Any]]:
+        for _, offset in self._iter_index(self._flag_index):
+            yield self._decode_flag(offset)
+
+    # ----- segments -----
+    def _decode_segment(self, offset: int) -> Dict[str, Any]:
+        seg_id, key_sid, version, criteria_sid = SEGMENT.unpack_from(self._view, offset)
+        return {
+            "id": seg_id,
+            "tenant_id": self.tenant,
+            "key": self.string(key_sid),
+            "criteria": self._document(criteria_sid),
+            "version": version,
+        }
+
+    def segment(self, key: str) -> Optional[Dict[str, Any]]:
+        offset = self._find(self._segment_index, key)
+        return None if offset is None else self._decode_segment(offset)
+
+    def segments(self) -> Iterator[Dict[str, Any]]:
+        for _, offset in self._iter_index(self._segment_index):
+            yield self._decode_segment(offset)
+
+
+def encode_node(sections: Dict[str, bytes], built_at: float) -> bytes:
+    """Bundle encoded tenant sections (tenant -> bytes) into a node snapshot."""
+    size = _slot_count(len(sections))
+    slots = [(0, 0, 0)] * size
+    mask = size - 1
+    offset = NODE_HEADER.size + NODE_SLOT.size * size
+    for tenant, section in sections.items():
+        h = _hash(tenant.encode())
+        i = h & mask
+        while slots[i][2]:
+            i = (i + 1) & mask
+        slots[i] = (h, offset, len(section))
+        offset += len(section)
+    header = NODE_HEADER.pack(
+        NODE_MAGIC, FORMAT_VERSION, 0, built_at, len(sections), size
+    )
+    return b"".join([header, *(NODE_SLOT.pack(*s) for s in slots), *sections.values()])
+
+
+class NodeSnapshotReader:
+    """Lazy reader over a node snapshot; tenant readers are opened on demand."""
+
+    def __init__(self, buf: Buffer):
+        view = memoryview(buf)
+        if view.format != "B" or view.ndim != 1:
+            view = view.cast("B")
+        magic, fmt, _, self.built_at, self.tenant_count, self._slots = (
+            NODE_HEADER.unpack_from(view, 0)
+        )
+        if magic != NODE_MAGIC:
+            raise ValueError("Not a node snapshot")
+        if fmt != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format version {fmt}")
+        self._view = view
+        self._tenants: Dict[str, TenantSnapshotReader] = {}
+
+    def tenant(self, tenant: str) -> Optional[TenantSnapshotReader]:
+        found = self._tenants.get(tenant)
+        if found is not None:
+            return found
+        h = _hash(tenant.encode())
+        mask = self._slots - 1
+        i = h & mask
+        while self._slots:
+            slot_h, offset, length = NODE_SLOT.unpack_from(
+                self._view, NODE_HEADER.size + NODE_SLOT.size * i
+            )
+            if not length:
+                break
+            if slot_h == h:
+                section = TenantSnapshotReader(self._view[offset : offset + length])
+                if section.tenant == tenant:
+                    found = section
+                    break
+            i = (i + 1) & mask
+        if found is not None:
+            self._tenants[tenant] = found
+        return found
+
+    def section_bytes(self, tenant: str) -> Optional[memoryview]:
+        """The raw tenant section, e.g. to ship as-is to an SDK."""
+        snap = self.tenant(tenant)
+        return None if snap is None else snap.data
@@ -0,0 +1,254 @@
+# app/services/snapshot_store.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.deps import SessionLocal
+from app.models import Change, Flag, Segment
+from app.services.changes import ChangeEvent, subscribe, tenant_position
+from app.services.invalidation import Invalidation, bus
+from app.services.snapshot_format import encode_tenant
+from app.utils.pagination import version_etag
+from app.utils.serialization import dumps, flag_to_dict, segment_to_dict
+
+logger = logging.getLogger("feature-flag-service")
+
+# ---------- Tenant snapshots for SDKs and sidecars ----------
+# GET /v1/snapshot serves a tenant's whole flag and segment config. Each
+# tenant's state is loaded once and kept encoded in memory; writes mark it
+# dirty and a debounced rebuild replaces it, so a burst of writes costs one
+# reload and serving a snapshot is a dict lookup plus a memory copy.
+#
+# The version is the tenant's change log sequence (app.services.changes),
+# so every worker computes the same version and ETag for the same data. A
+# delta `since=<version>` holds the entries changed after it plus the keys
+# removed after it; below the compaction floor the removals are no longer
+# known and the full snapshot is sent instead. Rebuilds are triggered by
+# committed changes rather than by each write path.
+
+SNAPSHOT_STORE_BUILDS = Counter(
+    "tenant_snapshot_builds_total", "Tenant snapshot rebuilds", ["reason"]
+)
+SNAPSHOT_STORE_TENANTS = Gauge(
+    "tenant_snapshot_tenants", "Tenant snapshots held in memory"
+)
+
+# Delta bodies cached per tenant state; pollers tend to share a few versions
+DELTA_CACHE_SIZE = 16
+
+
+class TenantState:
+    """One immutable, fully encoded view of a tenant's configuration."""
+
+    def __init__(
+        self,
+        tenant: str,
+        flags: Dict[str, Tuple[int, Dict[str, Any]]],
+        segments: Dict[str, Tuple[int, Dict[str, Any]]],
+        removed: Dict[Tuple[str, str], int],
+        version: int = 0,
+        floor: int = 0,
+    ):
+        self.tenant = tenant
+        self.flags = flags  # key -> (seq of last change, body)
+        self.segments = segments
+        self.removed = removed  # ("flag" | "segment", key) -> seq of delete
+        self.version = version
+        self.floor = floor
+        self.etag = version_etag(self.version)
+        self.loaded_at = time.monotonic()
+        self.body = dumps(
+            {
+                "tenant": tenant,
+                "version": self.version,
+                "full": True,
+                "flags": [body for _, body in flags.values()],
+                "segments": [body for _, body in segments.values()],
+            }
+        )
+        self._binary: Optional[bytes] = None
+        self._deltas: "OrderedDict[int, bytes]" = OrderedDict()
+
+    def binary(self) -> bytes:
+        """The same snapshot in the compact binary format (encoded on first use)."""
+        if self._binary is None:
+            self._binary = encode_tenant(
+                self.tenant,
+                [body for _, body in self.flags.values()],
+                [body for _, body in self.segments.values()],
+                version=self.version,
+                built_at=time.time(),
+            )
+        return self._binary
+
+    def delta(self, since: int) -> bytes:
+        if since < self.floor:
+            return self.body  # removals before the floor were compacted away
+        body = self._deltas.get(since)
+        if body is not None:
+            return body
+        removed: Dict[str, List[str]] = {"flags": [], "segments": []}
+        for (kind, key), at in self.removed.items():
+            if at > since:
+                removed[f"{kind}s"].append(key)
+        body = dumps(
+            {
+                "tenant": self.tenant,
+                "version": self.version,
+                "since": since,
+                "full": False,
+                "flags": [b for v, b in self.flags.values() if v > since],
+                "segments": [b for v, b in self.segments.values() if v > since],
+                "removed": removed,
+            }
+        )
+        self._deltas[since] = body
+        if len(self._deltas) > DELTA_CACHE_SIZE:
+            self._deltas.popitem(last=False)
+        return body
+
+
+async def load_tenant(db: AsyncSession, tenant: str) -> TenantState:
+    version, floor = await tenant_position(db, tenant)
+    last_seq = {
+        (entity, key): seq
+        for entity, key, seq in await db.execute(
+            select(Change.entity, Change.entity_key, func.max(Change.seq))
+            .where(Change.tenant_id == tenant)
+            .group_by(Change.entity, Change.entity_key)
+        )
+    }
+    flags: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+    removed: Dict[Tuple[str, str], int] = {}
+    for flag in await db.scalars(
+        select(Flag).where(Flag.tenant_id == tenant).order_by(Flag.key)
+    ):
+        seq = last_seq.get(("flag", flag.key), 0)
+        if flag.deleted_at is None:
+            flags[flag.key] = (seq, flag_to_dict(flag))
+        elif seq:
+            removed["flag", flag.key] = seq
+
+    segments = {
+        s.key: (last_seq.get(("segment", s.key), 0), segment_to_dict(s))
+        for s in await db.scalars(
+            select(Segment).where(Segment.tenant_id == tenant).order_by(Segment.key)
+        )
+    }
+    # Segments are hard-deleted; their last change is the delete
+    for (entity, key), seq in last_seq.items():
+        if entity == "segment" and key not in segments:
+            removed["segment", key] = seq
+    return TenantState(tenant, flags, segments, removed, version, floor)
+
+
+class SnapshotStore:
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        debounce: float,
+        max_age: float,
+        max_tenants: int,
+    ):
+        self.sessionmaker = sessionmaker
+        self.debounce = debounce
+        self.max_age = max_age
+        self.max_tenants = max_tenants
+        self._states: "OrderedDict[str, TenantState]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._pending: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def rebuild(self, tenant: str, reason: str = "load") -> TenantState:
+        lock = self._locks.setdefault(tenant, asyncio.Lock())
+        async with lock:
+            async with self.sessionmaker() as db:
+                state = await load_tenant(db, tenant)
+            self._states[tenant] = state
+            self._states.move_to_end(tenant)
+            while len(self._states) > self.max_tenants:
+                evicted, _ = self._states.popitem(last=False)
+                self._locks.pop(evicted, None)
+        SNAPSHOT_STORE_BUILDS.labels(reason=reason).inc()
+        SNAPSHOT_STORE_TENANTS.set(len(self._states))
+        return state
+
+    def _spawn(self, tenant: str, reason: str, delay: float) -> None:
+        if tenant in self._pending:
+            return
+        self._pending.add(tenant)
+
+        async def run() -> None:
+            try:
+                if delay:
+                    await asyncio.sleep(delay)
+                self._pending.discard(tenant)
+                await self.rebuild(tenant, reason)
+            except Exception:
+                self._pending.discard(tenant)
+                logger.exception("Tenant snapshot rebuild failed for %s", tenant)
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def mark_dirty(self, tenant: str, seq: int = 0) -> None:
+        """Schedule a rebuild after the debounce window (coalesces bursts)."""
+        state = self._states.get(tenant)
+        if state is None or (seq and state.version >= seq):
+            return  # nothing cached (the next read loads it) or already current
+        try:
+            self._spawn(tenant, "write", self.debounce)
+        except RuntimeError:  # no running loop (e.g. sync scripts)
+            self._states.pop(tenant, None)
+
+    def on_changes(self, events: List[ChangeEvent]) -> None:
+        latest: Dict[str, int] = {}
+        for e in events:
+            latest[e.tenant] = max(latest.get(e.tenant, 0), e.seq)
+        for tenant, seq in latest.items():
+            self.mark_dirty(tenant, seq)
+
+    def on_invalidations(self, messages: List[Invalidation]) -> None:
+        """Writes through other workers, reported by the invalidation bus."""
+        for m in messages:
+            if m.entity == "reset":
+                self._states.clear()
+            else:
+                self.mark_dirty(m.tenant, m.seq)
+
+    async def get(self, tenant: str) -> TenantState:
+        state = self._states.get(tenant)
+        if state is None:
+            return await self.rebuild(tenant)
+        self._states.move_to_end(tenant)
+        # Backstop for invalidations the bus failed to deliver
+        if time.monotonic() - state.loaded_at > self.max_age:
+            self._spawn(tenant, "refresh", 0)
+        return state
+
+    async def settle(self) -> None:
+        """Wait for scheduled rebuilds (used by tests and shutdown)."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def clear(self) -> None:
+        self._states.clear()
+        self._locks.clear()
+
+
+snapshot_store = SnapshotStore(
+    SessionLocal,
+    debounce=settings.snapshot_store_debounce,
+    max_age=settings.snapshot_store_max_age,
+    max_tenants=settings.snapshot_store_max_tenants,
+)
+subscribe(snapshot_store.on_changes)
+bus.subscribe(snapshot_store.on_invalidations)
@@ -0,0 +1,268 @@
+# app/services/stream.py
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.deps import SessionLocal
+from app.services.changes import ChangeEvent, changes_since, subscribe
+from app.services.invalidation import Invalidation, bus
+from app.utils.serialization import dumps
+
+logger = logging.getLogger("feature-flag-service")
+
+# ---------- Change event stream (SSE) ----------
+# GET /v1/stream pushes committed changes to subscribers as server-sent
+# events whose id is the change log seq, so a reconnect with Last-Event-ID
+# replays exactly what was missed from the `changes` table.
+#
+# The hub is fed by the change log's after-commit hook and fans each event
+# out to the tenant's subscribers. An event is encoded once and the same
+# bytes are queued for every subscriber; an idle subscriber costs one queue
+# and one suspended generator, no task or timer of its own besides the
+# heartbeat wait. Queues are bounded: a subscriber that falls behind is
+# dropped from fan-out and its stream ends once the queue drains; the
+# client's reconnect with Last-Event-ID then catches up from the database
+# instead of this worker buffering for a slow reader without limit.
+#
+# A cursor below the compaction floor cannot be replayed (deletes before it
+# are gone), so the stream sends a `resync` event and the client reloads
+# GET /v1/snapshot.
+#
+# Changes committed by other workers arrive as invalidation bus messages
+# carrying only the seq; the hub then reads what it has not sent yet from
+# the change log. The same catch-up fills gaps in local events (another
+# worker committed seq N but this one heard of N+1 first), so each tenant's
+# events always go out in seq order.
+
+STREAM_SUBSCRIBERS = Gauge("stream_subscribers", "Open change stream connections")
+STREAM_EVENTS = Counter("stream_events_total", "Change events queued to subscribers")
+STREAM_OVERFLOWS = Counter(
+    "stream_overflows_total", "Subscribers dropped for falling behind"
+)
+
+HEARTBEAT = b": keep-alive\n\n"
+# Replay page size when catching up from Last-Event-ID
+REPLAY_PAGE = 500
+
+
+def encode_event(event: str, data: object, event_id: Optional[int] = None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: ".encode() + dumps(data) + b"\n\n"
+
+
+def encode_change(change: ChangeEvent) -> bytes:
+    return encode_event(
+        "change",
+        {
+            "seq": change.seq,
+            "entity": change.entity,
+            "key": change.key,
+            "action": change.action,
+            "version": change.version,
+        },
+        change.seq,
+    )
+
+
+class Subscriber:
+    """One stream connection: a bounded queue of (seq, encoded event)."""
+
+    def __init__(self, tenant: str, queue_size: int):
+        self.tenant = tenant
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def push(self, item: tuple) -> bool:
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            self.overflowed = True
+            return False
+
+    def close(self) -> None:
+        """End the stream; the client resumes from its Last-Event-ID."""
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class StreamHub:
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        queue_size: int,
+        heartbeat: float,
+        max_subscribers: int,
+    ):
+        self.sessionmaker = sessionmaker
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._count = 0
+        self._head: Dict[str, int] = {}  # last seq fanned out per tenant
+        self._catching_up: Set[str] = set()
+        self._again: Set[str] = set()  # asked to catch up while already at it
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def full(self) -> bool:
+        return self._count >= self.max_subscribers
+
+    def subscribe(self, tenant: str) -> Optional[Subscriber]:
+        """Reserve a stream slot for `tenant`; None when the hub is full."""
+        if self.full:
+            return None
+        sub = Subscriber(tenant, self.queue_size)
+        self._subscribers.setdefault(tenant, set()).add(sub)
+        self._count += 1
+        STREAM_SUBSCRIBERS.set(self._count)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        subs = self._subscribers.get(sub.tenant)
+        if subs is None or sub not in subs:
+            return
+        subs.discard(sub)
+        if not subs:
+            del self._subscribers[sub.tenant]
+            self._head.pop(sub.tenant, None)
+        self._count -= 1
+        STREAM_SUBSCRIBERS.set(self._count)
+
+    def _fan_out(self, change: ChangeEvent) -> None:
+        subs = self._subscribers.get(change.tenant)
+        if not subs:
+            return
+        self._head[change.tenant] = change.seq
+        item = (change.seq, encode_change(change))
+        for sub in list(subs):
+            if sub.push(item):
+                STREAM_EVENTS.inc()
+            else:
+                STREAM_OVERFLOWS.inc()
+                self.unsubscribe(sub)
+
+    def on_changes(self, events: List[ChangeEvent]) -> None:
+        for change in events:
+            if change.tenant not in self._subscribers:
+                continue
+            head = self._head.get(change.tenant)
+            if head is None or change.seq == head + 1:
+                self._fan_out(change)
+            elif change.seq > head + 1:
+                self._catch_up(change.tenant)
+
+    def on_invalidations(self, messages: List[Invalidation]) -> None:
+        """Changes committed elsewhere: fetch whatever was not sent yet."""
+        for m in messages:
+            tenants = list(self._subscribers) if m.entity == "reset" else [m.tenant]
+            for tenant in tenants:
+                if tenant not in self._subscribers:
+                    continue
+                head = self._head.get(tenant)
+                if head is None and m.seq:
+                    self._head[tenant] = head = m.seq - 1
+                if head is not None and (m.seq > head or m.entity == "reset"):
+                    self._catch_up(tenant)
+
+    def _catch_up(self, tenant: str) -> None:
+        if tenant in self._catching_up:
+            self._again.add(tenant)
+            return
+        self._catching_up.add(tenant)
+
+        async def run() -> None:
+            try:
+                while tenant in self._head:
+                    async with self.sessionmaker() as db:
+                        page = await changes_since(
+                            db, tenant, self._head[tenant], REPLAY_PAGE
+                        )
+                    for change in page.changes:
+                        if change.seq > self._head.get(tenant, change.seq):
+                            self._fan_out(change)
+                    if len(page.changes) == REPLAY_PAGE:
+                        continue
+                    if tenant not in self._again:
+                        break
+                    self._again.discard(tenant)
+            except Exception:
+                logger.exception("Change stream catch-up failed for %s", tenant)
+            finally:
+                self._catching_up.discard(tenant)
+                self._again.discard(tenant)
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def settle(self) -> None:
+        """Wait for catch-up reads (used by tests)."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def close(self) -> None:
+        """End every open stream (shutdown)."""
+        for subs in list(self._subscribers.values()):
+            for sub in list(subs):
+                self.unsubscribe(sub)
+                sub.close()
+
+    async def events(
+        self, sub: Subscriber, last_id: Optional[int]
+    ) -> AsyncIterator[bytes]:
+        """
+        The SSE body of one subscriber: missed changes after `last_id`, then
+        live ones, with heartbeats while idle. `sub` comes from subscribe(),
+        called before replaying so nothing committed in between is missed;
+        it is released when the stream ends.
+        """
+        tenant = sub.tenant
+        try:
+            yield b"retry: 2000\n\n"
+            seen = last_id or 0
+            while last_id is not None:
+                # One short session per page; a slow reader holds no connection
+                async with self.sessionmaker() as db:
+                    page = await changes_since(db, tenant, seen, REPLAY_PAGE)
+                if seen < page.floor:
+                    # Deletes before the floor are gone; the client must reload
+                    yield encode_event("resync", {"seq": page.head}, page.head)
+                    return
+                for change in page.changes:
+                    seen = change.seq
+                    yield encode_change(change)
+                if len(page.changes) < REPLAY_PAGE:
+                    break
+            while True:
+                try:
+                    item = await asyncio.wait_for(sub.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+                    continue
+                if item is None:
+                    return
+                seq, chunk = item
+                if seq > seen:  # replay may already have sent it
+                    seen = seq
+                    yield chunk
+                if sub.overflowed and sub.queue.empty():
+                    return
+        finally:
+            self.unsubscribe(sub)
+
+
+hub = StreamHub(
+    SessionLocal,
+    queue_size=settings.stream_queue_size,
+    heartbeat=settings.stream_heartbeat,
+    max_subscribers=settings.stream_max_subscribers,
+)
+subscribe(hub.on_changes)
+bus.subscribe(hub.on_invalidations)
@@ -0,0 +1,169 @@
+# app/services/warmup.py
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import select, union
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.deps import SessionLocal
+from app.models import Flag, Segment
+from app.services.cache import (
+    flag_cache,
+    flag_cache_entry,
+    get_flag_cache_key,
+    set_segment_cache,
+    tenant_cache,
+)
+from app.utils.serialization import segment_to_dict
+
+logger = logging.getLogger("feature-flag-service")
+
+# ---------- Startup cache warm-up ----------
+# Right after a deploy every evaluation would miss the flag cache and hit the
+# database at once. The warmer preloads live flags and segments, a shard of
+# tenants per query, and /readyz reports "warming" until it is done so the
+# load balancer keeps traffic away from a cold worker.
+
+STATES = ("idle", "running", "ready", "failed")
+
+WARMUP_STATE = Gauge(
+    "cache_warmup_state", "1 for the current cache warm-up state", ["state"]
+)
+WARMUP_TENANTS_TOTAL = Gauge(
+    "cache_warmup_tenants_total", "Tenants to load during cache warm-up"
+)
+WARMUP_TENANTS_LOADED = Gauge(
+    "cache_warmup_tenants_loaded", "Tenants loaded so far during cache warm-up"
+)
+WARMUP_ROWS = Counter(
+    "cache_warmup_rows_total", "Rows loaded into caches at startup", ["kind"]
+)
+WARMUP_DURATION = Gauge(
+    "cache_warmup_duration_seconds", "Wall time of the last cache warm-up"
+)
+
+
+class CacheWarmer:
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        shard_size: int,
+        max_flags: Optional[int] = None,
+    ):
+        self.sessionmaker = sessionmaker
+        self.shard_size = max(1, shard_size)
+        self.max_flags = max_flags
+        self.state = "idle"
+        self.flags_loaded = 0
+        self.segments_loaded = 0
+        self.duration: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._set_state("idle")
+
+    @property
+    def ready(self) -> bool:
+        """False only while a warm-up is in progress; failures fall back to cold."""
+        return self.state != "running"
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        for s in STATES:
+            WARMUP_STATE.labels(state=s).set(1 if s == state else 0)
+
+    async def tenants(self) -> List[str]:
+        """Tenants owning a live flag or a segment, in a stable order."""
+        live = select(Flag.tenant_id).where(Flag.deleted_at.is_(None))
+        query = union(live, select(Segment.tenant_id))
+        async with self.sessionmaker() as db:
+            rows = await db.execute(query)
+        return sorted(row[0] for row in rows)
+
+    async def _load_shard(self, shard: List[str]) -> None:
+        async with self.sessionmaker() as db:
+            flags = await db.scalars(
+                select(Flag).where(Flag.tenant_id.in_(shard), Flag.deleted_at.is_(None))
+            )
+            n_flags = 0
+            for flag in flags:
+                flag_cache.set(
+                    get_flag_cache_key(flag.tenant_id, flag.key),
+                    flag_cache_entry(flag),
+                )
+                n_flags += 1
+            segments = await db.scalars(
+                select(Segment).where(Segment.tenant_id.in_(shard))
+            )
+            n_segments = 0
+            for segment in segments:
+                set_segment_cache(
+                    segment.tenant_id, segment.key, segment_to_dict(segment)
+                )
+                n_segments += 1
+        for tenant in shard:
+            tenant_cache.set(tenant, True)
+        self.flags_loaded += n_flags
+        self.segments_loaded += n_segments
+        WARMUP_ROWS.labels(kind="flag").inc(n_flags)
+        WARMUP_ROWS.labels(kind="segment").inc(n_segments)
+
+    async def run(self) -> None:
+        """Load every live flag and segment, `shard_size` tenants per query."""
+        self._set_state("running")
+        self.flags_loaded = self.segments_loaded = 0
+        start = time.perf_counter()
+        try:
+            tenants = await self.tenants()
+            WARMUP_TENANTS_TOTAL.set(len(tenants))
+            WARMUP_TENANTS_LOADED.set(0)
+            for i in range(0, len(tenants), self.shard_size):
+                if self.max_flags is not None and self.flags_loaded >= self.max_flags:
+                    logger.info(
+                        "Cache warm-up stopped at %d flags (limit)", self.flags_loaded
+                    )
+                    break
+                shard = tenants[i : i + self.shard_size]
+                await self._load_shard(shard)
+                WARMUP_TENANTS_LOADED.set(i + len(shard))
+                await asyncio.sleep(0)  # let health checks through between shards
+        except Exception:
+            logger.exception("Cache warm-up failed; serving with cold caches")
+            self._set_state("failed")
+        else:
+            self._set_state("ready")
+        finally:
+            self.duration = time.perf_counter() - start
+            WARMUP_DURATION.set(self.duration)
+        logger.info(
+            "Cache warm-up %s: %d flags, %d segments in %.2fs",
+            self.state,
+            self.flags_loaded,
+            self.segments_loaded,
+            self.duration,
+        )
+
+    def start(self) -> None:
+        """Run in the background; readiness reports warming until it finishes."""
+        if self._task is None or self._task.done():
+            self._set_state("running")
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._set_state("idle")
+        self._task = None
+
+
+warmer = CacheWarmer(
+    SessionLocal,
+    shard_size=settings.cache_warmup_shard_size,
+    max_flags=settings.cache_warmup_max_flags or None,
+)
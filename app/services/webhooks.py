@@ -0,0 +1,503 @@
+# app/services/webhooks.py
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import logging
+import random
+import socket
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import httpx
+from prometheus_client import Counter, Histogram
+from sqlalchemy import Row, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.deps import SessionLocal
+from app.models import TenantSequence, Webhook, WebhookDelivery
+from app.services.changes import ChangeEvent, changes_since, subscribe
+from app.utils.serialization import dumps
+
+logger = logging.getLogger("feature-flag-service")
+
+# ---------- Webhook change notifications ----------
+# Deliveries are fed from the change log, not from memory: each webhook keeps
+# a cursor (the last change seq it has queued), and turning the changes after
+# it into delivery rows advances the cursor in the same transaction. A worker
+# dying between a commit and queueing its deliveries loses nothing; the
+# changes stay in the log until some worker moves the cursor past them.
+#
+# The change log's after-commit hook only notes which tenants changed, so the
+# write path never waits on a subscriber. After `batch_window` the tenant's
+# new changes become one delivery row per matching webhook and batch (the
+# persistent retry queue), POSTed concurrently over one pooled HTTP client.
+# The periodic scan also queues changes for webhooks whose cursor is behind
+# their tenant's head, which covers writes whose worker went away.
+#
+# A failed attempt pushes next_attempt_at out with exponential backoff and
+# jitter; a periodic scan picks up due rows, including ones left behind by a
+# worker that died mid-delivery. Rows are claimed by moving next_attempt_at
+# forward with a conditional UPDATE, so several workers can share the queue
+# without sending the same batch twice. The claimed next_attempt_at is the
+# claim token: it is renewed once a concurrency slot is free, right before
+# the POST (whose total time is capped below the lease), and the outcome is
+# only recorded while the row still carries it. Waiting for a slot can
+# therefore outlast the first claim without a second worker sending too.
+
+WEBHOOK_DELIVERIES = Counter(
+    "webhook_deliveries_total", "Webhook delivery attempts", ["outcome"]
+)
+WEBHOOK_SECONDS = Histogram(
+    "webhook_delivery_seconds",
+    "Time taken by one webhook POST",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+SIGNATURE_HEADER = "X-Webhook-Signature"
+# Due rows claimed per retry scan
+RETRY_BATCH = 100
+# Change log entries read per query when queueing deliveries
+ENQUEUE_PAGE = 1000
+
+# (delivery id, next_attempt_at written by the claim)
+Claim = Tuple[int, datetime]
+
+
+def sign(secret: str, body: bytes) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+# ---------- Target checks ----------
+# Webhook URLs are tenant input, so the service must not become a proxy into
+# its own network: loopback, private, link-local (cloud metadata at
+# 169.254.169.254), shared, reserved and multicast addresses are refused.
+# Names are resolved when a webhook is saved and again before every attempt,
+# since DNS can start pointing somewhere internal later. The attempt then
+# connects to the address it checked rather than letting the HTTP client
+# resolve the name a second time (which a rebinding DNS server could answer
+# differently); the Host header and TLS SNI still carry the name, so virtual
+# hosting and certificate checks are unchanged. A name that does not resolve
+# can be saved, but is not posted to until it does.
+
+
+def _blocked(ip: ipaddress.IPv4Address | ipaddress.IPv6Address) -> bool:
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return not ip.is_global or ip.is_multicast
+
+
+async def resolve_target(url: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    The checked address to connect to for `url`, and why `url` may not
+    receive webhooks (None if it may). The address is None when private
+    targets are allowed, in which case the client resolves the name itself.
+    Raises socket.gaierror if the name does not resolve.
+    """
+    host = httpx.URL(url).host
+    if not host:
+        return None, "URL has no host"
+    if settings.webhook_allow_private_targets:
+        return None, None
+    try:
+        addresses = [ipaddress.ip_address(host)]
+    except ValueError:
+        if host == "localhost" or host.endswith(".localhost"):
+            return None, f"Blocked target host {host}"
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, None, type=socket.SOCK_STREAM
+        )
+        addresses = [ipaddress.ip_address(info[4][0]) for info in infos]
+    for ip in addresses:
+        if _blocked(ip):
+            return None, f"Blocked target address {ip}"
+    return str(addresses[0]), None
+
+
+async def target_error(url: str) -> Optional[str]:
+    """Why `url` may not receive webhooks, or None if it may."""
+    try:
+        return (await resolve_target(url))[1]
+    except socket.gaierror:
+        return None
+
+
+def change_to_dict(change: ChangeEvent) -> Dict[str, object]:
+    return {
+        "seq": change.seq,
+        "entity": change.entity,
+        "key": change.key,
+        "action": change.action,
+        "version": change.version,
+    }
+
+
+class WebhookDispatcher:
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        batch_window: float,
+        batch_max: int,
+        timeout: float,
+        concurrency: int,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+        retry_interval: float,
+    ):
+        self.sessionmaker = sessionmaker
+        self.batch_window = batch_window
+        self.batch_max = batch_max
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_interval = retry_interval
+        # A claimed row is left alone by other workers for this long
+        self.lease = timedelta(seconds=timeout * 3)
+        self._pending: Set[str] = set()  # tenants with a flush scheduled
+        self._tasks: Set[asyncio.Task] = set()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._retry_task: Optional[asyncio.Task] = None
+
+    # ----- intake (runs inside the committing request) -----
+    def on_changes(self, events: List[ChangeEvent]) -> None:
+        for tenant in {change.tenant for change in events}:
+            if tenant in self._pending:
+                continue
+            try:
+                self._spawn(self._flush_later(tenant))
+            except RuntimeError:  # no running loop; the periodic scan catches up
+                return
+            self._pending.add(tenant)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush_later(self, tenant: str) -> None:
+        await asyncio.sleep(self.batch_window)
+        self._pending.discard(tenant)
+        try:
+            claims = await self.enqueue(tenant)
+        except Exception:
+            logger.exception("Could not queue webhook deliveries for %s", tenant)
+            return
+        await asyncio.gather(*(self.deliver(*claim) for claim in claims))
+
+    # ----- the persistent queue -----
+    async def enqueue(self, tenant: str) -> List[Claim]:
+        """Queue the tenant's changes after each webhook's cursor, claimed by us."""
+        async with self.sessionmaker() as db:
+            hooks = (
+                await db.execute(
+                    select(
+                        Webhook.id, Webhook.cursor, Webhook.entities, Webhook.active
+                    ).where(Webhook.tenant_id == tenant)
+                )
+            ).all()
+        claims: List[Claim] = []
+        for hook in hooks:
+            claims.extend(await self._enqueue_hook(tenant, hook))
+        return claims
+
+    async def _enqueue_hook(self, tenant: str, hook: Row) -> List[Claim]:
+        claims: List[Claim] = []
+        cursor = hook.cursor
+        while True:
+            claimed_until = datetime.utcnow() + self.lease
+            async with self.sessionmaker() as db:
+                page = await changes_since(db, tenant, cursor, ENQUEUE_PAGE)
+                if not page.changes:
+                    return claims
+                if cursor < page.floor:
+                    logger.warning(
+                        "Webhook %s fell behind compaction; superseded changes "
+                        "before seq %d are not sent",
+                        hook.id,
+                        page.floor,
+                    )
+                wanted = [e for e in page.changes if e.entity in hook.entities]
+                if not hook.active:
+                    wanted = []  # paused: the cursor moves on, nothing is sent
+                rows = []
+                for i in range(0, len(wanted), self.batch_max):
+                    batch = wanted[i : i + self.batch_max]
+                    rows.append(
+                        WebhookDelivery(
+                            webhook_id=hook.id,
+                            tenant_id=tenant,
+                            payload={
+                                "tenant": tenant,
+                                "changes": [change_to_dict(e) for e in batch],
+                            },
+                            status="pending",
+                            attempts=0,
+                            # Claimed by this worker for the first attempt
+                            next_attempt_at=claimed_until,
+                        )
+                    )
+                last = page.changes[-1].seq
+                moved = await db.execute(
+                    update(Webhook)
+                    .where(Webhook.id == hook.id, Webhook.cursor == cursor)
+                    .values(cursor=last)
+                )
+                if moved.rowcount != 1:
+                    # Another worker queued these (or the hook was deleted)
+                    await db.rollback()
+                    return claims
+                db.add_all(rows)
+                await db.commit()
+            claims.extend((row.id, claimed_until) for row in rows)
+            cursor = last
+            if len(page.changes) < ENQUEUE_PAGE:
+                return claims
+
+    async def catch_up(self) -> int:
+        """Queue and attempt changes of webhooks whose cursor lags the log."""
+        async with self.sessionmaker() as db:
+            tenants = list(
+                await db.scalars(
+                    select(Webhook.tenant_id)
+                    .join(TenantSequence, TenantSequence.tenant_id == Webhook.tenant_id)
+                    .where(TenantSequence.seq > Webhook.cursor)
+                    .distinct()
+                )
+            )
+        claims: List[Claim] = []
+        for tenant in tenants:
+            if tenant not in self._pending:  # a flush is about to run anyway
+                claims.extend(await self.enqueue(tenant))
+        await asyncio.gather(*(self.deliver(*claim) for claim in claims))
+        return len(claims)
+
+    def backoff(self, attempts: int) -> float:
+        """Delay before the attempt after `attempts` failures, with jitter."""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                ),
+            )
+            self._slots = asyncio.Semaphore(self.concurrency)
+        return self._client
+
+    async def _post(
+        self,
+        url: str,
+        address: Optional[str],
+        secret: Optional[str],
+        body: bytes,
+        headers: Dict[str, str],
+    ) -> Optional[str]:
+        """
+        POST one batch to `url`, connecting to `address` if given; None on
+        success, otherwise the error to record.
+        """
+        client = self._http()
+        target = httpx.URL(url)
+        headers = {"Content-Type": "application/json", **headers}
+        extensions: Dict[str, object] = {}
+        if address is not None and address != target.host:
+            headers["Host"] = target.netloc.decode("ascii")
+            extensions["sni_hostname"] = target.host
+            target = target.copy_with(host=address)
+        if secret:
+            headers[SIGNATURE_HEADER] = sign(secret, body)
+        with WEBHOOK_SECONDS.time():
+            try:
+                # httpx timeouts are per phase; cap the whole exchange so it
+                # always ends within the claim's lease
+                response = await asyncio.wait_for(
+                    client.post(
+                        target, content=body, headers=headers, extensions=extensions
+                    ),
+                    self.timeout,
+                )
+            except asyncio.TimeoutError:
+                return "Timeout"
+            except httpx.HTTPError as exc:
+                return f"{type(exc).__name__}: {exc}"
+        if response.is_success:
+            return None
+        return f"HTTP {response.status_code}"
+
+    async def deliver(self, delivery_id: int, claimed_until: datetime) -> bool:
+        """Make one attempt at a delivery claimed until `claimed_until`."""
+        self._http()
+        assert self._slots is not None
+        async with self._slots:
+            return await self._attempt(delivery_id, claimed_until)
+
+    async def _attempt(self, delivery_id: int, claimed_until: datetime) -> bool:
+        # Renew the claim now that a slot is free; if it lapsed while waiting
+        # and another worker took the row over, leave it to that worker
+        renewed = datetime.utcnow() + self.lease
+        async with self.sessionmaker() as db:
+            result = await db.execute(
+                update(WebhookDelivery)
+                .where(
+                    WebhookDelivery.id == delivery_id,
+                    WebhookDelivery.status == "pending",
+                    WebhookDelivery.next_attempt_at == claimed_until,
+                )
+                .values(next_attempt_at=renewed)
+            )
+            if result.rowcount != 1:
+                await db.rollback()
+                WEBHOOK_DELIVERIES.labels(outcome="lost_claim").inc()
+                return False
+            row = (
+                await db.execute(
+                    select(
+                        WebhookDelivery.payload,
+                        WebhookDelivery.attempts,
+                        Webhook.url,
+                        Webhook.secret,
+                        Webhook.active,
+                    )
+                    .join(Webhook, Webhook.id == WebhookDelivery.webhook_id)
+                    .where(WebhookDelivery.id == delivery_id)
+                )
+            ).one()
+            await db.commit()
+
+        # No connection is held while the request is in flight
+        attempts = row.attempts + 1
+        values: Dict[str, object] = {"attempts": attempts}
+        if not row.active:
+            error: Optional[str] = "webhook paused"
+            values.update(status="failed", last_error=error)
+            outcome = "failed"
+        else:
+            # Checked per attempt: the name may resolve elsewhere by now
+            try:
+                address, error = await resolve_target(row.url)
+            except socket.gaierror as exc:
+                address, error = None, f"Cannot resolve target: {exc}"
+            error = error or await self._post(
+                row.url,
+                address,
+                row.secret,
+                dumps(row.payload),
+                {
+                    "X-Webhook-Delivery": str(delivery_id),
+                    "X-Webhook-Attempt": str(attempts),
+                },
+            )
+            if error is None:
+                values.update(status="delivered", last_error=None)
+                outcome = "delivered"
+            elif attempts >= self.max_attempts:
+                values.update(status="failed", last_error=error)
+                outcome = "failed"
+            else:
+                delay = timedelta(seconds=self.backoff(attempts))
+                values.update(
+                    last_error=error, next_attempt_at=datetime.utcnow() + delay
+                )
+                outcome = "retry"
+        async with self.sessionmaker() as db:
+            result = await db.execute(
+                update(WebhookDelivery)
+                .where(
+                    WebhookDelivery.id == delivery_id,
+                    WebhookDelivery.next_attempt_at == renewed,
+                )
+                .values(**values)
+            )
+            await db.commit()
+        if result.rowcount != 1:
+            # Lease lapsed mid-attempt: the row belongs to another claim now
+            logger.warning("Webhook delivery %s outcome dropped", delivery_id)
+            outcome = "lost_claim"
+        WEBHOOK_DELIVERIES.labels(outcome=outcome).inc()
+        return error is None
+
+    async def retry_due(self) -> int:
+        """Claim and attempt deliveries whose next attempt is due."""
+        now = datetime.utcnow()
+        claimed_until = now + self.lease
+        claimed: List[Claim] = []
+        async with self.sessionmaker() as db:
+            due = await db.execute(
+                select(WebhookDelivery.id, WebhookDelivery.next_attempt_at)
+                .where(
+                    WebhookDelivery.status == "pending",
+                    WebhookDelivery.next_attempt_at <= now,
+                )
+                .order_by(WebhookDelivery.next_attempt_at)
+                .limit(RETRY_BATCH)
+            )
+            for delivery_id, due_at in due.all():
+                result = await db.execute(
+                    update(WebhookDelivery)
+                    .where(
+                        WebhookDelivery.id == delivery_id,
+                        WebhookDelivery.next_attempt_at == due_at,
+                    )
+                    .values(next_attempt_at=claimed_until)
+                )
+                if result.rowcount == 1:
+                    claimed.append((delivery_id, claimed_until))
+            await db.commit()
+        await asyncio.gather(*(self.deliver(*claim) for claim in claimed))
+        return len(claimed)
+
+    # ----- lifecycle -----
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.retry_interval)
+            try:
+                await self.catch_up()
+                await self.retry_due()
+            except Exception:
+                logger.exception("Webhook retry scan failed")
+
+    def start(self) -> None:
+        if self._retry_task is None:
+            self._retry_task = asyncio.get_running_loop().create_task(self._run())
+
+    async def settle(self) -> None:
+        """Wait for scheduled flushes to be queued and attempted."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def stop(self) -> None:
+        if self._retry_task is not None:
+            self._retry_task.cancel()
+            try:
+                await self._retry_task
+            except asyncio.CancelledError:
+                pass
+            self._retry_task = None
+        # Let scheduled flushes run; whatever is left is queued by the next scan
+        await self.settle()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+webhooks = WebhookDispatcher(
+    SessionLocal,
+    batch_window=settings.webhook_batch_window,
+    batch_max=settings.webhook_batch_max,
+    timeout=settings.webhook_timeout,
+    concurrency=settings.webhook_concurrency,
+    max_attempts=settings.webhook_max_attempts,
+    backoff_base=settings.webhook_backoff_base,
+    backoff_max=settings.webhook_backoff_max,
+    retry_interval=settings.webhook_retry_interval,
+)
+subscribe(webhooks.on_changes)
@@ -1,9 +1,20 @@
 # app/utils/logging.py
+import atexit
 import json
 import logging
+import logging.handlers
+import queue
+import random
 import sys
+import time
+from datetime import datetime, timezone
 from typing import Optional, Any, Dict
+
 from fastapi import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.utils.metrics import route_path
 
 # ---------- Structured JSON Logging ----------
 
@@ -11,7 +22,9 @@ from fastapi import Request
 class JsonFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         payload: Dict[str, Any] = {
-            "timestamp": self.formatTime(record, "%Y-%m-%dT%H:%M:%S.%fZ"),
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc)
+            .isoformat(timespec="microseconds")
+            .replace("+00:00", "Z"),
             "level": record.levelname,
             "message": record.getMessage(),
             "logger": record.name,
@@ -29,17 +42,66 @@ class JsonFormatter(logging.Formatter):
             payload["request_id"] = record.request_id
         if hasattr(record, "duration_ms"):
             payload["duration_ms"] = record.duration_ms
+        if hasattr(record, "suppressed"):
+            payload["suppressed"] = record.suppressed
         if record.exc_info:
             payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
         return json.dumps(payload)
 
 
+class _PreparedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records with their message merged but otherwise unformatted.
+    The stock QueueHandler renders the whole record with the default formatter
+    on the calling thread; here JSON formatting happens on the listener thread.
+    Tracebacks are rendered eagerly since frames cannot cross threads safely.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
 def setup_logging(level: str = "INFO") -> None:
+    """
+    Route all log records through a queue; a background thread formats them as
+    JSON and writes to stdout, keeping serialization off the event loop.
+    """
+    global _listener
+    stop_logging()
+
     handler = logging.StreamHandler(sys.stdout)
     handler.setFormatter(JsonFormatter())
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(
+        log_queue, handler, respect_handler_level=True
+    )
+    _listener.start()
+
     root = logging.getLogger()
     root.setLevel(level)
-    root.handlers = [handler]
+    root.handlers = [_PreparedQueueHandler(log_queue)]
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
 
 
 # ---------- Helpers to attach request context ----------
@@ -59,3 +121,109 @@ def get_request_context(
     if duration_ms is not None:
         context["duration_ms"] = float(round(duration_ms, 2))  # ensure type is float
     return context
+
+
+def get_scope_context(scope: Scope, duration_ms: float) -> Dict[str, Any]:
+    """Same fields as get_request_context, read straight from the ASGI scope."""
+    tenant = "unknown"
+    request_id = "none"
+    for name, value in scope["headers"]:
+        if name == b"x-tenant-id":
+            tenant = value.decode("latin-1")
+        elif name == b"x-request-id":
+            request_id = value.decode("latin-1")
+    return {
+        "path": scope["path"],
+        "method": scope["method"],
+        "tenant": tenant,
+        "request_id": request_id,
+        "duration_ms": float(round(duration_ms, 2)),
+    }
+
+
+# ---------- Sampling / rate limiting ----------
+class TokenBucket:
+    """Allows `rate` events per second with bursts up to `burst`; counts the rest."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.suppressed = 0
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        self.suppressed += 1
+        return False
+
+    def take_suppressed(self) -> int:
+        count, self.suppressed = self.suppressed, 0
+        return count
+
+
+def success_sample_rate(route: str) -> float:
+    return settings.log_route_sample_rates.get(route, settings.log_success_sample_rate)
+
+
+class RequestLoggingMiddleware:
+    """
+    Pure ASGI request logger.
+    - Errors (status >= 400, unhandled exceptions) are logged, rate-limited by a
+      token bucket; the next emitted record reports how many were suppressed.
+    - Successful requests are sampled per route template (default: not logged).
+    """
+
+    def __init__(self, app: ASGIApp, logger_name: str = "feature-flag-service"):
+        self.app = app
+        self.logger = logging.getLogger(logger_name)
+        self.error_bucket = TokenBucket(
+            settings.log_error_rate_per_sec, settings.log_error_burst
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if self.error_bucket.allow():
+                ctx = self._context(scope, start_time)
+                self.logger.exception("Unhandled exception during request", extra=ctx)
+            raise
+
+        if status >= 400:
+            if self.error_bucket.allow():
+                ctx = self._context(scope, start_time)
+                ctx["status"] = status
+                self.logger.info("Request completed with error", extra=ctx)
+            return
+
+        rate = success_sample_rate(route_path(scope))
+        if rate > 0 and random.random() < rate:
+            ctx = self._context(scope, start_time)
+            ctx["status"] = status
+            self.logger.info("Request completed", extra=ctx)
+
+    def _context(self, scope: Scope, start_time: float) -> Dict[str, Any]:
+        ctx = get_scope_context(scope, (time.perf_counter() - start_time) * 1000)
+        suppressed = self.error_bucket.take_suppressed()
+        if suppressed:
+            ctx["suppressed"] = suppressed
+        return ctx
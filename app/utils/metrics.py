@@ -1,31 +1,98 @@
-from prometheus_client import Counter
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+import time
 
-# Prometheus HTTP request counter with tenant/request context
+from prometheus_client import Counter, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+# Prometheus HTTP request counter. Labels are bounded: `path` is the route
+# template (e.g. /v1/flags/{flag_key}), `tenant` is capped by
+# FirstSeenTenantLabels.
 REQUEST_COUNT = Counter(
     "http_requests_total",
     "Total HTTP requests",
-    ["path", "method", "status", "tenant", "request_id"],
+    ["path", "method", "status", "tenant"],
 )
 
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["path", "method"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+UNMATCHED_PATH = "<unmatched>"
+OTHER_TENANT = "other"
+UNKNOWN_TENANT = "unknown"
+
+
+class FirstSeenTenantLabels:
+    """
+    Caps the number of distinct tenant label values.
+    The first `limit` tenants seen since the process started keep their own
+    series for its lifetime; later ones share "other". This is first-K, not
+    top-K: a busy tenant that first shows up after the cap is reached is only
+    visible per tenant after a restart. Only tenants that passed
+    require_tenant are offered, so unknown X-Tenant-ID values cannot use up
+    the slots.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.admitted: set[str] = set()
+
+    def label(self, tenant: str) -> str:
+        if tenant in self.admitted:
+            return tenant
+        if len(self.admitted) < self.limit:
+            self.admitted.add(tenant)
+            return tenant
+        return OTHER_TENANT
+
+
+tenant_labels = FirstSeenTenantLabels(settings.metrics_tenant_label_limit)
+
+
+def route_path(scope: Scope) -> str:
+    """Route template for the request, set on the scope by the router."""
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_PATH)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware counting requests and timing them per route template."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
 
-class MetricsMiddleware(BaseHTTPMiddleware):
-    """Middleware to track HTTP requests and attach tenant/request_id labels."""
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
 
-    async def dispatch(self, request: Request, call_next):
-        tenant = request.headers.get("X-Tenant-ID", "unknown")
-        request_id = request.headers.get("X-Request-ID", "none")
-        response = None
         try:
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, send_wrapper)
         finally:
-            status = getattr(response, "status_code", 500)
+            # Set by require_tenant once the tenant is recognized; the raw
+            # header is never used as a label
+            tenant = scope.get("state", {}).get("tenant")
+            path = route_path(scope)
+            method = scope["method"]
+            REQUEST_LATENCY.labels(path=path, method=method).observe(
+                time.perf_counter() - start
+            )
             REQUEST_COUNT.labels(
-                path=request.url.path,
-                method=request.method,
+                path=path,
+                method=method,
                 status=status,
-                tenant=tenant,
-                request_id=request_id,
+                tenant=tenant_labels.label(tenant) if tenant else UNKNOWN_TENANT,
             ).inc()
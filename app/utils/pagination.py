@@ -0,0 +1,88 @@
+# app/utils/pagination.py
+import base64
+import hashlib
+from typing import Iterable, List, Optional
+
+from fastapi import HTTPException, Request, Response, status
+
+# ---------- Keyset cursors ----------
+# List endpoints page by the entity key, which is unique per tenant and backed
+# by the (tenant_id, key) unique index. The cursor is the last key returned,
+# base64url-encoded so clients treat it as opaque.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_key: str) -> str:
+    return base64.urlsafe_b64encode(last_key.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.urlsafe_b64decode(padded.encode()).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def parse_fields(
+    fields: Optional[str], allowed: Iterable[str], default: Iterable[str]
+) -> List[str]:
+    """
+    Parse a comma-separated projection. `key` is always included so rows
+    stay addressable; unknown names are rejected with 400.
+    """
+    if not fields:
+        return list(default)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}",
+        )
+    return ["key"] + [f for f in requested if f != "key"]
+
+
+# ---------- ETags ----------
+def make_etag(*parts: object) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+# ---------- Row versions ----------
+# Single-entity responses use the row version as a strong ETag ("3").
+
+
+def version_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def check_if_match(request: Request, version: int) -> None:
+    """
+    Raise 412 when an If-Match header does not name the current version.
+    If-Match uses strong comparison (RFC 9110 13.1.1): weak tags never match.
+    """
+    header = request.headers.get("If-Match")
+    if not header:
+        return
+    candidates = [c.strip() for c in header.split(",")]
+    if "*" not in candidates and version_etag(version) not in candidates:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"Version mismatch; current version is {version}",
+        )
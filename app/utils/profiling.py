@@ -0,0 +1,193 @@
+# app/utils/profiling.py
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter as Tally
+from typing import Any, Dict, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# ---------- On-demand profiling ----------
+# An admin starts a session on whichever worker serves the request; it stops
+# after N matching requests or a time window, and the result stays available
+# for download until the next session. While idle, the middleware costs a
+# single attribute check per request.
+
+MODES = ("cprofile", "sampling")
+
+
+class SamplingProfiler:
+    """
+    Samples the event loop thread's stack every `interval` seconds from a
+    background thread and tallies collapsed stacks ("root;...;leaf").
+    Unlike cProfile it adds no per-call overhead to the profiled code.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Tally[str] = Tally()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            self.stacks[";".join(reversed(parts))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> bytes:
+        """Brendan Gregg's folded format (flamegraph.pl, speedscope)."""
+        lines = (f"{stack} {n}" for stack, n in self.stacks.most_common())
+        return ("\n".join(lines) + "\n").encode()
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.active = False
+        self.mode: Optional[str] = None
+        self.path_prefix: Optional[str] = None
+        self.max_requests: Optional[int] = None
+        self.seen = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[SamplingProfiler] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._result: Optional[Any] = None
+
+    def start(
+        self,
+        mode: str,
+        requests: Optional[int],
+        seconds: Optional[float],
+        path_prefix: Optional[str] = None,
+        interval: float = 0.005,
+    ) -> None:
+        if self.active:
+            raise RuntimeError("A profiling session is already running")
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+
+        self.mode = mode
+        self.path_prefix = path_prefix
+        self.max_requests = requests
+        self.seen = 0
+        self.started_at = time.time()
+        self.stopped_at = None
+        self._result = None
+
+        if mode == "cprofile":
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        else:
+            self._sampler = SamplingProfiler(threading.get_ident(), interval)
+            self._sampler.start()
+        if seconds is not None:
+            self._timer = asyncio.get_running_loop().call_later(seconds, self.stop)
+        self.active = True
+
+    def stop(self) -> None:
+        if not self.active:
+            return
+        self.active = False
+        self.stopped_at = time.time()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.create_stats()
+            self._result = self._cprofile
+            self._cprofile = None
+        if self._sampler is not None:
+            self._sampler.stop()
+            self._result = self._sampler
+            self._sampler = None
+
+    def request_done(self, path: str) -> None:
+        if self.path_prefix and not path.startswith(self.path_prefix):
+            return
+        self.seen += 1
+        if self.max_requests is not None and self.seen >= self.max_requests:
+            self.stop()
+
+    def status(self) -> Dict[str, Any]:
+        if self.active:
+            state = "running"
+        elif self._result is not None:
+            state = "done"
+        else:
+            state = "idle"
+        return {
+            "state": state,
+            "pid": os.getpid(),
+            "mode": self.mode,
+            "path_prefix": self.path_prefix,
+            "max_requests": self.max_requests,
+            "requests_seen": self.seen,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+        }
+
+    def result(self, fmt: str) -> Optional[bytes]:
+        """Finished profile as `pstats` (marshal), `text` or `collapsed` stacks."""
+        result = self._result
+        if result is None:
+            return None
+        if isinstance(result, SamplingProfiler):
+            if fmt != "collapsed":
+                raise ValueError("Sampling profiles are only available as 'collapsed'")
+            return result.collapsed()
+        if fmt == "pstats":
+            return marshal.dumps(result.stats)  # same as Stats.dump_stats()
+        if fmt == "text":
+            out = io.StringIO()
+            stats = pstats.Stats(result, stream=out)
+            stats.sort_stats("cumulative").print_stats(60)
+            return out.getvalue().encode()
+        raise ValueError("cProfile results are available as 'pstats' or 'text'")
+
+
+profiler = Profiler()
+
+
+class ProfilingMiddleware:
+    """Counts requests toward an active profiling session (no-op when idle)."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not profiler.active or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.request_done(scope["path"])
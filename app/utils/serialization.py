@@ -0,0 +1,72 @@
+# app/utils/serialization.py
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+import orjson
+from fastapi.responses import Response
+
+from app.models import Flag, Segment
+
+# ---------- Explicit model serializers ----------
+# Each serializer reads mapped columns directly and returns JSON-safe
+# primitives, so the result can go straight into orjson or a JSON column
+# (audit before/after) without reflective encoding.
+
+
+def _ts(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def flag_to_dict(flag: Flag) -> Dict[str, Any]:
+    return {
+        "id": flag.id,
+        "tenant_id": flag.tenant_id,
+        "key": flag.key,
+        "description": flag.description,
+        "state": flag.state,
+        "variants": flag.variants,
+        "rules": flag.rules,
+        "version": flag.version,
+        "deleted_at": _ts(flag.deleted_at),
+        "created_at": _ts(flag.created_at),
+        "updated_at": _ts(flag.updated_at),
+    }
+
+
+def segment_to_dict(segment: Segment) -> Dict[str, Any]:
+    return {
+        "id": segment.id,
+        "tenant_id": segment.tenant_id,
+        "key": segment.key,
+        "criteria": segment.criteria,
+        "version": segment.version,
+        "created_at": _ts(segment.created_at),
+        "updated_at": _ts(segment.updated_at),
+    }
+
+
+MODEL_SERIALIZERS: Dict[type, Callable[[Any], Dict[str, Any]]] = {
+    Flag: flag_to_dict,
+    Segment: segment_to_dict,
+}
+
+
+def dumps(content: Any) -> bytes:
+    """Encode to compact JSON bytes (datetimes as ISO-8601, like jsonable_encoder)."""
+    return orjson.dumps(content)
+
+
+# ---------- Response class ----------
+class FastJSONResponse(Response):
+    """
+    JSON response rendered with orjson.
+    Pre-encoded `bytes` content is written as-is, which lets callers cache
+    serialized bodies and skip encoding entirely on a hit.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -0,0 +1,152 @@
+"""
+Benchmark POST /v1/evaluate through the full ASGI stack, with and without
+the evaluate fast path, for a cached flag.
+
+Requests are driven straight into the ASGI app (no sockets, no HTTP client)
+so the numbers isolate framework + handler overhead. --handler-only drops the
+outer metrics/logging middleware to compare the two handlers on their own.
+
+    PYTHONPATH=. python -m scripts.bench_evaluate --requests 20000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+# Point the app at a throwaway database before it is imported
+os.environ.setdefault("DB_DSN", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db")
+
+import orjson  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.deps import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Base, Flag  # noqa: E402
+from app.routers.evaluate import EvaluateFastPath  # noqa: E402
+
+FLAG_KEY = "new_checkout"
+
+
+async def seed(tenant: str) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as db:
+        db.add(
+            Flag(
+                tenant_id=tenant,
+                key=FLAG_KEY,
+                state="on",
+                variants=[
+                    {"key": "control", "weight": 50},
+                    {"key": "treatment", "weight": 50},
+                ],
+                rules=[
+                    {
+                        "id": "r1",
+                        "when": {"attr": {"role": "employee"}},
+                        "rollout": {"variant": "treatment"},
+                    },
+                    {
+                        "id": "r2",
+                        "when": {"attr": {"country": "CA"}},
+                        "rollout": {"percentage": 50},
+                        "variants": [{"key": "treatment", "weight": 100}],
+                    },
+                ],
+            )
+        )
+        await db.commit()
+
+
+async def call(tenant: str, user_id: str, target=app) -> tuple[int, bytes]:
+    body = orjson.dumps(
+        {"flag_key": FLAG_KEY, "user": {"id": user_id, "country": "CA"}}
+    )
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/v1/evaluate",
+        "raw_path": b"/v1/evaluate",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"bench"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"x-tenant-id", tenant.encode()),
+        ],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+    received = False
+    status = 0
+    chunks = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await target(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+async def run(tenant: str, n: int, fast: bool, target) -> tuple[float, list[bytes]]:
+    settings.evaluate_fast_path = fast
+    bodies = []
+    start = time.perf_counter()
+    for i in range(n):
+        status, body = await call(tenant, f"user-{i}", target)
+        if status != 200:
+            raise SystemExit(f"unexpected status {status}: {body!r}")
+        if i < 100:
+            bodies.append(body)
+    return time.perf_counter() - start, bodies
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument(
+        "--handler-only",
+        action="store_true",
+        help="Skip the outer middleware stack (router + fast path only)",
+    )
+    args = parser.parse_args()
+
+    tenant = f"bench-{uuid.uuid4().hex[:8]}"
+    await seed(tenant)
+    await call(tenant, "warmup")  # populates tenant + flag caches
+
+    target = EvaluateFastPath(app.router) if args.handler_only else app
+    regular_s, regular_bodies = await run(tenant, args.requests, False, target)
+    fast_s, fast_bodies = await run(tenant, args.requests, True, target)
+
+    if regular_bodies != fast_bodies:
+        raise SystemExit("fast path responses differ from the regular route")
+
+    for label, seconds in (("regular", regular_s), ("fast path", fast_s)):
+        print(
+            f"{label:>10}: {args.requests / seconds:10.0f} req/s "
+            f"{seconds / args.requests * 1e6:8.1f} us/req"
+        )
+    print(f"   speedup: {regular_s / fast_s:.1f}x (responses identical)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,243 @@
+"""
+Microbenchmarks for the evaluation hot path: stable_bucket,
+normalize_weights, evaluate_flag across realistic flag shapes, and TTLCache.
+
+Each case reports ns/op (best of --repeat timing runs), the peak bytes
+allocated during a single call and the blocks still held after many calls
+(non-zero means the call grows memory). Pure CPU, no database or network.
+
+    PYTHONPATH=. python -m scripts.bench_micro --out bench.json
+    PYTHONPATH=. python -m scripts.bench_micro --compare bench.json --threshold 0.1
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.cache import TTLCache
+from app.services.flag_eval import evaluate_flag, normalize_weights, stable_bucket
+
+TENANT = "bench-tenant"
+USER = {"id": "user-12345", "country": "CA", "plan": "pro", "role": "member"}
+
+
+# ---------- Flag shapes ----------
+def _variants(n: int) -> List[Dict[str, Any]]:
+    return [{"key": f"v{i}", "weight": 100 / n} for i in range(n)]
+
+
+def _attr_rules(n: int) -> List[Dict[str, Any]]:
+    # None of these match USER, so evaluation walks every rule
+    return [
+        {
+            "id": f"r{i}",
+            "when": {"attr": {"country": f"X{i}", "plan": "pro"}},
+            "rollout": {"variant": "v0"},
+        }
+        for i in range(n)
+    ]
+
+
+def _flag(rules: List[Dict[str, Any]], variants: int = 2, state: str = "on"):
+    return {
+        "key": "bench_flag",
+        "state": state,
+        "variants": _variants(variants),
+        "rules": rules,
+    }
+
+
+SEGMENTS = [
+    {"id": f"seg{i}", "rules": [{"attributes": {"country": f"C{i}"}}]}
+    for i in range(20)
+] + [{"id": "seg-ca", "rules": [{"attributes": {"country": "CA"}}]}]
+
+SEGMENT_RULES = _attr_rules(5) + [
+    {
+        "id": "seg-rule",
+        "when": {"segment": ["seg-ca"]},
+        "rollout": {"distribution": _variants(4)},
+    }
+]
+
+FLAGS = {
+    "off": _flag([], state="off"),
+    "rules_0": _flag([]),
+    "rules_10": _flag(_attr_rules(10)),
+    "rules_50": _flag(_attr_rules(50)),
+    "percentage_rollout": _flag(
+        [
+            {
+                "id": "pct",
+                "when": {},
+                "rollout": {"percentage": 100, "distribution": _variants(2)},
+            }
+        ]
+    ),
+    "segment_rules": _flag(SEGMENT_RULES),
+    "distribution_200": _flag([], variants=200),
+}
+
+
+def _cache_cases() -> Dict[str, Callable[[], Any]]:
+    cache = TTLCache(ttl_seconds=3600)
+    for i in range(10_000):
+        cache.set(f"flag:{TENANT}:k{i}", {"key": f"k{i}"})
+    value = {"key": "x"}
+    return {
+        "ttlcache_get_hit": lambda: cache.get(f"flag:{TENANT}:k5000"),
+        "ttlcache_get_miss": lambda: cache.get(f"flag:{TENANT}:missing"),
+        "ttlcache_set": lambda: cache.set(f"flag:{TENANT}:k5000", value),
+    }
+
+
+def build_cases() -> Dict[str, Callable[[], Any]]:
+    cases: Dict[str, Callable[[], Any]] = {
+        "stable_bucket": lambda: stable_bucket(TENANT, "bench_flag", "user-12345"),
+        "normalize_weights_2": lambda v=_variants(2): normalize_weights(v),
+        "normalize_weights_200": lambda v=_variants(200): normalize_weights(v),
+    }
+    for name, flag in FLAGS.items():
+        segments = SEGMENTS if name == "segment_rules" else None
+        cases[f"evaluate_{name}"] = lambda f=flag, s=segments: evaluate_flag(
+            f, TENANT, USER, s
+        )
+    cases.update(_cache_cases())
+    return cases
+
+
+# ---------- Measurement ----------
+def measure(fn: Callable[[], Any], repeat: int, alloc_calls: int) -> Dict[str, float]:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    runs = [t / number * 1e9 for t in timer.repeat(repeat=repeat, number=number)]
+    best = min(runs)
+
+    fn()  # warm any lazy state before tracing
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    snap_before = tracemalloc.take_snapshot()
+    for _ in range(alloc_calls):
+        fn()
+    snap_after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    # Ignore tracemalloc's own bookkeeping and this script's loop frames
+    ignore = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ]
+    diff = snap_after.filter_traces(ignore).compare_to(
+        snap_before.filter_traces(ignore), "lineno"
+    )
+    retained = sum(max(stat.count_diff, 0) for stat in diff)
+
+    return {
+        "ns_per_op": round(best, 1),
+        "spread_pct": round((max(runs) - best) / best * 100, 1),
+        "peak_bytes": max(peak - before, 0),
+        "retained_blocks_per_1k": round(retained / alloc_calls * 1000, 1),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def compare(
+    current: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+) -> List[str]:
+    """Print a side-by-side table; return the names that regressed."""
+    regressions = []
+    print(f"\n{'case':<32}{'base ns':>12}{'now ns':>12}{'change':>10}")
+    for name, result in current.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<32}{'-':>12}{result['ns_per_op']:>12.1f}{'new':>10}")
+            continue
+        change = result["ns_per_op"] / base["ns_per_op"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(
+            f"{name:<32}{base['ns_per_op']:>12.1f}{result['ns_per_op']:>12.1f}"
+            f"{change:>+10.1%}{flag}"
+        )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Fail when ns/op grows by more than this fraction (default 0.10)",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--alloc-calls", type=int, default=1000)
+    parser.add_argument("--filter", default="", help="Only run cases containing this")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'case':<32}{'ns/op':>12}{'spread':>9}{'peak B':>10}{'held/1k':>9}")
+    for name, fn in build_cases().items():
+        if args.filter not in name:
+            continue
+        r = results[name] = measure(fn, args.repeat, args.alloc_calls)
+        print(
+            f"{name:<32}{r['ns_per_op']:>12.1f}{r['spread_pct']:>8.1f}%"
+            f"{r['peak_bytes']:>10}{r['retained_blocks_per_1k']:>9.1f}"
+        )
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\nwrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(
+                f"\n{len(regressions)} case(s) slower than baseline by more than "
+                f"{args.threshold:.0%}: {', '.join(regressions)}"
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
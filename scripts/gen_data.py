@@ -0,0 +1,309 @@
+"""
+Synthetic data generator for scale testing: tenants, flags, segments and
+audit history, bulk-inserted with batched executemany.
+
+Output is a pure function of the arguments: each tenant draws from its own
+RNG seeded with (--seed, tenant index), and timestamps are offsets from a
+fixed epoch, so the same command produces the same rows on SQLite or
+Postgres regardless of batch size.
+
+Shapes
+- Flags per tenant follow a Zipf-like skew (--skew): a few large tenants and
+  a long tail, every tenant with at least one flag.
+- 2-20 variants (mostly 2), 0-50 rules (mean ~2.5) mixing attribute,
+  segment and percentage-rollout rules; ~15% off, ~2% soft-deleted.
+- Segments with attribute criteria, referenced by segment rules.
+- Audit: a create entry per flag and segment, plus updates/deletes
+  (--audit-per-flag on average); flag versions match their update count.
+
+Tenants are named <prefix>-000000, ... so generated data never collides with
+hand-made tenants; --reset deletes rows for that prefix first.
+
+    PYTHONPATH=. python -m scripts.gen_data --tenants 10000 --flags 1000000
+    DB_DSN=postgresql+asyncpg://... python -m scripts.gen_data --tenants 100
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Tuple
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.deps import engine as app_engine
+from app.models import Audit, Base, Flag, Segment
+
+EPOCH = datetime(2025, 1, 1)
+HISTORY_DAYS = 365
+
+COUNTRIES = ["US", "CA", "GB", "DE", "FR", "IN", "BR", "JP", "AU", "MX"]
+PLANS = ["free", "pro", "team", "enterprise"]
+ROLES = ["member", "admin", "employee", "beta"]
+PLATFORMS = ["ios", "android", "web"]
+ATTRIBUTES = {
+    "country": COUNTRIES,
+    "plan": PLANS,
+    "role": ROLES,
+    "platform": PLATFORMS,
+}
+
+Rows = Dict[str, List[Dict[str, Any]]]
+
+
+@dataclass(frozen=True)
+class Spec:
+    tenants: int = 100
+    flags: int = 2_000  # total across all tenants
+    segments_per_tenant: int = 5
+    audit_per_flag: float = 2.0
+    skew: float = 0.8
+    seed: int = 1
+    prefix: str = "gen"
+
+    def tenant_id(self, index: int) -> str:
+        return f"{self.prefix}-{index:06d}"
+
+
+def flag_key(index: int) -> str:
+    return f"flag_{index:06d}"
+
+
+def flag_counts(spec: Spec) -> List[int]:
+    """Flags per tenant: Zipf-like weights, floor of one, summing to spec.flags."""
+    if spec.tenants <= 0:
+        return []
+    total = max(spec.flags, spec.tenants)
+    weights = [1 / (i + 1) ** spec.skew for i in range(spec.tenants)]
+    scale = (total - spec.tenants) / sum(weights)
+    counts = [1 + int(w * scale) for w in weights]
+    # Hand out the rounding remainder from the largest tenant down
+    for i in range(total - sum(counts)):
+        counts[i % spec.tenants] += 1
+    return counts
+
+
+# ---------- Shapes ----------
+def _ts(rng: random.Random, after: datetime = EPOCH) -> datetime:
+    remaining = (EPOCH + timedelta(days=HISTORY_DAYS) - after).total_seconds()
+    return after + timedelta(seconds=int(rng.random() * max(remaining, 1)))
+
+
+def _variants(rng: random.Random) -> List[Dict[str, Any]]:
+    n = rng.choices((2, 3, 4, rng.randint(5, 20)), weights=(70, 15, 10, 5))[0]
+    keys = ["control", "treatment"] + [f"treatment_{i}" for i in range(2, n)]
+    raw = [rng.randint(1, 10) for _ in keys]
+    total = sum(raw)
+    weights = [round(100 * r / total, 2) for r in raw]
+    weights[-1] = round(100 - sum(weights[:-1]), 2)
+    return [{"key": k, "weight": w} for k, w in zip(keys, weights)]
+
+
+def _rule(
+    rng: random.Random,
+    index: int,
+    variants: List[Dict[str, Any]],
+    segment_keys: List[str],
+) -> Dict[str, Any]:
+    roll = rng.random()
+    rule: Dict[str, Any] = {"id": f"r{index + 1}", "order": index + 1}
+    if roll < 0.45:
+        attrs = rng.sample(sorted(ATTRIBUTES), k=rng.choice((1, 1, 2)))
+        rule["when"] = {"attr": {a: rng.choice(ATTRIBUTES[a]) for a in attrs}}
+        rule["rollout"] = {"variant": rng.choice(variants)["key"]}
+    elif roll < 0.7 and segment_keys:
+        picked = rng.sample(segment_keys, k=min(len(segment_keys), rng.randint(1, 2)))
+        rule["when"] = {"segment": picked}
+        rule["rollout"] = {"variant": rng.choice(variants)["key"]}
+    else:
+        rule["when"] = {}
+        rule["rollout"] = {
+            "percentage": rng.choice((1, 5, 10, 25, 50, 100)),
+            "distribution": variants,
+        }
+    return rule
+
+
+def tenant_rows(spec: Spec, index: int, n_flags: int) -> Rows:
+    """All rows for one tenant; depends only on (spec.seed, index, n_flags)."""
+    rng = random.Random(f"{spec.seed}:{index}")
+    tenant = spec.tenant_id(index)
+    rows: Rows = {"flags": [], "segments": [], "audit": []}
+
+    def audit(entity: str, key: str, action: str, ts: datetime, before, after):
+        rows["audit"].append(
+            {
+                "tenant_id": tenant,
+                "actor": rng.choice(("gen-admin", "gen-ci", "gen-oncall")),
+                "entity": entity,
+                "entity_key": key,
+                "action": action,
+                "before": before,
+                "after": after,
+                "ts": ts,
+            }
+        )
+
+    n_segments = max(1, min(spec.segments_per_tenant, n_flags))
+    segment_keys = [f"seg_{i:04d}" for i in range(n_segments)]
+    for key in segment_keys:
+        attr = rng.choice(sorted(ATTRIBUTES))
+        criteria = {"attr": {attr: rng.choice(ATTRIBUTES[attr])}}
+        created = _ts(rng)
+        rows["segments"].append(
+            {
+                "tenant_id": tenant,
+                "key": key,
+                "criteria": criteria,
+                "version": 1,
+                "created_at": created,
+                "updated_at": created,
+            }
+        )
+        audit("segment", key, "create", created, None, {"criteria": criteria})
+
+    extra_audit = max(spec.audit_per_flag - 1, 0)
+    for j in range(n_flags):
+        key = flag_key(j)
+        variants = _variants(rng)
+        n_rules = min(50, int(rng.expovariate(1 / 2.5)))
+        rules = [_rule(rng, r, variants, segment_keys) for r in range(n_rules)]
+        state = "off" if rng.random() < 0.15 else "on"
+        created = _ts(rng)
+        audit("flag", key, "create", created, None, {"state": "off"})
+
+        updates = int(rng.expovariate(1 / extra_audit)) if extra_audit else 0
+        updated, prev = created, "off"
+        for _ in range(updates):
+            updated = _ts(rng, after=updated)
+            audit("flag", key, "update", updated, {"state": prev}, {"state": state})
+            prev = state
+        deleted_at = None
+        if rng.random() < 0.02:
+            deleted_at = _ts(rng, after=updated)
+            audit("flag", key, "delete", deleted_at, {"state": state}, None)
+
+        rows["flags"].append(
+            {
+                "tenant_id": tenant,
+                "key": key,
+                "description": f"Synthetic flag {j} for {tenant}",
+                "state": state,
+                "variants": variants,
+                "rules": rules,
+                "version": 1 + updates,
+                "deleted_at": deleted_at,
+                "created_at": created,
+                "updated_at": updated,
+            }
+        )
+    return rows
+
+
+def iter_tenants(spec: Spec) -> Iterator[Tuple[str, Rows]]:
+    for index, n_flags in enumerate(flag_counts(spec)):
+        yield spec.tenant_id(index), tenant_rows(spec, index, n_flags)
+
+
+def live_catalog(spec: Spec) -> Dict[str, List[str]]:
+    """Tenant -> keys of flags that are not soft-deleted (no DB access needed)."""
+    return {
+        tenant: [f["key"] for f in rows["flags"] if f["deleted_at"] is None]
+        for tenant, rows in iter_tenants(spec)
+    }
+
+
+# ---------- Loading ----------
+TABLES = {"segments": Segment, "flags": Flag, "audit": Audit}
+
+
+async def reset(engine: AsyncEngine, prefix: str) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for model in TABLES.values():
+            await conn.execute(delete(model).where(model.tenant_id.like(f"{prefix}-%")))
+
+
+async def generate(
+    engine: AsyncEngine, spec: Spec, batch_size: int = 5_000, verbose: bool = True
+) -> Dict[str, int]:
+    """Insert everything described by `spec`; returns row counts per table."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    buffers: Rows = {name: [] for name in TABLES}
+    totals = {name: 0 for name in TABLES}
+    start = time.perf_counter()
+
+    async def flush(name: str) -> None:
+        rows = buffers[name]
+        if not rows:
+            return
+        async with engine.begin() as conn:
+            await conn.execute(insert(TABLES[name]), rows)
+        totals[name] += len(rows)
+        buffers[name] = []
+
+    for i, (_tenant, rows) in enumerate(iter_tenants(spec), start=1):
+        for name, table_rows in rows.items():
+            buffers[name].extend(table_rows)
+            if len(buffers[name]) >= batch_size:
+                await flush(name)
+        if verbose and i % 1000 == 0:
+            elapsed = time.perf_counter() - start
+            print(
+                f"{i}/{spec.tenants} tenants, {totals['flags']} flags "
+                f"({sum(totals.values()) / elapsed:.0f} rows/s)"
+            )
+    for name in TABLES:
+        await flush(name)
+    return totals
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("\n\n", 1)[1],
+    )
+    parser.add_argument("--tenants", type=int, default=Spec.tenants)
+    parser.add_argument("--flags", type=int, default=Spec.flags, help="Total flags")
+    parser.add_argument(
+        "--segments-per-tenant", type=int, default=Spec.segments_per_tenant
+    )
+    parser.add_argument("--audit-per-flag", type=float, default=Spec.audit_per_flag)
+    parser.add_argument("--skew", type=float, default=Spec.skew)
+    parser.add_argument("--seed", type=int, default=Spec.seed)
+    parser.add_argument("--prefix", default=Spec.prefix)
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    parser.add_argument(
+        "--reset", action="store_true", help="Delete existing rows for --prefix first"
+    )
+    args = parser.parse_args()
+
+    spec = Spec(
+        tenants=args.tenants,
+        flags=args.flags,
+        segments_per_tenant=args.segments_per_tenant,
+        audit_per_flag=args.audit_per_flag,
+        skew=args.skew,
+        seed=args.seed,
+        prefix=args.prefix,
+    )
+    if args.reset:
+        await reset(app_engine, spec.prefix)
+    start = time.perf_counter()
+    totals = await generate(app_engine, spec, args.batch_size)
+    elapsed = time.perf_counter() - start
+    print(
+        ", ".join(f"{n} {name}" for name, n in totals.items())
+        + f" in {elapsed:.1f}s ({sum(totals.values()) / elapsed:.0f} rows/s)"
+    )
+    await app_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
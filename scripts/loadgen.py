@@ -0,0 +1,351 @@
+"""
+Load generator: replays captured traffic against the service and reports
+throughput, p50/p95/p99 latency and error rates per route.
+
+By default requests are driven in-process through httpx's ASGI transport
+(app startup/shutdown hooks included); --url targets a running server instead,
+e.g. one started with `make run`.
+
+Traffic sources (repeatable, mixed round-robin):
+  --http FILE   a .http file such as requests.http (blocks separated by ###)
+  --capture F   JSONL, one request per line:
+                {"method": "POST", "path": "/v1/evaluate",
+                 "headers": {...}, "json": {...}}
+With neither, a synthetic evaluate-heavy mix over the seeded tenants is used.
+
+Data comes from scripts.gen_data (tenants load-000000, ...), so --tenants,
+--flags and --seed reproduce the same dataset. Templates may use {{tenant}},
+{{flag_key}}, {{user_id}} and {{access_token}}; they are filled per request
+from that data with a fixed RNG seed. Any Authorization header is replaced
+with a freshly issued token.
+
+    PYTHONPATH=. python -m scripts.loadgen --tenants 100 --flags 10000 \\
+        --requests 20000 --concurrency 32
+    PYTHONPATH=. python -m scripts.loadgen --http requests.http --rate 500 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# In-process runs get a throwaway database unless DB_DSN is set
+os.environ.setdefault("DB_DSN", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/loadgen.db")
+
+import httpx  # noqa: E402
+from starlette.routing import Match  # noqa: E402
+
+from app.deps import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from scripts.gen_data import Spec, generate, live_catalog, reset  # noqa: E402
+from scripts.seed import seed as seed_acme  # noqa: E402
+
+SCOPES = ["flags:rw", "segments:rw", "segments:ro"]
+_VAR = re.compile(r"{{\s*(\w+)\s*}}")
+
+
+# ---------- Request templates ----------
+@dataclass
+class Template:
+    method: str
+    path: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: Optional[str] = None
+
+
+def parse_http_file(path: str) -> List[Template]:
+    """Parse the REST-client format used by requests.http."""
+    with open(path) as fh:
+        blocks = re.split(r"^###.*$", fh.read(), flags=re.MULTILINE)
+    templates = []
+    for block in blocks:
+        lines = [
+            ln for ln in block.strip().splitlines() if not ln.lstrip().startswith("//")
+        ]
+        if not lines:
+            continue
+        method, _, url = lines[0].strip().partition(" ")
+        parts = urlsplit(url.strip().split(" ")[0])
+        target = re.sub("/+", "/", parts.path) + (
+            f"?{parts.query}" if parts.query else ""
+        )
+        headers: Dict[str, str] = {}
+        i = 1
+        while i < len(lines) and lines[i].strip():
+            name, _, value = lines[i].partition(":")
+            headers[name.strip()] = value.strip()
+            i += 1
+        body = "\n".join(lines[i + 1 :]).strip() or None
+        templates.append(Template(method.upper(), target, headers, body))
+    return templates
+
+
+def parse_capture(path: str) -> List[Template]:
+    templates = []
+    with open(path) as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            body = rec.get("body")
+            if "json" in rec:
+                body = json.dumps(rec["json"])
+            templates.append(
+                Template(
+                    rec["method"].upper(), rec["path"], rec.get("headers", {}), body
+                )
+            )
+    return templates
+
+
+def synthetic_templates() -> List[Template]:
+    tenant = {"X-Tenant-ID": "{{tenant}}"}
+    json_ct = {**tenant, "Content-Type": "application/json"}
+    authed = {**tenant, "Authorization": "Bearer {{access_token}}"}
+    evaluate = Template(
+        "POST",
+        "/v1/evaluate",
+        json_ct,
+        '{"flag_key": "{{flag_key}}", "user": {"id": "{{user_id}}", "country": "CA"}}',
+    )
+    # ~80% evaluations, the rest admin reads
+    return [evaluate] * 8 + [
+        Template("GET", "/v1/flags/{{flag_key}}", authed),
+        Template("GET", "/v1/flags?limit=50", authed),
+    ]
+
+
+# ---------- Seeding ----------
+async def seed(spec: Spec, no_seed: bool) -> Dict[str, List[str]]:
+    """Generate `spec` (plus the 'acme' sample data); return live flag keys."""
+    if not no_seed:
+        await reset(engine, spec.prefix)
+        await generate(engine, spec, verbose=False)
+        await seed_acme()
+    catalog = live_catalog(spec)
+    catalog["acme"] = ["new_checkout"]
+    return catalog
+
+
+# ---------- Running ----------
+class Filler:
+    def __init__(self, catalog: Dict[str, List[str]], token: str, seed: int):
+        self.tenants = sorted(catalog)
+        self.catalog = catalog
+        self.token = token
+        self.rng = random.Random(seed)
+
+    def fill(self, t: Template) -> Tuple[str, str, Dict[str, str], Optional[bytes]]:
+        tenant = self.rng.choice(self.tenants)
+        values = {
+            "tenant": tenant,
+            "flag_key": self.rng.choice(self.catalog[tenant]),
+            "user_id": f"user-{self.rng.randrange(1_000_000)}",
+            "access_token": self.token,
+        }
+
+        def sub(text: str) -> str:
+            return _VAR.sub(lambda m: values.get(m.group(1), m.group(0)), text)
+
+        headers = {k: sub(v) for k, v in t.headers.items()}
+        for name in headers:
+            if name.lower() == "authorization":
+                headers[name] = f"Bearer {self.token}"
+        body = sub(t.body).encode() if t.body is not None else None
+        return t.method, sub(t.path), headers, body
+
+
+def route_label(method: str, path: str) -> str:
+    """Group by route template (/v1/flags/{flag_key}) rather than raw path."""
+    scope = {"type": "http", "method": method, "path": path.split("?", 1)[0]}
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return f"{method} {getattr(route, 'path', path)}"
+    return f"{method} <unmatched>"
+
+
+@dataclass
+class RouteStats:
+    latencies: List[float] = field(default_factory=list)
+    client_errors: int = 0
+    server_errors: int = 0
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    templates: List[Template],
+    filler: Filler,
+    concurrency: int,
+    total: Optional[int],
+    duration: Optional[float],
+    rate: Optional[float],
+) -> Tuple[Dict[str, RouteStats], float]:
+    """
+    With --rate, requests are scheduled open-loop at fixed intervals and
+    latency is measured from the scheduled send time, so a stalled server
+    shows up as queueing delay instead of silently lowering the load.
+    """
+    stats: Dict[str, RouteStats] = {}
+    counter = 0
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+
+    async def worker() -> None:
+        nonlocal counter
+        while True:
+            i = counter
+            if total is not None and i >= total:
+                return
+            counter += 1
+            scheduled = start + i / rate if rate else None
+            if scheduled is not None:
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                return
+            method, path, headers, body = filler.fill(templates[i % len(templates)])
+            label = route_label(method, path)
+            s = stats.setdefault(label, RouteStats())
+            t0 = scheduled if scheduled is not None else now
+            try:
+                r = await client.request(method, path, headers=headers, content=body)
+                status = r.status_code
+            except httpx.HTTPError:
+                status = 599
+            s.latencies.append(time.perf_counter() - t0)
+            if status >= 500:
+                s.server_errors += 1
+            elif status >= 400:
+                s.client_errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return stats, time.perf_counter() - start
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def report(stats: Dict[str, RouteStats], elapsed: float) -> Dict[str, Any]:
+    rows = {}
+    print(
+        f"{'route':<40}{'count':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'p99 ms':>9}{'4xx%':>7}{'5xx%':>7}"
+    )
+    everything = RouteStats()
+    for label in sorted(stats) + ["TOTAL"]:
+        s = everything if label == "TOTAL" else stats[label]
+        if label != "TOTAL":
+            everything.latencies += s.latencies
+            everything.client_errors += s.client_errors
+            everything.server_errors += s.server_errors
+        lat = sorted(s.latencies)
+        n = len(lat)
+        if not n:
+            continue
+        row = rows[label] = {
+            "count": n,
+            "rps": n / elapsed,
+            "p50_ms": percentile(lat, 0.50) * 1000,
+            "p95_ms": percentile(lat, 0.95) * 1000,
+            "p99_ms": percentile(lat, 0.99) * 1000,
+            "client_error_rate": s.client_errors / n,
+            "server_error_rate": s.server_errors / n,
+        }
+        print(
+            f"{label:<40}{n:>8}{row['rps']:>9.0f}{row['p50_ms']:>9.2f}"
+            f"{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+            f"{row['client_error_rate']:>7.1%}{row['server_error_rate']:>7.1%}"
+        )
+    return rows
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("\n\n", 1)[1],
+    )
+    parser.add_argument("--url", help="Target a running server instead of in-process")
+    parser.add_argument("--http", action="append", default=[], help=".http file")
+    parser.add_argument("--capture", action="append", default=[], help="JSONL capture")
+    parser.add_argument("--tenants", type=int, default=10)
+    parser.add_argument("--flags", type=int, default=200, help="Total flags")
+    parser.add_argument(
+        "--no-seed",
+        action="store_true",
+        help="Reuse data from an earlier run with the same --tenants/--flags/--seed",
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, help="Total requests to send")
+    parser.add_argument("--duration", type=float, help="Seconds to run for")
+    parser.add_argument("--rate", type=float, help="Target req/s (open loop)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Write the per-route report as JSON")
+    args = parser.parse_args()
+    # Per-request client logging would be measured as part of the load
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.requests is None and args.duration is None:
+        args.requests = 10_000
+
+    spec = Spec(tenants=args.tenants, flags=args.flags, seed=args.seed, prefix="load")
+    catalog = await seed(spec, args.no_seed)
+
+    templates: List[Template] = []
+    for path in args.http:
+        templates += parse_http_file(path)
+    for path in args.capture:
+        templates += parse_capture(path)
+    if not templates:
+        templates = synthetic_templates()
+
+    async with AsyncExitStack() as stack:
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=30)
+        else:
+            # Run startup/shutdown hooks (exposure flusher etc.) like uvicorn would
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://loadgen"
+            )
+        await stack.enter_async_context(client)
+
+        r = await client.post(
+            "/v1/auth/token", json={"client_id": "loadgen", "scopes": SCOPES}
+        )
+        r.raise_for_status()
+        filler = Filler(catalog, r.json()["token"], args.seed)
+
+        stats, elapsed = await run_load(
+            client,
+            templates,
+            filler,
+            args.concurrency,
+            args.requests,
+            args.duration,
+            args.rate,
+        )
+
+    rows = report(stats, elapsed)
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump({"elapsed_s": elapsed, "routes": rows}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,13 +2,22 @@
 import sys
 import os
 import asyncio
+import tempfile
+import uuid
 import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
 
 # Add project root to Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from app.deps import get_db, engine
-from app.models import Base
+# Run the suite against a throwaway SQLite file instead of ./dev.db
+os.environ.setdefault("DB_DSN", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test.db")
+
+from app.deps import get_db, engine, SessionLocal
+from app.main import app
+from app.models import Base, Flag
+from app.utils.security import issue_token
 
 
 # -----------------------------
@@ -24,7 +33,7 @@ def event_loop():
 # -----------------------------
 # Setup database (create tables)
 # -----------------------------
-@pytest.fixture(scope="session", autouse=True)
+@pytest_asyncio.fixture(scope="session", autouse=True)
 async def setup_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -47,3 +56,35 @@ async def db_session():
             yield session
         finally:
             await session.rollback()
+
+
+# -----------------------------
+# Tenant + HTTP client helpers
+# -----------------------------
+@pytest_asyncio.fixture
+async def tenant():
+    """
+    A fresh tenant id. Tenants are only recognized once they own a row,
+    so a placeholder flag keyed 'seed' is inserted for it.
+    """
+    tenant_id = f"t-{uuid.uuid4().hex[:12]}"
+    async with SessionLocal() as db:
+        db.add(
+            Flag(tenant_id=tenant_id, key="seed", state="off", variants=[], rules=[])
+        )
+        await db.commit()
+    return tenant_id
+
+
+@pytest.fixture
+def auth_headers(tenant):
+    token = issue_token("test-client", ["flags:rw", "segments:rw", "segments:ro"])
+    return {"X-Tenant-ID": tenant, "Authorization": f"Bearer {token}"}
+
+
+@pytest_asyncio.fixture
+async def client():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as c:
+        yield c
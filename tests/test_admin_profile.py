@@ -0,0 +1,80 @@
+# tests/test_admin_profile.py
+import marshal
+
+import pytest
+
+from app.utils.profiling import profiler
+from app.utils.security import issue_token
+
+
+@pytest.fixture
+def admin_headers():
+    return {"Authorization": f"Bearer {issue_token('ops', ['admin'])}"}
+
+
+@pytest.mark.asyncio
+async def test_profile_requires_admin_scope(client, auth_headers):
+    r = await client.get("/v1/admin/profile")
+    assert r.status_code == 401
+    r = await client.get("/v1/admin/profile", headers=auth_headers)
+    assert r.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_cprofile_next_n_requests(client, auth_headers, admin_headers):
+    await client.post(
+        "/v1/flags",
+        json={"key": "prof", "state": "on", "variants": [{"key": "a", "weight": 1}]},
+        headers=auth_headers,
+    )
+    r = await client.post(
+        "/v1/admin/profile/start",
+        json={"requests": 3, "path_prefix": "/v1/evaluate"},
+        headers=admin_headers,
+    )
+    assert r.status_code == 202 and r.json()["state"] == "running"
+    r = await client.post(
+        "/v1/admin/profile/start", json={"requests": 1}, headers=admin_headers
+    )
+    assert r.status_code == 409
+
+    tenant = {"X-Tenant-ID": auth_headers["X-Tenant-ID"]}
+    for i in range(3):
+        await client.post(
+            "/v1/evaluate",
+            json={"flag_key": "prof", "user": {"id": f"u{i}"}},
+            headers=tenant,
+        )
+    r = await client.get("/v1/admin/profile", headers=admin_headers)
+    assert r.json()["state"] == "done" and r.json()["requests_seen"] == 3
+
+    r = await client.get("/v1/admin/profile/result", headers=admin_headers)
+    assert r.status_code == 200
+    assert "attachment" in r.headers["content-disposition"]
+    stats = marshal.loads(r.content)
+    assert any(func[2] == "evaluate_flag" for func in stats)
+
+    r = await client.get(
+        "/v1/admin/profile/result", params={"format": "text"}, headers=admin_headers
+    )
+    assert b"cumulative" in r.content
+
+
+@pytest.mark.asyncio
+async def test_sampling_profile_time_window(client, admin_headers):
+    r = await client.post(
+        "/v1/admin/profile/start",
+        json={"mode": "sampling", "seconds": 5, "interval_ms": 1},
+        headers=admin_headers,
+    )
+    assert r.status_code == 202
+    for _ in range(20):
+        await client.get("/healthz")
+    r = await client.post("/v1/admin/profile/stop", headers=admin_headers)
+    assert r.json()["state"] == "done"
+    assert not profiler.active
+
+    r = await client.get("/v1/admin/profile/result", headers=admin_headers)
+    assert r.status_code == 200
+    lines = r.text.strip().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
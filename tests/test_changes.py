@@ -0,0 +1,113 @@
+# tests/test_changes.py
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.deps import SessionLocal
+from app.models import Change
+from app.services import changes
+from app.services.changes import changes_since, compact, record_changes
+
+
+def flag(key, state="on"):
+    return {"key": key, "state": state, "variants": [{"key": "on", "weight": 100}]}
+
+
+@pytest.mark.asyncio
+async def test_writes_append_sequenced_changes(client, auth_headers, tenant):
+    published = []
+    changes.subscribe(published.extend)
+    try:
+        await client.post("/v1/flags", json=flag("a"), headers=auth_headers)
+        await client.put("/v1/flags/a", json=flag("a", "off"), headers=auth_headers)
+        await client.post(
+            "/v1/flags:bulk",
+            json=[flag("b"), flag("c")],
+            headers=auth_headers,
+        )
+        await client.delete("/v1/flags/a", headers=auth_headers)
+        await client.post(
+            "/v1/segments", json={"key": "s", "criteria": {}}, headers=auth_headers
+        )
+        await client.delete("/v1/segments/s", headers=auth_headers)
+    finally:
+        changes._subscribers.remove(published.extend)
+
+    async with SessionLocal() as db:
+        page = await changes_since(db, tenant, 0)
+    assert [(c.seq, c.entity, c.key, c.action, c.version) for c in page.changes] == [
+        (1, "flag", "a", "create", 1),
+        (2, "flag", "a", "update", 2),
+        (3, "flag", "b", "create", 1),
+        (4, "flag", "c", "create", 1),
+        (5, "flag", "a", "delete", 3),
+        (6, "segment", "s", "create", 1),
+        (7, "segment", "s", "delete", 1),
+    ]
+    assert (page.head, page.floor) == (7, 0)
+    assert [c for c in published if c.tenant == tenant] == page.changes
+
+    async with SessionLocal() as db:
+        page = await changes_since(db, tenant, 4, limit=2)
+    assert [c.seq for c in page.changes] == [5, 6]
+
+
+@pytest.mark.asyncio
+async def test_rollback_discards_changes(tenant):
+    published = []
+    changes.subscribe(published.extend)
+    try:
+        async with SessionLocal() as db:
+            await record_changes(db, tenant, [("flag", "x", "create", 1)])
+            await db.rollback()
+        async with SessionLocal() as db:
+            await record_changes(db, tenant, [("flag", "y", "create", 1)])
+            await db.commit()
+    finally:
+        changes._subscribers.remove(published.extend)
+
+    # The rolled-back seq is reused: numbers stay gap-free
+    assert [(c.seq, c.key) for c in published] == [(1, "y")]
+
+
+@pytest.mark.asyncio
+async def test_compaction_keeps_latest_and_raises_floor(tenant):
+    async with SessionLocal() as db:
+        await record_changes(
+            db,
+            tenant,
+            [
+                ("flag", "a", "create", 1),
+                ("flag", "a", "update", 2),
+                ("flag", "b", "create", 1),
+                ("flag", "b", "delete", 2),
+                ("flag", "c", "create", 1),
+            ],
+        )
+        await db.commit()
+
+    async with SessionLocal() as db:
+        assert await compact(db, tenant) == 2
+    async with SessionLocal() as db:
+        page = await changes_since(db, tenant, 0)
+    assert [(c.seq, c.key, c.action) for c in page.changes] == [
+        (2, "a", "update"),
+        (4, "b", "delete"),
+        (5, "c", "create"),
+    ]
+
+    # Age the tombstone past the TTL; dropping it moves the floor up to it
+    async with SessionLocal() as db:
+        await db.execute(
+            update(Change)
+            .where(Change.tenant_id == tenant, Change.seq == 4)
+            .values(ts=Change.ts - timedelta(days=2))
+        )
+        await db.commit()
+    async with SessionLocal() as db:
+        assert await compact(db, tenant, timedelta(days=1)) == 1
+    async with SessionLocal() as db:
+        page = await changes_since(db, tenant, 0)
+    assert [c.seq for c in page.changes] == [2, 5]
+    assert (page.head, page.floor) == (5, 4)
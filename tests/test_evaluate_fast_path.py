@@ -0,0 +1,72 @@
+# tests/test_evaluate_fast_path.py
+import pytest
+
+from app.config import settings
+
+FLAG = {
+    "key": "checkout_new",
+    "state": "on",
+    "variants": [{"key": "control", "weight": 50}, {"key": "treatment", "weight": 50}],
+    "rules": [
+        {
+            "id": "r1",
+            "when": {"attr": {"role": "employee"}},
+            "rollout": {"variant": "treatment"},
+        }
+    ],
+}
+
+REQUESTS = [
+    {"flag_key": "checkout_new", "user": {"id": "u-1"}},
+    {"flag_key": "checkout_new", "user": {"id": "u-2", "role": "employee"}},
+    {"flag_key": "checkout_new", "user": {"id": "ü-ñ", "country": "CA"}},
+    {"flag_key": "checkout_new", "user": {}},
+    {"flag_key": "off_flag", "user": {"id": "u-1"}},
+    {"flag_key": "missing", "user": {"id": "u-1"}},
+    {"flag_key": 12, "user": {"id": "u-1"}},
+    {"user": {"id": "u-1"}},
+]
+
+
+async def _evaluate_all(client, headers):
+    responses = []
+    for body in REQUESTS:
+        r = await client.post("/v1/evaluate", json=body, headers=headers)
+        responses.append((r.status_code, r.headers["content-type"], r.content))
+    return responses
+
+
+@pytest.mark.asyncio
+async def test_fast_path_matches_regular_route(client, auth_headers, monkeypatch):
+    await client.post("/v1/flags", json=FLAG, headers=auth_headers)
+    await client.post(
+        "/v1/flags",
+        json={**FLAG, "key": "off_flag", "state": "off"},
+        headers=auth_headers,
+    )
+    headers = {"X-Tenant-ID": auth_headers["X-Tenant-ID"]}
+
+    monkeypatch.setattr(settings, "evaluate_fast_path", False)
+    regular = await _evaluate_all(client, headers)
+
+    # Second pass runs with warm caches, so cached flags take the fast path
+    monkeypatch.setattr(settings, "evaluate_fast_path", True)
+    fast = await _evaluate_all(client, headers)
+
+    assert fast == regular
+    assert [status for status, _, _ in fast] == [200, 200, 200, 200, 200, 404, 422, 422]
+
+
+@pytest.mark.asyncio
+async def test_fast_path_falls_back_for_non_json_content_type(client, auth_headers):
+    await client.post("/v1/flags", json=FLAG, headers=auth_headers)
+    headers = {"X-Tenant-ID": auth_headers["X-Tenant-ID"]}
+    r = await client.post("/v1/evaluate", json=REQUESTS[0], headers=headers)
+    assert r.status_code == 200
+
+    r = await client.post(
+        "/v1/evaluate",
+        content=b'{"flag_key": "checkout_new", "user": {}}',
+        headers={**headers, "Content-Type": "text/plain"},
+    )
+    assert r.status_code == 422
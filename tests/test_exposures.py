@@ -0,0 +1,144 @@
+# tests/test_exposures.py
+import asyncio
+import gzip
+import json
+
+import pytest
+from sqlalchemy import select
+
+from app.deps import SessionLocal
+from app.models import Exposure
+from app.routers import evaluate as evaluate_router
+from app.services.exposures import (
+    DatabaseExposureSink,
+    ExposureBuffer,
+    ExposurePipeline,
+    NDJSONFileSink,
+)
+
+FLAG = {
+    "key": "exposed_flag",
+    "state": "on",
+    "variants": [{"key": "control", "weight": 50}, {"key": "treatment", "weight": 50}],
+}
+
+
+class ListSink:
+    def __init__(self):
+        self.batches = []
+
+    async def write(self, batch):
+        self.batches.append(batch)
+
+    async def close(self):
+        pass
+
+
+def _event(i, tenant="t", ts=1_700_000_000.0):
+    return (tenant, "f", "control", f"u-{i}", None, ts)
+
+
+def test_ring_buffer_wraps_and_counts_drops():
+    buf = ExposureBuffer(capacity=3)
+    assert all(buf.push(_event(i)) for i in range(3))
+    assert buf.push(_event(3)) is False
+    assert buf.dropped == 1
+
+    assert [e[3] for e in buf.drain(2)] == ["u-0", "u-1"]
+    assert buf.push(_event(4)) and buf.push(_event(5))
+    assert [e[3] for e in buf.drain(10)] == ["u-2", "u-4", "u-5"]
+    assert len(buf) == 0
+
+
+@pytest.mark.asyncio
+async def test_evaluate_records_exposures(client, auth_headers, monkeypatch):
+    sink = ListSink()
+    pipeline = ExposurePipeline(sink, capacity=100, batch_size=10, flush_interval=1)
+    monkeypatch.setattr(evaluate_router, "exposures", pipeline)
+    tenant = auth_headers["X-Tenant-ID"]
+
+    await client.post("/v1/flags", json=FLAG, headers=auth_headers)
+    await client.post(
+        "/v1/flags",
+        json={**FLAG, "key": "dark_flag", "state": "off"},
+        headers=auth_headers,
+    )
+    # First call goes through the route, the second through the fast path
+    for user in ("u-1", "u-2"):
+        r = await client.post(
+            "/v1/evaluate",
+            json={"flag_key": "exposed_flag", "user": {"id": user}},
+            headers={"X-Tenant-ID": tenant},
+        )
+        assert r.status_code == 200
+    # Flags that serve no variant produce no exposure
+    await client.post(
+        "/v1/evaluate",
+        json={"flag_key": "dark_flag", "user": {"id": "u-3"}},
+        headers={"X-Tenant-ID": tenant},
+    )
+
+    assert await pipeline.flush() == 2
+    events = sink.batches[0]
+    assert [(e[0], e[1], e[3]) for e in events] == [
+        (tenant, "exposed_flag", "u-1"),
+        (tenant, "exposed_flag", "u-2"),
+    ]
+    assert {e[2] for e in events} <= {"control", "treatment"}
+
+
+@pytest.mark.asyncio
+async def test_database_sink_multi_row_insert():
+    sink = DatabaseExposureSink(SessionLocal)
+    sink.rows_per_statement = 7
+    await sink.write([_event(i, tenant="t-exp-db") for i in range(20)])
+
+    async with SessionLocal() as db:
+        rows = (
+            (await db.execute(select(Exposure).where(Exposure.tenant_id == "t-exp-db")))
+            .scalars()
+            .all()
+        )
+    assert sorted(r.user_id for r in rows) == sorted(f"u-{i}" for i in range(20))
+
+
+@pytest.mark.asyncio
+async def test_file_sink_rotates_gzip_ndjson(tmp_path):
+    sink = NDJSONFileSink(str(tmp_path), max_bytes=1)
+    pipeline = ExposurePipeline(sink, capacity=10, batch_size=2, flush_interval=1)
+    for i in range(4):
+        pipeline.record("t", "f", "control", f"u-{i}", "r1")
+    await pipeline.stop()
+
+    files = sorted(tmp_path.iterdir())
+    assert len(files) == 2
+    lines = [
+        json.loads(line) for f in files for line in gzip.open(f).read().splitlines()
+    ]
+    assert [line["user_id"] for line in lines] == ["u-0", "u-1", "u-2", "u-3"]
+    assert lines[0]["rule_id"] == "r1" and lines[0]["ts"].endswith("Z")
+
+
+@pytest.mark.asyncio
+async def test_failing_subscriber_does_not_stop_the_flusher():
+    sink = ListSink()
+    pipeline = ExposurePipeline(sink, capacity=16, batch_size=2, flush_interval=0.01)
+    seen = []
+
+    def broken(batch):
+        raise RuntimeError("subscriber bug")
+
+    pipeline.subscribe(broken)
+    pipeline.subscribe(seen.extend)
+    pipeline.start()
+    try:
+        for i in range(2):
+            pipeline.record("t", "f", "control", f"u-{i}", None)
+        await asyncio.sleep(0.05)
+        pipeline.record("t", "f", "control", "u-late", None)
+        await asyncio.sleep(0.05)
+        assert not pipeline._task.done()
+    finally:
+        await pipeline.stop()
+    assert [e[3] for e in seen] == ["u-0", "u-1", "u-late"]
+    assert sum(len(b) for b in sink.batches) == 3
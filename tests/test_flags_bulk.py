@@ -0,0 +1,98 @@
+# tests/test_flags_bulk.py
+import json
+
+import pytest
+
+from app.utils.security import issue_token
+
+
+def _flag(key, state="on", weight=50):
+    return {
+        "key": key,
+        "state": state,
+        "variants": [
+            {"key": "control", "weight": weight},
+            {"key": "treatment", "weight": 100 - weight},
+        ],
+    }
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_json_array(client, auth_headers):
+    r = await client.post(
+        "/v1/flags", json=_flag("bulk_existing"), headers=auth_headers
+    )
+    assert r.status_code == 201
+
+    body = [
+        _flag("bulk_new"),
+        _flag("bulk_existing", weight=10),
+        {"key": "bulk_bad", "state": "maybe", "variants": []},
+        _flag("bulk_new"),
+    ]
+    r = await client.post("/v1/flags:bulk", json=body, headers=auth_headers)
+    assert r.status_code == 200
+    result = r.json()
+    assert (result["created"], result["updated"], result["failed"]) == (1, 1, 2)
+    assert [i["action"] for i in result["items"]] == [
+        "create",
+        "update",
+        "error",
+        "error",
+    ]
+    assert "Duplicate key" in result["items"][3]["error"]
+
+    r = await client.get("/v1/flags/bulk_existing", headers=auth_headers)
+    assert r.json()["variants"][0]["weight"] == 10
+
+    # Re-submitting the same state is a no-op
+    r = await client.post("/v1/flags:bulk", json=body[:2], headers=auth_headers)
+    assert r.json()["unchanged"] == 2
+
+    r = await client.get(
+        "/v1/audit", params={"entity_key": "bulk_new"}, headers=auth_headers
+    )
+    assert [a["action"] for a in r.json()] == ["create"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_ndjson_dry_run(client, auth_headers):
+    lines = [json.dumps(_flag("nd_a")), "{not json", json.dumps(_flag("nd_b"))]
+    r = await client.post(
+        "/v1/flags:bulk",
+        params={"dry_run": "true"},
+        content="\n".join(lines),
+        headers={**auth_headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert r.status_code == 200
+    result = r.json()
+    assert result["dry_run"] is True
+    assert result["created"] == 2
+    assert result["items"][1]["action"] == "error"
+
+    r = await client.get("/v1/flags/nd_a", headers=auth_headers)
+    assert r.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_revives_soft_deleted(client, auth_headers):
+    await client.post("/v1/flags", json=_flag("revive_me"), headers=auth_headers)
+    await client.delete("/v1/flags/revive_me", headers=auth_headers)
+
+    r = await client.post(
+        "/v1/flags:bulk", json=[_flag("revive_me")], headers=auth_headers
+    )
+    assert r.json()["created"] == 1
+    r = await client.get("/v1/flags/revive_me", headers=auth_headers)
+    assert r.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_requires_flags_scope(client, auth_headers):
+    token = issue_token("test-client", [])
+    r = await client.post(
+        "/v1/flags:bulk",
+        json=[_flag("scoped")],
+        headers={**auth_headers, "Authorization": f"Bearer {token}"},
+    )
+    assert r.status_code == 403
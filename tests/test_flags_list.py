@@ -0,0 +1,95 @@
+# tests/test_flags_list.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.utils.security import issue_token
+
+
+def _flag(key, state="on"):
+    return {
+        "key": key,
+        "description": f"{key} flag",
+        "state": state,
+        "variants": [
+            {"key": "control", "weight": 50},
+            {"key": "treatment", "weight": 50},
+        ],
+        "rules": [
+            {
+                "id": "r1",
+                "when": {"attr": {"role": "employee"}},
+                "rollout": {"variant": "treatment"},
+            }
+        ],
+    }
+
+
+async def _create_flags(client, headers, flags):
+    for body in flags:
+        r = await client.post("/v1/flags", json=body, headers=headers)
+        assert r.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_list_flags_pagination_excludes_deleted(client, auth_headers):
+    keys = [f"ui_{i}" for i in range(5)]
+    await _create_flags(client, auth_headers, [_flag(k) for k in keys])
+    r = await client.delete("/v1/flags/ui_2", headers=auth_headers)
+    assert r.status_code == 204
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "prefix": "ui_"}
+        if cursor:
+            params["cursor"] = cursor
+        r = await client.get("/v1/flags", params=params, headers=auth_headers)
+        assert r.status_code == 200
+        seen.extend(f["key"] for f in r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen == ["ui_0", "ui_1", "ui_3", "ui_4"]
+
+
+@pytest.mark.asyncio
+async def test_list_flags_filters_and_projection(client, auth_headers):
+    await _create_flags(
+        client,
+        auth_headers,
+        [_flag("pay_a", "on"), _flag("pay_b", "off"), _flag("pay_c", "on")],
+    )
+
+    r = await client.get(
+        "/v1/flags",
+        params={"prefix": "pay_", "state": "on", "fields": "key,state"},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json() == [
+        {"key": "pay_a", "state": "on"},
+        {"key": "pay_c", "state": "on"},
+    ]
+
+    future = (datetime.utcnow() + timedelta(hours=1)).isoformat()
+    r = await client.get(
+        "/v1/flags",
+        params={"prefix": "pay_", "updated_since": future},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json() == []
+
+    r = await client.get("/v1/flags", params={"state": "maybe"}, headers=auth_headers)
+    assert r.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_list_flags_requires_flags_scope(client, auth_headers):
+    token = issue_token("test-client", ["segments:ro"])
+    r = await client.get(
+        "/v1/flags", headers={**auth_headers, "Authorization": f"Bearer {token}"}
+    )
+    assert r.status_code == 403
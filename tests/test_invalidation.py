@@ -0,0 +1,132 @@
+# tests/test_invalidation.py
+import asyncio
+import os
+import socket
+
+import pytest
+
+from app.deps import SessionLocal
+from app.services.cache import (
+    apply_invalidations,
+    flag_cache,
+    get_flag_cache_key,
+    last_flag_write,
+)
+from app.services.changes import record_changes
+from app.services.invalidation import (
+    RESET,
+    InProcessBackend,
+    Invalidation,
+    InvalidationBus,
+    UnixSocketBackend,
+    decode,
+    encode,
+)
+from app.services.stream import StreamHub
+
+
+def test_encode_splits_large_batches():
+    messages = [Invalidation("flag", "t", f"key-{i:04d}", i) for i in range(1000)]
+    payloads = encode("me", messages)
+    assert len(payloads) > 1
+    assert all(len(p) < 8000 for p in payloads)
+    assert [m for p in payloads for m in decode(p)[1]] == messages
+
+
+@pytest.mark.asyncio
+async def test_unix_bus_reaches_other_processes_only(tmp_path):
+    directory = str(tmp_path)
+    writer = InvalidationBus(UnixSocketBackend(directory, "writer"))
+    reader = InvalidationBus(UnixSocketBackend(directory, "reader"))
+    got_writer, got_reader = [], []
+    writer.subscribe(got_writer.extend)
+    reader.subscribe(got_reader.extend)
+
+    # A socket left behind by a dead worker is cleaned up on first send
+    dead = os.path.join(directory, "dead.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.bind(dead)
+
+    await writer.start()
+    await reader.start()
+    try:
+        message = Invalidation("flag", "t1", "checkout", 7)
+        writer.publish([message])
+        for _ in range(50):
+            if got_reader:
+                break
+            await asyncio.sleep(0.01)
+        assert got_reader == [message]
+        assert got_writer == []
+        assert not os.path.exists(dead)
+    finally:
+        await writer.stop()
+        await reader.stop()
+    assert os.listdir(directory) == []
+
+
+@pytest.mark.asyncio
+async def test_inprocess_bus_skips_own_messages_unless_looped_back():
+    bus = InvalidationBus(InProcessBackend())
+    got = []
+    bus.subscribe(got.extend)
+    await bus.start()
+    bus.publish([RESET])  # this process already applied its own writes
+    await bus.stop()
+    assert got == []
+
+    bus = InvalidationBus(InProcessBackend(), loopback=True)
+    bus.subscribe(got.extend)
+    bus.publish([RESET])  # not started: dropped
+    await bus.start()
+    bus.publish([RESET])
+    await bus.stop()
+    assert got == [RESET]
+
+
+def test_remote_invalidation_drops_cached_flag():
+    key = get_flag_cache_key("t-remote", "banner")
+    flag_cache.set(key, {"key": "banner"})
+    before = last_flag_write("t-remote", "banner")
+
+    apply_invalidations([Invalidation("flag", "t-remote", "banner", 3)])
+    assert flag_cache.get(key) is None
+    assert last_flag_write("t-remote", "banner") > before
+
+    flag_cache.set(key, {"key": "banner"})
+    apply_invalidations([RESET])
+    assert flag_cache.get(key) is None
+    assert last_flag_write("t-other", "anything") > 0
+
+
+@pytest.mark.asyncio
+async def test_stream_catches_up_on_changes_from_other_workers(tenant):
+    # `worker` is another process's hub: it hears about commits only via the bus
+    worker = StreamHub(SessionLocal, queue_size=16, heartbeat=60, max_subscribers=10)
+    events = worker.events(worker.subscribe(tenant), None)
+    await events.__anext__()
+
+    async with SessionLocal() as db:
+        [first, second] = await record_changes(
+            db, tenant, [("flag", "a", "create", 1), ("flag", "b", "create", 1)]
+        )
+        await db.commit()
+    worker.on_invalidations(
+        [Invalidation("flag", tenant, c.key, c.seq) for c in (first, second)]
+    )
+    await worker.settle()
+    assert (await events.__anext__()).startswith(b"id: %d\n" % first.seq)
+    assert (await events.__anext__()).startswith(b"id: %d\n" % second.seq)
+
+    # A local event past a gap waits for the missing one from the change log
+    async with SessionLocal() as db:
+        await record_changes(db, tenant, [("flag", "c", "update", 2)])
+        await db.commit()
+    async with SessionLocal() as db:
+        [last] = await record_changes(db, tenant, [("flag", "d", "update", 2)])
+        await db.commit()
+    worker.on_changes([last])
+    await worker.settle()
+    assert (await events.__anext__()).startswith(b"id: %d\n" % (last.seq - 1))
+    assert (await events.__anext__()).startswith(b"id: %d\n" % last.seq)
+    await events.aclose()
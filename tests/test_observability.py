@@ -1,8 +1,21 @@
 # tests/test_observability.py
+import json
+import logging
+import queue
+import sys
+
 import pytest
 from httpx import AsyncClient
+from prometheus_client import REGISTRY
+from app.config import settings
 from app.main import app
-from app.utils.metrics import REQUEST_COUNT
+from app.utils.logging import JsonFormatter, TokenBucket, _PreparedQueueHandler
+from app.utils import metrics
+from app.utils.metrics import (
+    REQUEST_COUNT,
+    REQUEST_LATENCY,
+    FirstSeenTenantLabels,
+)
 
 TENANTS = ["tenantA", "tenantB"]
 REQUEST_IDS = ["req1", "req2"]
@@ -56,3 +69,105 @@ async def test_metrics_counter_increment():
                 assert (
                     after_value >= before_value + 1
                 ), f"Counter did not increment for {dict(key)}"
+
+
+@pytest.mark.asyncio
+async def test_metrics_use_route_templates(client, auth_headers):
+    for key in ("alpha", "beta", "gamma"):
+        await client.get(f"/v1/flags/{key}", headers=auth_headers)
+
+    paths = {s.labels["path"] for s in REQUEST_COUNT.collect()[0].samples}
+    assert "/v1/flags/{flag_key}" in paths
+    assert not any(p.startswith("/v1/flags/") and "{" not in p for p in paths)
+    assert all("request_id" not in s.labels for s in REQUEST_COUNT.collect()[0].samples)
+
+    latency = {
+        s.labels.get("path")
+        for s in REQUEST_LATENCY.collect()[0].samples
+        if s.name.endswith("_count")
+    }
+    assert "/v1/flags/{flag_key}" in latency
+
+
+def test_tenant_labels_are_capped():
+    labels = FirstSeenTenantLabels(limit=2)
+    assert [labels.label(t) for t in ("a", "b", "c", "a", "d")] == [
+        "a",
+        "b",
+        "other",
+        "a",
+        "other",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_tenant_label_requires_recognized_tenant(
+    client, auth_headers, monkeypatch
+):
+    monkeypatch.setattr(metrics, "tenant_labels", FirstSeenTenantLabels(limit=10))
+    await client.get("/v1/flags/x", headers={"X-Tenant-ID": "made-up-tenant"})
+    await client.get("/v1/flags/x", headers=auth_headers)
+
+    assert metrics.tenant_labels.admitted == {auth_headers["X-Tenant-ID"]}
+    labels = {s.labels["tenant"] for s in REQUEST_COUNT.collect()[0].samples}
+    assert "made-up-tenant" not in labels and "unknown" in labels
+
+
+@pytest.mark.asyncio
+async def test_fast_path_hits_carry_the_tenant_label(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(metrics, "tenant_labels", FirstSeenTenantLabels(limit=10))
+    monkeypatch.setattr(settings, "evaluate_fast_path", True)
+    tenant = auth_headers["X-Tenant-ID"]
+    flag = {"key": "labelled", "state": "on", "variants": [{"key": "a", "weight": 1}]}
+    await client.post("/v1/flags", json=flag, headers=auth_headers)
+
+    # The first call loads the cache through the route, the rest are fast path hits
+    for _ in range(3):
+        r = await client.post(
+            "/v1/evaluate",
+            json={"flag_key": "labelled", "user": {"id": "u1"}},
+            headers={"X-Tenant-ID": tenant},
+        )
+        assert r.status_code == 200
+    labels = {"path": "/v1/evaluate", "method": "POST", "status": "200"}
+    assert (
+        REGISTRY.get_sample_value("http_requests_total", {**labels, "tenant": tenant})
+        == 3
+    )
+
+
+def test_error_log_token_bucket_counts_suppressed():
+    bucket = TokenBucket(rate=0.0, burst=2)
+    assert [bucket.allow() for _ in range(5)] == [True, True, False, False, False]
+    assert bucket.take_suppressed() == 3
+    assert bucket.take_suppressed() == 0
+
+
+def test_queued_records_keep_traceback_for_json_formatter():
+    log_queue = queue.SimpleQueue()
+    handler = _PreparedQueueHandler(log_queue)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord(
+            "t", logging.ERROR, __file__, 1, "failed %s", ("x",), sys.exc_info()
+        )
+    handler.handle(record)
+
+    payload = json.loads(JsonFormatter().format(log_queue.get_nowait()))
+    assert payload["message"] == "failed x"
+    assert "ValueError: boom" in payload["exc_info"]
+    assert payload["timestamp"].endswith("Z") and "%" not in payload["timestamp"]
+
+
+@pytest.mark.asyncio
+async def test_success_logs_are_sampled_per_route(client, caplog, monkeypatch):
+    monkeypatch.setattr(settings, "log_success_sample_rate", 0.0)
+    monkeypatch.setattr(settings, "log_route_sample_rates", {"/healthz": 1.0})
+
+    with caplog.at_level(logging.INFO, logger="feature-flag-service"):
+        await client.get("/healthz")
+        await client.get("/readyz")
+
+    logged = [r.path for r in caplog.records if r.getMessage() == "Request completed"]
+    assert logged == ["/healthz"]
@@ -0,0 +1,46 @@
+# tests/test_readiness.py
+import pytest
+
+from app.services.readiness import db_probe, loop_monitor
+
+
+@pytest.mark.asyncio
+async def test_readyz_verbose_reports_each_check(client):
+    r = await client.get("/readyz", params={"verbose": 1})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["ready"] is True
+    assert {"database", "cache_warmup", "event_loop"} <= set(body["checks"])
+    assert body["checks"]["database"]["ok"] is True
+
+
+@pytest.mark.asyncio
+async def test_db_probe_is_cached(client, monkeypatch):
+    calls = 0
+    probe = db_probe._probe
+
+    async def counting_probe():
+        nonlocal calls
+        calls += 1
+        await probe()
+
+    monkeypatch.setattr(db_probe, "_probe", counting_probe)
+    monkeypatch.setattr(db_probe, "checked_at", None)
+    for _ in range(20):
+        assert (await client.get("/readyz")).status_code == 200
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_event_loop_lag_fails_readiness_then_liveness(client, monkeypatch):
+    monkeypatch.setattr(loop_monitor, "_recent", [0.0] * loop_monitor.window)
+    loop_monitor.record(2.0)
+    try:
+        r = await client.get("/readyz")
+        assert r.status_code == 503 and r.text == "not ready: event_loop"
+        assert (await client.get("/healthz")).status_code == 200
+
+        loop_monitor.record(30.0)
+        assert (await client.get("/healthz")).status_code == 503
+    finally:
+        loop_monitor.record(0.0)
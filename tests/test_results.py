@@ -0,0 +1,200 @@
+# tests/test_results.py
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import insert
+
+from app.deps import SessionLocal
+from app.models import Conversion, Exposure
+
+from app.services.exposures import exposures
+from app.services.results import (
+    FlagResults,
+    ResultsEngine,
+    erfc,
+    proportion_stats,
+    results_engine,
+)
+from app.utils.security import issue_token
+
+FLAG = {
+    "key": "checkout_exp",
+    "state": "on",
+    "variants": [{"key": "control", "weight": 50}, {"key": "treatment", "weight": 50}],
+}
+
+
+def test_erfc_matches_math():
+    xs = np.linspace(-6, 6, 241)
+    expected = np.array([math.erfc(x) for x in xs])
+    np.testing.assert_allclose(erfc(xs), expected, rtol=2e-7)
+
+
+def test_proportion_stats_two_proportion_z_test():
+    stats = proportion_stats(
+        np.array([1000, 1000, 0]), np.array([100, 130, 0]), control=0, confidence=0.95
+    )
+    pooled = 230 / 2000
+    z = (0.13 - 0.10) / math.sqrt(pooled * (1 - pooled) * (2 / 1000))
+    assert stats["rate"][1] == pytest.approx(0.13)
+    assert stats["lift"][1] == pytest.approx(0.3)
+    assert stats["p_value"][1] == pytest.approx(math.erfc(z / math.sqrt(2)), rel=1e-6)
+    assert stats["ci_low"][1] < 0.13 < stats["ci_high"][1]
+    # Control has no p-value; a variant with no traffic has no rate
+    assert np.isnan(stats["p_value"][0]) and np.isnan(stats["rate"][2])
+
+
+def test_p_value_is_two_sided_for_negative_lift():
+    stats = proportion_stats(
+        np.array([1000, 1000]), np.array([100, 60]), control=0, confidence=0.95
+    )
+    pooled = 160 / 2000
+    z = (0.10 - 0.06) / math.sqrt(pooled * (1 - pooled) * (2 / 1000))
+    assert stats["lift"][1] == pytest.approx(-0.4)
+    assert stats["p_value"][1] == pytest.approx(math.erfc(z / math.sqrt(2)), rel=1e-6)
+    assert stats["p_value"][1] < 0.01
+
+
+def test_late_earlier_exposure_moves_user_to_its_variant():
+    results = FlagResults()
+    conversions = {"u": {"purchase": 50.0}}
+    results.add_exposures([("u", "treatment", 20.0)], conversions)
+    results.add_exposures([("v", "control", 30.0)], {})
+    # Out of order: u actually saw control first
+    results.add_exposures([("u", "control", 10.0)], conversions)
+
+    control, treatment = results.index["control"], results.index["treatment"]
+    assert results.exposed["u"] == (control, 10.0)
+    assert (results.exposures[control], results.exposures[treatment]) == (2, 0)
+    counts = results.conversions["purchase"]
+    assert (counts[control], counts[treatment]) == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_results_follow_exposures_and_conversions(client, auth_headers):
+    tenant = auth_headers["X-Tenant-ID"]
+    headers = {"X-Tenant-ID": tenant}
+    await client.post("/v1/flags", json=FLAG, headers=auth_headers)
+
+    served = {}
+    for i in range(40):
+        r = await client.post(
+            "/v1/evaluate",
+            json={"flag_key": "checkout_exp", "user": {"id": f"u-{i}"}},
+            headers=headers,
+        )
+        served[f"u-{i}"] = r.json()["variant"]
+    await exposures.flush()
+
+    # Results need a token with flags:rw
+    r = await client.get("/v1/experiments/checkout_exp/results", headers=headers)
+    assert r.status_code == 401
+    token = issue_token("test-client", ["segments:ro"])
+    r = await client.get(
+        "/v1/experiments/checkout_exp/results",
+        headers={**headers, "Authorization": f"Bearer {token}"},
+    )
+    assert r.status_code == 403
+
+    # Loaded from the exposures table on first request
+    r = await client.get("/v1/experiments/checkout_exp/results", headers=auth_headers)
+    assert r.status_code == 200
+    assert sum(r.json()["exposures"].values()) == 40
+
+    # Later conversions update the aggregates incrementally; duplicates and
+    # users never exposed are ignored
+    buyers = [f"u-{i}" for i in range(0, 40, 4)]
+    r = await client.post(
+        "/v1/conversions",
+        json=[{"user_id": u, "event": "purchase"} for u in buyers]
+        + [{"user_id": buyers[0], "event": "purchase"}]
+        + [{"user_id": "stranger", "event": "purchase"}],
+        headers=headers,
+    )
+    assert r.status_code == 202 and r.json() == {"accepted": 12}
+
+    r = await client.get(
+        "/v1/experiments/checkout_exp/results",
+        params={"event": "purchase"},
+        headers=auth_headers,
+    )
+    body = r.json()
+    assert body["control"] == "control"
+    by_variant = {v["variant"]: v for v in body["metrics"][0]["variants"]}
+    for variant, row in by_variant.items():
+        assert row["exposures"] == sum(1 for v in served.values() if v == variant)
+        assert row["conversions"] == sum(1 for u in buyers if served[u] == variant)
+    assert by_variant["control"]["p_value"] is None
+
+    # Rebuilding from the tables gives the same answer
+    results_engine.reset()
+    r = await client.get(
+        "/v1/experiments/checkout_exp/results",
+        params={"event": "purchase"},
+        headers=auth_headers,
+    )
+    assert r.json() == body
+
+
+@pytest.mark.asyncio
+async def test_results_reload_events_from_other_workers():
+    engine = ResultsEngine(refresh_ttl=60, max_tenants=1)
+    t0 = datetime(2026, 1, 1)
+
+    async def add_rows(model, rows):
+        async with SessionLocal() as db:
+            await db.execute(insert(model), rows)
+            await db.commit()
+
+    await add_rows(
+        Exposure,
+        [
+            {
+                "tenant_id": "t-res-a",
+                "flag_key": "f",
+                "variant": "control",
+                "user_id": "u1",
+                "ts": t0,
+            },
+        ],
+    )
+    flag = await engine.get(SessionLocal, "t-res-a", "f")
+    assert flag.exposures.tolist() == [1]
+
+    # Another worker records an exposure and a conversion
+    await add_rows(
+        Exposure,
+        [
+            {
+                "tenant_id": "t-res-a",
+                "flag_key": "f",
+                "variant": "control",
+                "user_id": "u2",
+                "ts": t0,
+            },
+        ],
+    )
+    await add_rows(
+        Conversion,
+        [
+            {
+                "tenant_id": "t-res-a",
+                "user_id": "u2",
+                "event": "buy",
+                "ts": t0 + timedelta(minutes=1),
+            }
+        ],
+    )
+    assert (await engine.get(SessionLocal, "t-res-a", "f")).exposures.tolist() == [1]
+
+    # Once the state is older than the TTL it is rebuilt from the tables
+    engine.tenants["t-res-a"].loaded_at -= 60
+    flag = await engine.get(SessionLocal, "t-res-a", "f")
+    assert flag.exposures.tolist() == [2]
+    assert flag.conversions["buy"].tolist() == [1]
+
+    # Only the most recently requested tenants are kept
+    await engine.get(SessionLocal, "t-res-b", "f")
+    assert list(engine.tenants) == ["t-res-b"]
@@ -0,0 +1,58 @@
+# tests/test_segments_bulk.py
+import json
+
+import pytest
+
+from app.utils.security import issue_token
+
+
+@pytest.mark.asyncio
+async def test_bulk_segments_writes_only_changed_criteria(client, auth_headers):
+    r = await client.post(
+        "/v1/segments",
+        json={"key": "ca_users", "criteria": {"attr": {"country": "CA"}}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 201
+
+    lines = [
+        {"key": "ca_users", "criteria": {"attr": {"country": "CA"}}},
+        {"key": "us_users", "criteria": {"attr": {"country": "US"}}},
+        {"key": "no_criteria"},
+    ]
+    r = await client.post(
+        "/v1/segments:bulk",
+        content="\n".join(json.dumps(line) for line in lines),
+        headers={**auth_headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert r.status_code == 200
+    result = r.json()
+    assert [i["action"] for i in result["items"]] == ["unchanged", "create", "error"]
+
+    r = await client.post(
+        "/v1/segments:bulk",
+        json=[{"key": "ca_users", "criteria": {"attr": {"country": "FR"}}}],
+        headers=auth_headers,
+    )
+    assert r.json()["updated"] == 1
+
+    r = await client.get("/v1/segments/ca_users", headers=auth_headers)
+    assert r.json()["criteria"] == {"attr": {"country": "FR"}}
+
+    r = await client.get(
+        "/v1/audit",
+        params={"entity": "segment", "entity_key": "ca_users"},
+        headers=auth_headers,
+    )
+    assert [a["action"] for a in r.json()] == ["update", "create"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_segments_requires_segments_scope(client, auth_headers):
+    token = issue_token("test-client", ["segments:ro"])
+    r = await client.post(
+        "/v1/segments:bulk",
+        json=[{"key": "scoped", "criteria": {}}],
+        headers={**auth_headers, "Authorization": f"Bearer {token}"},
+    )
+    assert r.status_code == 403
@@ -0,0 +1,112 @@
+# tests/test_segments_list.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.deps import SessionLocal
+from app.models import Segment
+from app.services.cache import apply_invalidations
+from app.services.invalidation import Invalidation
+
+
+async def _create_segments(client, headers, keys):
+    for key in keys:
+        r = await client.post(
+            "/v1/segments",
+            json={"key": key, "criteria": {"attr": {"country": "CA"}}},
+            headers=headers,
+        )
+        assert r.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_list_segments_keyset_pagination(client, auth_headers):
+    keys = ["beta_1", "beta_2", "beta_3", "gamma_1", "gamma_2"]
+    await _create_segments(client, auth_headers, keys)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        r = await client.get("/v1/segments", params=params, headers=auth_headers)
+        assert r.status_code == 200
+        seen.extend(s["key"] for s in r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen == sorted(keys)
+
+
+@pytest.mark.asyncio
+async def test_list_segments_prefix_and_projection(client, auth_headers):
+    await _create_segments(client, auth_headers, ["ios_new", "ios_old", "web_all"])
+
+    r = await client.get(
+        "/v1/segments",
+        params={"prefix": "ios_", "fields": "key,updated_at"},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    body = r.json()
+    assert [s["key"] for s in body] == ["ios_new", "ios_old"]
+    assert all("criteria" not in s and "updated_at" in s for s in body)
+
+    r = await client.get(
+        "/v1/segments", params={"fields": "rules"}, headers=auth_headers
+    )
+    assert r.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_list_segments_etag_revalidation(client, auth_headers):
+    await _create_segments(client, auth_headers, ["internal"])
+
+    r = await client.get("/v1/segments", headers=auth_headers)
+    etag = r.headers["ETag"]
+
+    r = await client.get(
+        "/v1/segments", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert r.status_code == 304
+
+    r = await client.put(
+        "/v1/segments/internal",
+        json={"key": "internal", "criteria": {"attr": {"role": "employee"}}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+
+    r = await client.get(
+        "/v1/segments", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+    assert r.json()[0]["criteria"] == {"attr": {"role": "employee"}}
+
+
+@pytest.mark.asyncio
+async def test_list_etag_follows_writes_from_other_workers(client, auth_headers):
+    await _create_segments(client, auth_headers, ["remote"])
+    tenant = auth_headers["X-Tenant-ID"]
+    r = await client.get("/v1/segments", headers=auth_headers)
+    etag = r.headers["ETag"]
+
+    # Another worker updates the row; this one only hears about it on the bus
+    async with SessionLocal() as db:
+        await db.execute(
+            update(Segment)
+            .where(Segment.tenant_id == tenant, Segment.key == "remote")
+            .values(criteria={}, updated_at=datetime.utcnow() + timedelta(seconds=1))
+        )
+        await db.commit()
+    apply_invalidations([Invalidation("segment", tenant, "remote", 0)])
+
+    r = await client.get(
+        "/v1/segments", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert r.status_code == 200
+    assert r.json()[0]["criteria"] == {}
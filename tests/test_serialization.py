@@ -0,0 +1,76 @@
+# tests/test_serialization.py
+import json
+import time
+from datetime import datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from app.models import Flag
+from app.services.cache import get_flag_body, invalidate_flag_cache, set_flag_body
+from app.utils.serialization import dumps, flag_to_dict
+
+
+def test_flag_serializer_matches_jsonable_encoder():
+    flag = Flag(
+        id=7,
+        tenant_id="acme",
+        key="checkout",
+        description="New checkout",
+        state="on",
+        variants=[{"key": "control", "weight": 100.0}],
+        rules=[],
+        version=3,
+        deleted_at=None,
+        created_at=datetime(2025, 1, 2, 3, 4, 5, 678901),
+        updated_at=datetime(2025, 1, 2, 3, 4, 5),
+    )
+    expected = {
+        k: v for k, v in jsonable_encoder(flag).items() if not k.startswith("_")
+    }
+    assert json.loads(dumps(flag_to_dict(flag))) == expected
+
+
+@pytest.mark.asyncio
+async def test_get_flag_served_from_body_cache(client, auth_headers, tenant):
+    body = {
+        "key": "cached",
+        "state": "on",
+        "variants": [{"key": "control", "weight": 100}],
+    }
+    await client.post("/v1/flags", json=body, headers=auth_headers)
+
+    first = await client.get("/v1/flags/cached", headers=auth_headers)
+    assert first.status_code == 200
+    version, cached = get_flag_body(tenant, "cached")
+    assert version == 1 and cached == first.content
+
+    second = await client.get("/v1/flags/cached", headers=auth_headers)
+    assert second.content == first.content
+    assert second.headers["content-type"] == "application/json"
+
+    r = await client.get(
+        "/v1/flags/cached", headers={**auth_headers, "If-None-Match": '"1"'}
+    )
+    assert r.status_code == 304
+
+    # A write drops the cached body; the next read carries the new version
+    await client.put(
+        "/v1/flags/cached", json={**body, "state": "off"}, headers=auth_headers
+    )
+    assert get_flag_body(tenant, "cached") is None
+    r = await client.get("/v1/flags/cached", headers=auth_headers)
+    assert r.json()["state"] == "off" and r.json()["version"] == 2
+
+
+def test_body_read_before_a_write_is_not_cached(tenant):
+    # GET read version 1, then a PUT committed version 2 and dropped the entry
+    read_at = time.time()
+    invalidate_flag_cache(tenant, "raced")
+    set_flag_body(tenant, "raced", 1, b"{}", read_at)
+    assert get_flag_body(tenant, "raced") is None
+
+    # An older body never replaces a newer cached one
+    set_flag_body(tenant, "raced", 3, b"new", time.time() + 1)
+    set_flag_body(tenant, "raced", 2, b"old", time.time() + 1)
+    assert get_flag_body(tenant, "raced") == (3, b"new")
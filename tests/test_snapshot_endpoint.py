@@ -0,0 +1,78 @@
+# tests/test_snapshot_endpoint.py
+import pytest
+
+from app.routers.snapshot import BINARY_MEDIA_TYPE
+from app.services.snapshot_format import TenantSnapshotReader
+from app.services.snapshot_store import snapshot_store
+from app.utils.security import issue_token
+
+
+def flag(key, state="on"):
+    return {"key": key, "state": state, "variants": [{"key": "on", "weight": 100}]}
+
+
+@pytest.mark.asyncio
+async def test_snapshot_etag_and_deltas(client, auth_headers):
+    for key in ("alpha", "beta"):
+        await client.post("/v1/flags", json=flag(key), headers=auth_headers)
+    await client.post(
+        "/v1/segments",
+        json={"key": "beta_users", "criteria": {"attr": {"role": "beta"}}},
+        headers=auth_headers,
+    )
+
+    r = await client.get("/v1/snapshot", headers=auth_headers)
+    assert r.status_code == 200
+    full = r.json()
+    assert full["full"] is True
+    assert {f["key"] for f in full["flags"]} == {"seed", "alpha", "beta"}
+    assert [s["key"] for s in full["segments"]] == ["beta_users"]
+    etag, v1 = r.headers["ETag"], full["version"]
+    assert etag == f'"{v1}"'
+
+    r = await client.get(
+        "/v1/snapshot", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert r.status_code == 304
+    r = await client.get("/v1/snapshot", params={"since": v1}, headers=auth_headers)
+    assert r.status_code == 304
+
+    # Writes mark the snapshot dirty; the debounced rebuild picks them up
+    await client.put("/v1/flags/alpha", json=flag("alpha", "off"), headers=auth_headers)
+    await client.delete("/v1/flags/beta", headers=auth_headers)
+    await client.delete("/v1/segments/beta_users", headers=auth_headers)
+    await snapshot_store.settle()
+
+    r = await client.get("/v1/snapshot", params={"since": v1}, headers=auth_headers)
+    delta = r.json()
+    assert r.status_code == 200 and delta["full"] is False
+    assert delta["version"] > v1
+    assert [(f["key"], f["state"]) for f in delta["flags"]] == [("alpha", "off")]
+    assert delta["segments"] == []
+    assert delta["removed"] == {"flags": ["beta"], "segments": ["beta_users"]}
+
+    r = await client.get("/v1/snapshot", headers=auth_headers)
+    assert {f["key"] for f in r.json()["flags"]} == {"seed", "alpha"}
+    assert r.headers["ETag"] == f'"{delta["version"]}"'
+
+
+@pytest.mark.asyncio
+async def test_snapshot_binary(client, auth_headers):
+    await client.post("/v1/flags", json=flag("gamma"), headers=auth_headers)
+    r = await client.get(
+        "/v1/snapshot", headers={**auth_headers, "Accept": BINARY_MEDIA_TYPE}
+    )
+    assert r.headers["content-type"] == BINARY_MEDIA_TYPE
+    snap = TenantSnapshotReader(r.content)
+    assert snap.tenant == auth_headers["X-Tenant-ID"]
+    assert snap.flag("gamma")["state"] == "on"
+    assert f'"{snap.version}"' == r.headers["ETag"]
+
+
+@pytest.mark.asyncio
+async def test_snapshot_requires_flags_scope(client, auth_headers):
+    token = issue_token("test-client", ["segments:ro"])
+    r = await client.get(
+        "/v1/snapshot", headers={**auth_headers, "Authorization": f"Bearer {token}"}
+    )
+    assert r.status_code == 403
@@ -0,0 +1,91 @@
+# tests/test_snapshot_format.py
+import mmap
+
+import pytest
+
+from app.services.flag_eval import evaluate_flag
+from app.services.snapshot_format import (
+    TENANT_HEADER,
+    NodeSnapshotReader,
+    TenantSnapshotReader,
+    encode_node,
+    encode_tenant,
+)
+
+RULE = {
+    "id": "ca",
+    "when": {"attr": {"country": "CA"}},
+    "rollout": {"variant": "treatment"},
+}
+
+
+def make_flags(n):
+    return [
+        {
+            "id": i + 1,
+            "key": f"flag_{i}",
+            "state": "off" if i % 7 == 0 else "on",
+            "variants": [
+                {"key": "control", "weight": 30},
+                {"key": "treatment", "weight": 70},
+            ],
+            "rules": [RULE] if i % 2 else [],
+            "version": i,
+        }
+        for i in range(n)
+    ]
+
+
+SEGMENTS = [
+    {"id": 9, "key": "beta", "criteria": {"attr": {"role": "beta"}}, "version": 2}
+]
+
+
+def test_round_trip_and_lazy_lookup():
+    flags = make_flags(300)
+    data = encode_tenant("acme", flags, SEGMENTS, version=42, built_at=1.5)
+    snap = TenantSnapshotReader(memoryview(data))
+
+    assert (snap.tenant, snap.version, snap.built_at) == ("acme", 42, 1.5)
+    assert snap.flag_count == 300 and snap.segment_count == 1
+    # Keys, variant keys and the shared rule are each stored once
+    assert snap.string_count == 1 + 300 + 2 + 1 + 1 + 1
+    for flag in flags:
+        assert snap.flag(flag["key"]) == {**flag, "tenant_id": "acme"}
+    assert snap.flag("nope") is None
+    assert snap.segment("beta")["criteria"] == {"attr": {"role": "beta"}}
+    assert snap.flag_keys() == sorted(f["key"] for f in flags)
+    assert snap.variant_weights("flag_1") == [("control", 0.3), ("treatment", 1.0)]
+
+    for i, user in enumerate({"id": f"u{i}", "country": "CA"} for i in range(50)):
+        key = f"flag_{i}"
+        assert evaluate_flag(snap.flag(key), "acme", user) == evaluate_flag(
+            flags[i], "acme", user
+        )
+
+
+def test_reader_rejects_other_versions():
+    data = bytearray(encode_tenant("acme", make_flags(1)))
+    data[4:6] = (99).to_bytes(2, "little")
+    with pytest.raises(ValueError, match="version 99"):
+        TenantSnapshotReader(data)
+    with pytest.raises(ValueError):
+        TenantSnapshotReader(b"x" * TENANT_HEADER.size)
+
+
+def test_node_snapshot_from_mmap(tmp_path):
+    sections = {
+        f"tenant-{t}": encode_tenant(f"tenant-{t}", make_flags(t + 1))
+        for t in range(50)
+    }
+    path = tmp_path / "node.snapshot"
+    path.write_bytes(encode_node(sections, built_at=3.0))
+
+    with open(path, "rb") as fh:
+        buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    node = NodeSnapshotReader(buf)
+    assert node.tenant_count == 50 and node.built_at == 3.0
+    assert node.tenant("tenant-49").flag("flag_49")["version"] == 49
+    assert node.tenant("tenant-3").flag("flag_4") is None
+    assert node.tenant("unknown") is None
+    assert bytes(node.section_bytes("tenant-7")) == sections["tenant-7"]
@@ -0,0 +1,96 @@
+# tests/test_stage_timing.py
+import pytest
+from prometheus_client import REGISTRY, generate_latest
+
+from app.config import settings
+from app.services.cache import flag_cache, get_flag_cache_key
+from app.utils.timing import LoopHistogram
+
+FLAG = {"key": "timed", "state": "on", "variants": [{"key": "a", "weight": 1}]}
+
+
+def _stages(header):
+    return [part.split(";")[0] for part in header.split(", ")]
+
+
+def test_loop_histogram_buckets_are_cumulative():
+    hist = LoopHistogram("t_seconds", "test", ["stage"], buckets=(0.1, 1.0))
+    child = hist.labels("x")
+    for value in (0.05, 0.1, 0.5, 2.0):
+        child.observe(value)
+    (family,) = hist.collect()
+    samples = {(s.name, s.labels.get("le")): s.value for s in family.samples}
+    assert samples[("t_seconds_bucket", "0.1")] == 2
+    assert samples[("t_seconds_bucket", "1.0")] == 3
+    assert samples[("t_seconds_bucket", "+Inf")] == 4
+    assert samples[("t_seconds_count", None)] == 4
+    assert samples[("t_seconds_sum", None)] == pytest.approx(2.65)
+
+
+@pytest.mark.asyncio
+async def test_server_timing_breakdown(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "evaluate_server_timing", True)
+    await client.post("/v1/flags", json=FLAG, headers=auth_headers)
+    headers = {"X-Tenant-ID": auth_headers["X-Tenant-ID"]}
+    body = {"flag_key": "timed", "user": {"id": "u1"}}
+
+    # Cold: regular route, flag loaded from the DB
+    r = await client.post("/v1/evaluate", json=body, headers=headers)
+    assert _stages(r.headers["server-timing"]) == [
+        "tenant",
+        "cache",
+        "db",
+        "eval",
+        "serialize",
+    ]
+    # Warm: fast path
+    r = await client.post("/v1/evaluate", json=body, headers=headers)
+    assert _stages(r.headers["server-timing"]) == [
+        "tenant",
+        "parse",
+        "cache",
+        "eval",
+        "serialize",
+    ]
+
+    metrics = generate_latest().decode()
+    assert 'evaluate_stage_seconds_count{cache="miss",stage="db"}' in metrics
+    assert 'evaluate_stage_seconds_count{cache="hit",stage="eval"}' in metrics
+
+
+def _stage_count(stage, cache):
+    value = REGISTRY.get_sample_value(
+        "evaluate_stage_seconds_count", {"stage": stage, "cache": cache}
+    )
+    return value or 0
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_is_reported_stale_with_fast_path(
+    client, auth_headers, monkeypatch
+):
+    monkeypatch.setattr(settings, "evaluate_fast_path", True)
+    monkeypatch.setattr(settings, "evaluate_stage_timing", True)
+    await client.post("/v1/flags", json=FLAG, headers=auth_headers)
+    tenant = auth_headers["X-Tenant-ID"]
+    body = {"flag_key": "timed", "user": {"id": "u1"}}
+    await client.post("/v1/evaluate", json=body, headers={"X-Tenant-ID": tenant})
+
+    # Expire the entry; the fast path must leave it for the route to see
+    cache_key = get_flag_cache_key(tenant, "timed")
+    flag_cache.store[cache_key] = (0.0, flag_cache.store[cache_key][1])
+    before = _stage_count("db", "stale")
+    r = await client.post("/v1/evaluate", json=body, headers={"X-Tenant-ID": tenant})
+    assert r.status_code == 200
+    assert _stage_count("db", "stale") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_server_timing_off_by_default(client, auth_headers):
+    await client.post("/v1/flags", json=FLAG, headers=auth_headers)
+    r = await client.post(
+        "/v1/evaluate",
+        json={"flag_key": "timed", "user": {"id": "u1"}},
+        headers={"X-Tenant-ID": auth_headers["X-Tenant-ID"]},
+    )
+    assert r.status_code == 200 and "server-timing" not in r.headers
@@ -0,0 +1,107 @@
+# tests/test_stream.py
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+from starlette.requests import Request
+
+from app.deps import SessionLocal
+from app.models import TenantSequence
+from app.services.changes import ChangeEvent, record_changes
+from app.routers.stream import stream_changes
+from app.services.stream import HEARTBEAT, StreamHub, hub
+from app.utils.security import issue_token
+
+
+def flag(key):
+    return {"key": key, "state": "on", "variants": [{"key": "on", "weight": 100}]}
+
+
+def change(tenant, seq, key="f"):
+    return ChangeEvent(tenant, seq, "flag", key, "update", seq)
+
+
+@pytest.mark.asyncio
+async def test_stream_replays_then_follows_live_changes(client, auth_headers, tenant):
+    await client.post("/v1/flags", json=flag("a"), headers=auth_headers)
+    await client.post("/v1/flags", json=flag("b"), headers=auth_headers)
+
+    events = hub.events(hub.subscribe(tenant), 1)
+    try:
+        assert await events.__anext__() == b"retry: 2000\n\n"
+        replayed = await events.__anext__()
+        assert replayed.startswith(b"id: 2\nevent: change\ndata: ")
+        assert b'"key":"b"' in replayed and b'"action":"create"' in replayed
+
+        await client.delete("/v1/flags/a", headers=auth_headers)
+        live = await events.__anext__()
+        assert live.startswith(b"id: 3\n") and b'"action":"delete"' in live
+    finally:
+        await events.aclose()
+    assert tenant not in hub._subscribers
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_dropped_after_draining(tenant):
+    small = StreamHub(SessionLocal, queue_size=2, heartbeat=60, max_subscribers=10)
+    events = small.events(small.subscribe(tenant), None)
+    await events.__anext__()  # subscribed
+
+    small.on_changes([change(tenant, seq) for seq in (1, 2, 3)])
+    assert tenant not in small._subscribers
+    assert [chunk[:5] async for chunk in events] == [b"id: 1", b"id: 2"]
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_and_resync(tenant):
+    quick = StreamHub(SessionLocal, queue_size=8, heartbeat=0.01, max_subscribers=10)
+    events = quick.events(quick.subscribe(tenant), None)
+    await events.__anext__()
+    assert await events.__anext__() == HEARTBEAT
+    await events.aclose()
+
+    # A cursor older than the compaction floor cannot be replayed
+    async with SessionLocal() as db:
+        await record_changes(db, tenant, [("flag", "a", "create", 1)] * 3)
+        await db.execute(
+            update(TenantSequence)
+            .where(TenantSequence.tenant_id == tenant)
+            .values(floor=2)
+        )
+        await db.commit()
+    events = quick.events(quick.subscribe(tenant), 1)
+    await events.__anext__()
+    assert [chunk async for chunk in events] == [
+        b'id: 3\nevent: resync\ndata: {"seq":3}\n\n'
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stream_rejects_when_full(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(hub, "max_subscribers", 0)
+    r = await client.get("/v1/stream", headers=auth_headers)
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "5"
+
+
+@pytest.mark.asyncio
+async def test_stream_slot_is_reserved_before_responding(tenant, monkeypatch):
+    monkeypatch.setattr(hub, "max_subscribers", hub._count + 1)
+    request = Request({"type": "http", "headers": [], "state": {"tenant": tenant}})
+
+    # The first response has not started streaming, yet its slot is taken
+    first = await stream_changes(request, None, None, {})
+    with pytest.raises(HTTPException) as exc:
+        await stream_changes(request, None, None, {})
+    assert exc.value.status_code == 503
+
+    await first.background()
+    assert tenant not in hub._subscribers
+
+
+@pytest.mark.asyncio
+async def test_stream_requires_flags_scope(client, auth_headers):
+    token = issue_token("test-client", ["segments:ro"])
+    r = await client.get(
+        "/v1/stream", headers={**auth_headers, "Authorization": f"Bearer {token}"}
+    )
+    assert r.status_code == 403
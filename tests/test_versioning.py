@@ -0,0 +1,85 @@
+# tests/test_versioning.py
+import pytest
+
+FLAG = {
+    "key": "versioned",
+    "state": "on",
+    "variants": [{"key": "control", "weight": 100}],
+}
+
+
+@pytest.mark.asyncio
+async def test_flag_version_increments_and_if_match(client, auth_headers):
+    r = await client.post("/v1/flags", json=FLAG, headers=auth_headers)
+    assert r.status_code == 201
+    assert r.json()["version"] == 1
+    assert r.headers["ETag"] == '"1"'
+
+    r = await client.put(
+        "/v1/flags/versioned",
+        json={**FLAG, "state": "off"},
+        headers={**auth_headers, "If-Match": '"1"'},
+    )
+    assert r.status_code == 200
+    assert r.json()["version"] == 2
+
+    # Stale writer is rejected
+    r = await client.put(
+        "/v1/flags/versioned",
+        json=FLAG,
+        headers={**auth_headers, "If-Match": '"1"'},
+    )
+    assert r.status_code == 412
+
+    r = await client.get(
+        "/v1/flags/versioned", headers={**auth_headers, "If-None-Match": '"2"'}
+    )
+    assert r.status_code == 304
+
+    r = await client.delete(
+        "/v1/flags/versioned", headers={**auth_headers, "If-Match": '"1"'}
+    )
+    assert r.status_code == 412
+    # If-Match compares strongly: a weak tag never matches
+    r = await client.delete(
+        "/v1/flags/versioned", headers={**auth_headers, "If-Match": 'W/"2"'}
+    )
+    assert r.status_code == 412
+    r = await client.delete(
+        "/v1/flags/versioned", headers={**auth_headers, "If-Match": '"2"'}
+    )
+    assert r.status_code == 204
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_bumps_version(client, auth_headers):
+    await client.post("/v1/flags", json=FLAG, headers=auth_headers)
+    r = await client.post(
+        "/v1/flags:bulk", json=[{**FLAG, "state": "off"}], headers=auth_headers
+    )
+    assert r.json()["updated"] == 1
+
+    r = await client.get("/v1/flags/versioned", headers=auth_headers)
+    assert r.json()["version"] == 2
+    assert r.headers["ETag"] == '"2"'
+
+
+@pytest.mark.asyncio
+async def test_segment_if_match(client, auth_headers):
+    body = {"key": "vseg", "criteria": {"attr": {"country": "CA"}}}
+    r = await client.post("/v1/segments", json=body, headers=auth_headers)
+    assert r.json()["version"] == 1
+
+    r = await client.put(
+        "/v1/segments/vseg",
+        json={**body, "criteria": {}},
+        headers={**auth_headers, "If-Match": '"7"'},
+    )
+    assert r.status_code == 412
+
+    r = await client.put(
+        "/v1/segments/vseg",
+        json={**body, "criteria": {}},
+        headers={**auth_headers, "If-Match": '"1"'},
+    )
+    assert r.json()["version"] == 2
@@ -0,0 +1,56 @@
+# tests/test_warmup.py
+import pytest
+
+from app.deps import SessionLocal
+from app.services.cache import (
+    flag_cache,
+    get_flag_cache_key,
+    get_segment_from_cache,
+    segment_cache,
+    tenant_cache,
+)
+from app.services.warmup import CacheWarmer, warmer
+
+
+@pytest.mark.asyncio
+async def test_warmup_loads_live_flags_and_segments(client, auth_headers):
+    tenant = auth_headers["X-Tenant-ID"]
+    flag = {
+        "key": "warm_flag",
+        "state": "on",
+        "variants": [{"key": "on", "weight": 100}],
+    }
+    await client.post("/v1/flags", json=flag, headers=auth_headers)
+    await client.post(
+        "/v1/segments",
+        json={"key": "beta", "criteria": {"attr": {"role": "beta"}}},
+        headers=auth_headers,
+    )
+    await client.post("/v1/flags", json={**flag, "key": "gone"}, headers=auth_headers)
+    await client.delete("/v1/flags/gone", headers=auth_headers)
+    flag_cache.store.clear()
+    segment_cache.store.clear()
+    tenant_cache.store.clear()
+
+    w = CacheWarmer(SessionLocal, shard_size=2)
+    await w.run()
+
+    assert w.state == "ready"
+    assert flag_cache.get(get_flag_cache_key(tenant, "warm_flag"))["version"] == 1
+    assert flag_cache.get(get_flag_cache_key(tenant, "gone")) is None
+    assert get_segment_from_cache(tenant, "beta")["criteria"] == {
+        "attr": {"role": "beta"}
+    }
+    assert tenant_cache.get(tenant) is True
+
+
+@pytest.mark.asyncio
+async def test_readyz_waits_for_warmup(client):
+    warmer._set_state("running")
+    try:
+        r = await client.get("/readyz")
+        assert r.status_code == 503 and r.text == "not ready: cache_warmup"
+    finally:
+        warmer._set_state("ready")
+    r = await client.get("/readyz")
+    assert r.status_code == 200 and r.text == "ready"